@@ -1,20 +1,55 @@
+import asyncio
+import time
 from typing import Optional
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.responses import HTMLResponse, RedirectResponse
 from uvicorn import run as app_run
 from src.constants import APP_HOST, APP_PORT
-from src.pipeline.training_pipeline import TrainPipeline
-from src.pipeline.prediction_pipeline import VehicleData, VehicleDataClassifier
+from src.logger import logging
+from src.pipeline.training_jobs import TrainingJobManager
+from src.pipeline.prediction_pipeline import VehicleData, VehicleBatchData, VehicleDataClassifier
+from src.pipeline.prediction_batcher import PredictionBatcher
+from src.pipeline.model_loader import ModelLoader
+from src.pipeline.model_refresher import ModelRefresher
+from src.monitoring.metrics import PROMETHEUS_CONTENT_TYPE, registry, root_cause, stage_histogram, update_process_metrics
+from src.entity.config_entity import ExecutorConfig, ModelPreloadConfig, ModelRefresherConfig
+from src.utils.executor import BoundedExecutor
 
 app = FastAPI()
 app.mount('/static', StaticFiles(directory='static'), name='static')
 
 templates = Jinja2Templates(directory='templates')
 
+# cpu bound work runs on these pools so the event loop only handles I/O
+executor_config = ExecutorConfig()
+inference_executor = BoundedExecutor('inference', kind='thread',
+                                     max_workers=executor_config.inference_max_workers,
+                                     max_queue_size=executor_config.inference_max_queue_size)
+training_executor = BoundedExecutor('training', kind='process',
+                                    max_workers=executor_config.training_max_workers,
+                                    max_queue_size=executor_config.training_max_queue_size)
+
+# background training runs with job ids, stage progress & cancellation
+training_job_manager = TrainingJobManager(training_executor)
+
+# coalesces concurrent single row predictions into batched predict calls
+prediction_batcher = PredictionBatcher(executor=inference_executor)
+
+# loads & warms the model at startup, before /health/ready reports ready
+model_preload_config = ModelPreloadConfig()
+model_loader = ModelLoader(model_preload_config)
+model_preload_task: Optional[asyncio.Task] = None
+
+# swaps in newly pushed models without a restart
+model_refresher_config = ModelRefresherConfig()
+model_refresher = ModelRefresher(model_refresher_config, model_loader=model_loader)
+
+PARSE_SECONDS = stage_histogram('parse')
+
 origins = ['*']
 
 app.add_middleware(
@@ -25,6 +60,33 @@ app.add_middleware(
     allow_headers=['*'],
 )
 
+@app.middleware('http')
+async def record_request_metrics(request: Request, call_next):
+    '''
+    request count, latency & errors (by root exception type) per route template, so label
+    values stay bounded; handlers that answer errors themselves put them in request.state.error
+    '''
+    start = time.perf_counter()
+    status_code, error = 500, None
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        error = getattr(request.state, 'error', None)
+        return response
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        route = request.scope.get('route')
+        labels = {'method': request.method, 'route': getattr(route, 'path', 'unmatched')}
+        registry.counter('http_requests_total', 'HTTP requests handled',
+                         labels={**labels, 'status': str(status_code)}).inc()
+        registry.histogram('http_request_duration_seconds', 'HTTP request latency', labels=labels).observe(
+            time.perf_counter() - start)
+        if error is not None:
+            registry.counter('http_request_errors_total', 'Failed HTTP requests by exception type',
+                             labels={**labels, 'exception': type(root_cause(error)).__name__}).inc()
+
 class DataForm:
     '''
     handles & processes incoming form data
@@ -58,26 +120,75 @@ class DataForm:
         self.Vehicle_Age_gt_2_Years = form.get('Vehicle_Age_gt_2_Years')
         self.Vehicle_Damage_Yes = form.get('Vehicle_Damage_Yes')
 
+async def preload_model():
+    '''loads the model off the event loop so liveness answers meanwhile, then hands over to the refresher'''
+    try:
+        if model_preload_config.enabled:
+            await asyncio.get_running_loop().run_in_executor(None, model_loader.preload)
+    except Exception as e:
+        logging.error(f'Model preload failed, not ready until a model is loaded: {e}')
+    finally:
+        if model_refresher_config.enabled:
+            model_refresher.start()
+
+@app.on_event('startup')
+async def startup():
+    global model_preload_task
+    model_preload_task = asyncio.get_running_loop().create_task(preload_model())
+
+@app.on_event('shutdown')
+async def shutdown():
+    if model_preload_task is not None:
+        model_preload_task.cancel()
+    model_refresher.stop()
+    await prediction_batcher.close()
+    training_job_manager.shutdown()
+    inference_executor.shutdown(wait=False)
+    training_executor.shutdown(wait=False)
+
 @app.get('/', tags=['authentication'])
 async def index(request: Request):
-    return templates.TemplateResponse('index.html', {'request': request, 'context': 'Rendering'})
+    return templates.TemplateResponse(request, 'index.html', {'context': 'Rendering'})
 
 @app.get('/train')
-async def trainRouteClient():
-    '''endpoint to initiate model training pipeline'''
+@app.post('/train/jobs')
+async def trainRouteClient(request: Request):
+    '''endpoint to initiate model training pipeline as a background job, returns its job id at once'''
     try:
-        train_pipeline = TrainPipeline()
-        train_pipeline.run_pipeline()
-        return Response('Training Successful!')
+        job, created = training_job_manager.start_job()
+        return {'status': True, 'job_id': job.job_id, 'deduplicated': not created, 'job': job.to_dict()}
     except Exception as e:
-        return Response(f'Error Occurred: {e}')
+        request.state.error = e
+        return {'status': False, 'error': str(e)}
+
+@app.get('/train/jobs')
+async def trainJobsRouteClient():
+    '''endpoint to list recent training jobs'''
+    return {'status': True, 'jobs': training_job_manager.list_jobs()}
+
+@app.get('/train/jobs/{job_id}')
+async def trainJobStatusRouteClient(job_id: str):
+    '''endpoint to poll a training job: current stage & elapsed time per stage'''
+    job = training_job_manager.get_job(job_id)
+    if job is None:
+        return JSONResponse({'status': False, 'error': f'Unknown training job: {job_id}'}, status_code=404)
+    return {'status': True, 'job': job.to_dict()}
+
+@app.delete('/train/jobs/{job_id}')
+async def trainJobCancelRouteClient(job_id: str):
+    '''endpoint to cancel a training job (takes effect at the next stage boundary)'''
+    job = training_job_manager.cancel_job(job_id)
+    if job is None:
+        return JSONResponse({'status': False, 'error': f'Unknown training job: {job_id}'}, status_code=404)
+    return {'status': True, 'job': job.to_dict()}
     
 @app.post('/')
 async def predictRouteClient(request: Request):
     '''endpoint to recieve from data, process it & make a prediction'''
     try:
         form = DataForm(request)
-        await form.get_vehicle_data()
+        with PARSE_SECONDS.time():
+            await form.get_vehicle_data()
 
         vehicle_data = VehicleData(
             Gender = form.Gender,
@@ -93,18 +204,80 @@ async def predictRouteClient(request: Request):
             Vehicle_Damage_Yes = form.Vehicle_Damage_Yes,
         )
 
-        # convert form data into df for the model
-        vehicle_df = vehicle_data.get_vehicle_input_dataframe()
-        # initialze prediction pipeline
-        model_predictor = VehicleDataClassifier()
-        # make prediction & retrieve the result
-        value = model_predictor.predict(vehicle_df)[0]
+        # convert form data into a feature vector for the model (no DataFrame needed)
+        vehicle_features = vehicle_data.get_vehicle_input_array()
+        # make prediction (batched with concurrent requests) & retrieve the result
+        value = (await prediction_batcher.predict(vehicle_features))[0]
         # interpret the prediction result as 'Response-Yes' or 'Response-No'
         status = 'Response-Yes' if value == 1 else 'Response-No'
 
-        return templates.TemplateResponse('index.html', {'request': request, 'context': status})
+        response = templates.TemplateResponse(request, 'index.html', {'context': status})
+        response.headers['X-Model-Version'] = str(VehicleDataClassifier.get_model_version())
+        return response
     except Exception as e:
+        request.state.error = e
         return {'status': False, 'error': str(e)}
+
+@app.post('/predict/batch')
+async def batchPredictRouteClient(request: Request):
+    '''
+    endpoint to score many vehicles with a single vectorized prediction call
+    accepts {"records": [{...}, ...]} or the columnar {"columns": {"Age": [...], ...}}
+    '''
+    try:
+        with PARSE_SECONDS.time():
+            payload = await request.json()
+
+        batch_data = VehicleBatchData(records=payload.get('records'), columns=payload.get('columns'))
+        # one feature array for the whole batch, so transform & predict run once
+        vehicle_features = batch_data.get_vehicle_input_array()
+        model_predictor = VehicleDataClassifier()
+        predictions, model_version = await inference_executor.run(model_predictor.predict_array_with_version, vehicle_features)
+
+        return {
+            'status': True,
+            'model_version': model_version,
+            'count': len(predictions),
+            'predictions': [int(value) for value in predictions],
+            'responses': ['Response-Yes' if value == 1 else 'Response-No' for value in predictions]
+        }
+    except Exception as e:
+        request.state.error = e
+        return {'status': False, 'error': str(e)}
+
+@app.get('/health/live')
+async def livenessRouteClient():
+    '''endpoint for liveness probes, answers as long as the event loop does'''
+    return {'status': True}
+
+@app.get('/health/ready')
+async def readinessRouteClient():
+    '''endpoint for readiness probes, 503 until a loaded & warmed model is serving'''
+    if not VehicleDataClassifier.is_model_ready():
+        return JSONResponse({'status': False, 'ready': False}, status_code=503)
+    return {'status': True, 'ready': True, 'model_version': VehicleDataClassifier.get_model_version()}
+
+@app.get('/stats')
+async def statsRouteClient():
+    '''endpoint to expose serving metrics (batch sizes, batching wait times, ...)'''
+    return {**registry.snapshot(), 'model_version': VehicleDataClassifier.get_model_version()}
+
+@app.get('/drift')
+async def driftRouteClient():
+    '''endpoint with the PSI/KS drift of served inputs against the serving model's training data'''
+    report = VehicleDataClassifier.get_drift_report()
+    if report is None:
+        return JSONResponse({'status': False, 'error': 'Served inputs are not monitored for drift '
+                                                       '(DRIFT_MONITOR_SERVING=1 & a model pushed with a drift reference)'},
+                            status_code=404)
+    return {'status': True, **report}
+
+@app.get('/metrics')
+async def metricsRouteClient():
+    '''endpoint for prometheus scrapes: the same registry as /stats in the text exposition format'''
+    # model_info is set when a model starts serving (VehicleDataClassifier.swap_model), scrapes never drop series
+    update_process_metrics()
+    return Response(registry.render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
     
 if __name__ == '__main__':
     app_run(app, host=APP_HOST, port=APP_PORT)
\ No newline at end of file
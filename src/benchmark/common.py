@@ -0,0 +1,32 @@
+'''
+timing & reporting helpers shared by the benchmarks
+'''
+import json
+import time
+
+def best_run(repeat: int, run) -> tuple:
+    '''Output: (fastest seconds, result of that run) over repeat runs'''
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        seconds = time.perf_counter() - start
+        if best is None or seconds < best[0]:
+            best = (seconds, result)
+    return best
+
+def best_of(repeat: int, run) -> float:
+    '''Output: fastest wall time of repeat runs, in seconds'''
+    return best_run(repeat, run)[0]
+
+def build_report(args, results: list, **extra) -> dict:
+    '''Output: {'timestamp', 'config' (the parsed cli args), 'results'} plus any extra keys'''
+    return {**extra, 'timestamp': time.time(), 'config': vars(args), 'results': results}
+
+def write_report(report, output_path: str = None) -> None:
+    '''prints the report as json & also writes it to output_path, when given'''
+    output = json.dumps(report, indent=2)
+    print(output)
+    if output_path:
+        with open(output_path, 'w') as file:
+            file.write(output)
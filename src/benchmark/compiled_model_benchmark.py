@@ -0,0 +1,72 @@
+'''
+parity check & latency benchmark: MyModel.predict vs the compiled numpy engine
+
+python -m src.benchmark.compiled_model_benchmark [--n-estimators 200] [--output result.json]
+exits non zero when the compiled model's predictions differ from MyModel.predict
+'''
+import argparse
+import logging
+import sys
+import time
+import numpy as np
+from src.entity.compiled_estimator import CompiledModel
+from src.benchmark.common import write_report
+from src.benchmark.stand_in_model import build_stand_in_model, make_vehicle_input_dataframe
+
+def time_calls(fn, iterations: int) -> dict:
+    '''Output: latency percentiles (ms) over iterations calls of fn'''
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {'p50_ms': float(np.percentile(timings, 50)), 'p95_ms': float(np.percentile(timings, 95)),
+            'mean_ms': float(np.mean(timings))}
+
+def run_benchmark(n_estimators: int, parity_rows: int, iterations: int, batch_sizes: list) -> dict:
+    model = build_stand_in_model(n_estimators=n_estimators)
+    compiled_model = CompiledModel.from_model(model)
+
+    parity_df = make_vehicle_input_dataframe(parity_rows, seed=7)
+    parity = compiled_model.check_parity(model, parity_df)
+    # form posts arrive as strings, the compiled path must coerce them the same way
+    parity_strings = compiled_model.check_parity(model, parity_df.head(200).astype(str))
+
+    results = {'n_estimators': n_estimators, 'nodes': int(len(compiled_model.forest.feature)),
+               'max_depth': compiled_model.forest.max_depth,
+               'parity': {'rows': parity_rows, 'numeric_inputs': parity, 'string_inputs': parity_strings},
+               'batches': []}
+    for batch_size in batch_sizes:
+        batch_df = parity_df.head(batch_size)
+        # fewer repetitions for large batches, enough for stable medians on small ones
+        repetitions = max(3, min(iterations, iterations * 100 // batch_size))
+        sklearn_timing = time_calls(lambda: model.predict(batch_df), repetitions)
+        compiled_timing = time_calls(lambda: compiled_model.predict(batch_df), repetitions)
+        results['batches'].append({
+            'batch_size': batch_size,
+            'sklearn': {**sklearn_timing, 'per_row_us': sklearn_timing['p50_ms'] * 1000 / batch_size},
+            'compiled': {**compiled_timing, 'per_row_us': compiled_timing['p50_ms'] * 1000 / batch_size},
+            'speedup_p50': sklearn_timing['p50_ms'] / compiled_timing['p50_ms'],
+        })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Compiled model parity check & latency benchmark')
+    parser.add_argument('--n-estimators', type=int, default=None, help='trees in the stand in forest (default: trainer config)')
+    parser.add_argument('--parity-rows', type=int, default=20000)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100, 1000, 10000])
+    parser.add_argument('--output', type=str, default=None, help='write the json result to this file')
+    args = parser.parse_args()
+
+    # keep per call logging out of the measurements
+    logging.disable(logging.INFO)
+    results = run_benchmark(args.n_estimators, args.parity_rows, args.iterations, args.batch_sizes)
+    write_report(results, args.output)
+
+    if not (results['parity']['numeric_inputs'] and results['parity']['string_inputs']):
+        print('Compiled model predictions differ from MyModel.predict', file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+'''
+write / read / disk size of the pipeline's data files in csv vs the columnar formats
+
+python -m src.benchmark.feature_store_benchmark [--rows 400000] [--formats csv parquet arrow]
+    [--codecs zstd snappy lz4 none] [--repeat 3] [--output result.json]
+
+the frame has the exported dtypes (like Proj1Data.export_collection_streaming). every
+(format, codec) is timed writing it, reading it back whole & reading only the model columns
+(as DataTransformation does); the columnar formats need pyarrow and are skipped without it
+'''
+import argparse
+import importlib.util
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+from src.benchmark.common import best_of, build_report, write_report
+from src.constants import SCHEMA_FILE_PATH
+from src.utils.main_utils import read_yaml_file, read_dataframe, write_dataframe
+from src.utils.vehicle_features import generate_vehicle_dataframe
+
+def make_exported_frame(rows: int, seed: int = 3) -> pd.DataFrame:
+    '''Output: generated rows typed like the Mongo export (_id strings, categories, ints & floats)'''
+    dataframe = generate_vehicle_dataframe(rows, seed).drop(columns=['id'], errors='ignore')
+    rng = np.random.default_rng(seed)
+    dataframe.insert(0, '_id', [f'{value:024x}' for value in rng.integers(0, 2 ** 62, rows)])
+    for column in read_yaml_file(SCHEMA_FILE_PATH)['categorical_columns']:
+        dataframe[column] = dataframe[column].astype('category')
+    return dataframe
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark csv vs parquet / arrow ipc data files')
+    parser.add_argument('--rows', type=int, default=400000)
+    parser.add_argument('--formats', nargs='+', choices=('csv', 'parquet', 'arrow'), default=['csv', 'parquet', 'arrow'])
+    parser.add_argument('--codecs', nargs='+', default=['zstd', 'snappy', 'lz4', 'none'],
+                        help='compression of the columnar formats (arrow ipc: zstd, lz4 or none)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measurement, the fastest is reported')
+    parser.add_argument('--output', type=str, default=None, help='write the json result to this file')
+    args = parser.parse_args()
+
+    dataframe = make_exported_frame(args.rows)
+    schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+    model_columns = schema_config['numerical_columns'] + schema_config['categorical_columns']
+    has_pyarrow = importlib.util.find_spec('pyarrow') is not None
+
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for file_format in args.formats:
+            if file_format != 'csv' and not has_pyarrow:
+                print(f'{file_format}: skipped, pyarrow is not installed', file=sys.stderr)
+                continue
+            codecs = [None] if file_format == 'csv' else args.codecs
+            for codec in codecs:
+                if file_format == 'arrow' and codec == 'snappy':
+                    # not an arrow ipc codec
+                    continue
+                compression = None if codec in (None, 'none') else codec
+                path = os.path.join(temp_dir, f'data-{codec}.{file_format}')
+                write_seconds = best_of(args.repeat, lambda: write_dataframe(dataframe, path, compression=compression))
+                read_seconds = best_of(args.repeat, lambda: read_dataframe(path))
+                read_columns_seconds = best_of(args.repeat, lambda: read_dataframe(path, model_columns))
+                dtypes_kept = read_dataframe(path).dtypes.astype(str).equals(dataframe.dtypes.astype(str))
+                results.append({'format': file_format, 'codec': codec, 'rows': args.rows,
+                                'write_seconds': write_seconds, 'read_seconds': read_seconds,
+                                'read_model_columns_seconds': read_columns_seconds,
+                                'file_bytes': os.path.getsize(path), 'dtypes_kept': dtypes_kept})
+                print(f"{file_format:8} {str(codec):7} write {write_seconds:.3f}s read {read_seconds:.3f}s "
+                      f"(model columns {read_columns_seconds:.3f}s) {os.path.getsize(path) / 1024 ** 2:.1f}MB", file=sys.stderr)
+
+    baseline = next((result for result in results if result['format'] == 'csv'), None)
+    if baseline is not None:
+        for result in results:
+            result['read_speedup_vs_csv'] = baseline['read_seconds'] / result['read_seconds']
+            result['size_vs_csv'] = result['file_bytes'] / baseline['file_bytes']
+
+    write_report(build_report(args, results), args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+'''
+load test & latency benchmark of the FastAPI service with a local stand in model (no S3)
+
+python -m src.benchmark.load_test [--transport asgi socket] [--scenario form batch]
+    [--concurrency 1 8 32] [--rate 50 200] [--duration 10] [--output result.json] [--baseline old.json]
+
+every (transport, scenario, load) combination reports p50/p95/p99 latency, throughput & errors.
+"asgi" calls app.py in-process (no network), "socket" runs it under uvicorn on a local port.
+fixed concurrency keeps N requests in flight; fixed rate sends on a schedule & measures latency
+from the scheduled send time, so a slow server can't hide its queueing delay
+'''
+import argparse
+import asyncio
+import json
+import logging
+import socket
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import replace
+import httpx
+import numpy as np
+import uvicorn
+from src.benchmark.common import build_report, write_report
+from src.benchmark.stand_in_model import build_stand_in_model
+from src.entity.compiled_estimator import CompiledModel
+from src.entity.config_entity import VehiclePredictorConfig
+from src.pipeline.prediction_pipeline import VehicleDataClassifier
+from src.utils.vehicle_features import generate_vehicle_dataframe, encode_vehicle_features
+
+STAND_IN_MODEL_VERSION = 'stand-in'
+SCENARIOS = ('form', 'batch')
+
+def install_stand_in_model(n_estimators: int = None, prediction_cache: bool = False) -> None:
+    '''
+    serves a locally trained model through the regular VehicleDataClassifier path; payloads
+    repeat, so unless prediction_cache is set the cache is turned off & every row hits the model
+    '''
+    prediction_pipeline_config = VehiclePredictorConfig()
+    if not prediction_cache:
+        # the app's classifiers use the default config: no cache is built, looked up or filled
+        VehicleDataClassifier.default_config = replace(VehicleDataClassifier.default_config, cache_enabled=False)
+        VehicleDataClassifier._prediction_cache = None
+    estimator = VehicleDataClassifier.build_estimator(prediction_pipeline_config)
+    estimator.loaded_model = build_stand_in_model(n_estimators=n_estimators)
+    if estimator.use_compiled_model:
+        estimator.compiled_model = CompiledModel.from_model(estimator.loaded_model)
+    estimator.model_version = STAND_IN_MODEL_VERSION
+    VehicleDataClassifier.swap_model(estimator)
+
+def make_payloads(num_payloads: int, batch_size: int, seed: int = 11) -> dict:
+    '''
+    Output: {'form': [form dicts], 'batch': [json bodies]} built from rows matching config/schema.yaml
+    '''
+    features = encode_vehicle_features(generate_vehicle_dataframe(num_payloads * batch_size, seed))
+    records = features.to_dict('records')
+    return {
+        'form': [{column: str(value) for column, value in record.items()} for record in records[:num_payloads]],
+        'batch': [{'records': records[start:start + batch_size]} for start in range(0, len(records), batch_size)],
+    }
+
+async def send(client: httpx.AsyncClient, scenario: str, payload: dict) -> bool:
+    '''Output: True when the request succeeded (handlers answer errors as {"status": false})'''
+    if scenario == 'form':
+        response = await client.post('/', data=payload)
+    else:
+        response = await client.post('/predict/batch', json=payload)
+    if response.status_code >= 400:
+        return False
+    if response.headers.get('content-type', '').startswith('application/json'):
+        return response.json().get('status', True) is not False
+    return True
+
+async def _timed_send(client, scenario, payload, started_at, latencies, errors) -> None:
+    try:
+        ok = await send(client, scenario, payload)
+    except Exception:
+        ok = False
+    latencies.append(time.perf_counter() - started_at)
+    if not ok:
+        errors.append(1)
+
+async def run_fixed_concurrency(client, scenario: str, payloads: list, concurrency: int, duration: float):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+
+    async def worker(offset: int):
+        index = offset
+        while time.perf_counter() < deadline:
+            await _timed_send(client, scenario, payloads[index % len(payloads)], time.perf_counter(), latencies, errors)
+            index += concurrency
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+    return latencies, len(errors), time.perf_counter() - start
+
+async def run_fixed_rate(client, scenario: str, payloads: list, rate: float, duration: float):
+    latencies, errors, tasks = [], [], []
+    start = time.perf_counter()
+    for index in range(int(rate * duration)):
+        scheduled_at = start + index / rate
+        delay = scheduled_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(
+            _timed_send(client, scenario, payloads[index % len(payloads)], scheduled_at, latencies, errors)))
+    await asyncio.gather(*tasks)
+    return latencies, len(errors), time.perf_counter() - start
+
+def summarize(latencies: list, num_errors: int, elapsed: float, rows_per_request: int) -> dict:
+    latencies_ms = np.asarray(latencies) * 1000
+    requests = len(latencies)
+    return {
+        'requests': requests,
+        'errors': num_errors,
+        'error_rate': num_errors / requests if requests else 0.0,
+        'throughput_rps': requests / elapsed if elapsed else 0.0,
+        'rows_per_second': requests * rows_per_request / elapsed if elapsed else 0.0,
+        'latency_ms': {
+            'p50': float(np.percentile(latencies_ms, 50)) if requests else None,
+            'p95': float(np.percentile(latencies_ms, 95)) if requests else None,
+            'p99': float(np.percentile(latencies_ms, 99)) if requests else None,
+            'mean': float(latencies_ms.mean()) if requests else None,
+            'max': float(latencies_ms.max()) if requests else None,
+        },
+    }
+
+class LocalServer:
+    '''runs the app under uvicorn on a free local port in a background thread'''
+    def __init__(self, app):
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            self.port = probe.getsockname()[1]
+        self.server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=self.port,
+                                                    log_level='warning', access_log=False))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self.port}'
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+async def run_loads(client, payloads: dict, args, transport: str) -> list:
+    results = []
+    for scenario in args.scenario:
+        rows_per_request = 1 if scenario == 'form' else args.batch_size
+        # a few unmeasured requests first, so connection setup & lazy paths don't skew the numbers
+        for payload in payloads[scenario][:5]:
+            await send(client, scenario, payload)
+        loads = [('concurrency', value) for value in args.concurrency] + [('rate', value) for value in args.rate]
+        for mode, value in loads:
+            if mode == 'concurrency':
+                measured = await run_fixed_concurrency(client, scenario, payloads[scenario], int(value), args.duration)
+            else:
+                measured = await run_fixed_rate(client, scenario, payloads[scenario], value, args.duration)
+            result = {'transport': transport, 'scenario': scenario, 'mode': mode, 'value': value,
+                      **summarize(*measured, rows_per_request)}
+            logging.warning(f"{transport:6} {scenario:5} {mode}={value}: {result['throughput_rps']:.0f} req/s, "
+                            f"p50 {result['latency_ms']['p50']:.2f}ms p99 {result['latency_ms']['p99']:.2f}ms, "
+                            f"{result['errors']} errors")
+            results.append(result)
+    return results
+
+async def run_benchmark(args) -> list:
+    import app as service
+    # the stand in model is already serving: nothing to preload or refresh from S3
+    service.model_preload_config.enabled = False
+    service.model_refresher_config.enabled = False
+    payloads = make_payloads(args.payloads, args.batch_size)
+
+    results = []
+    for transport in args.transport:
+        if transport == 'asgi':
+            await service.startup()
+            try:
+                async with httpx.AsyncClient(transport=httpx.ASGITransport(app=service.app),
+                                             base_url='http://benchmark') as client:
+                    results += await run_loads(client, payloads, args, transport)
+            finally:
+                await service.shutdown()
+        else:
+            with LocalServer(service.app) as server:
+                limits = httpx.Limits(max_connections=max(args.concurrency + [100]))
+                async with httpx.AsyncClient(base_url=server.base_url, limits=limits, timeout=60) as client:
+                    results += await run_loads(client, payloads, args, transport)
+    return results
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(results: list, baseline: list) -> list:
+    '''Output: per matching run, the relative change of p95 latency & throughput vs the baseline'''
+    key = lambda result: (result['transport'], result['scenario'], result['mode'], result['value'])
+    baseline_by_key = {key(result): result for result in baseline}
+    changes = []
+    for result in results:
+        old = baseline_by_key.get(key(result))
+        if old is None or not old['latency_ms']['p95'] or not old['throughput_rps']:
+            continue
+        changes.append({'transport': result['transport'], 'scenario': result['scenario'],
+                        'mode': result['mode'], 'value': result['value'],
+                        'p95_change': result['latency_ms']['p95'] / old['latency_ms']['p95'] - 1,
+                        'throughput_change': result['throughput_rps'] / old['throughput_rps'] - 1})
+    return changes
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the prediction service with a stand in model')
+    parser.add_argument('--transport', nargs='+', choices=('asgi', 'socket'), default=['asgi', 'socket'])
+    parser.add_argument('--scenario', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, nargs='*', default=[1, 8, 32])
+    parser.add_argument('--rate', type=float, nargs='*', default=[100.0], help='requests per second (open loop)')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per load level')
+    parser.add_argument('--batch-size', type=int, default=100, help='records per /predict/batch request')
+    parser.add_argument('--payloads', type=int, default=1000, help='distinct payloads per scenario')
+    parser.add_argument('--n-estimators', type=int, default=None, help='trees in the stand in forest (default: trainer config)')
+    parser.add_argument('--prediction-cache', action='store_true', help='let repeated payloads hit the prediction cache')
+    parser.add_argument('--output', type=str, default=None, help='write the json result to this file')
+    parser.add_argument('--baseline', type=str, default=None, help='earlier json result to compare against')
+    args = parser.parse_args()
+
+    # keep per request logging out of the measurements
+    logging.disable(logging.INFO)
+    install_stand_in_model(args.n_estimators, args.prediction_cache)
+    results = asyncio.run(run_benchmark(args))
+
+    report = build_report(args, results, commit=_git_commit())
+    if args.baseline:
+        with open(args.baseline) as file:
+            report['comparison'] = compare(results, json.load(file)['results'])
+    write_report(report, args.output)
+
+    if any(result['errors'] for result in results):
+        print('Some requests failed', file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
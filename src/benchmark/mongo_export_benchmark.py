@@ -0,0 +1,80 @@
+'''
+scaling benchmark of the MongoDB export against a local mongod (or any test deployment)
+
+python -m src.benchmark.mongo_export_benchmark [--mongodb-url mongodb://localhost:27017]
+    [--rows 200000] [--workers 1 2 4 8] [--repeat 3] [--output result.json]
+
+seeds a scratch database with rows generated from config/schema.yaml, then times the single
+cursor export_collection_streaming against export_collection_parallel for every worker count
+& checks both return the same frame. the scratch database is dropped afterwards (--keep keeps it)
+'''
+import argparse
+import logging
+import sys
+import pandas as pd
+import pymongo
+from src.benchmark.common import best_run, build_report, write_report
+
+BENCHMARK_DATABASE_NAME = 'proj1_export_benchmark'
+BENCHMARK_COLLECTION_NAME = 'documents'
+SEED_BATCH_ROWS = 10000
+
+def seed_collection(collection, rows: int) -> None:
+    from src.utils.vehicle_features import generate_vehicle_dataframe
+    if collection.estimated_document_count() == rows:
+        return
+    collection.drop()
+    dataframe = generate_vehicle_dataframe(rows, seed=5)
+    for start in range(0, rows, SEED_BATCH_ROWS):
+        collection.insert_many(dataframe.iloc[start:start + SEED_BATCH_ROWS].to_dict('records'), ordered=False)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark streaming vs parallel MongoDB export')
+    parser.add_argument('--mongodb-url', default='mongodb://localhost:27017')
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--batch-size', type=int, default=None, help='cursor batch size (default: constants)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measurement, the fastest is reported')
+    parser.add_argument('--keep', action='store_true', help='keep the seeded database for the next run')
+    parser.add_argument('--output', type=str, default=None, help='write the json result to this file')
+    args = parser.parse_args()
+
+    from src.constants import MONGODB_MAX_POOL_SIZE, DATA_INGESTION_EXPORT_BATCH_SIZE
+    from src.configuration.mongo_db_connection import MongoDBClient
+    # plain (non TLS) client for a local deployment, installed as the shared singleton
+    MongoDBClient.client = pymongo.MongoClient(args.mongodb_url, maxPoolSize=max(MONGODB_MAX_POOL_SIZE, max(args.workers)))
+    from src.data_access.proj1_data import Proj1Data
+    logging.disable(logging.INFO)
+
+    batch_size = args.batch_size or DATA_INGESTION_EXPORT_BATCH_SIZE
+    collection = MongoDBClient.client[BENCHMARK_DATABASE_NAME][BENCHMARK_COLLECTION_NAME]
+    seed_collection(collection, args.rows)
+    data = Proj1Data()
+    try:
+        export = lambda: data.export_collection_streaming(BENCHMARK_COLLECTION_NAME, BENCHMARK_DATABASE_NAME,
+                                                          batch_size=batch_size)
+        seconds, baseline = best_run(args.repeat, export)
+        results = [{'mode': 'streaming', 'workers': 1, 'seconds': seconds, 'documents_per_second': args.rows / seconds,
+                    'peak_rss_bytes': data.export_stats['peak_rss_bytes']}]
+        for workers in args.workers:
+            export = lambda: data.export_collection_parallel(BENCHMARK_COLLECTION_NAME, BENCHMARK_DATABASE_NAME,
+                                                             workers=workers, batch_size=batch_size)
+            seconds, frame = best_run(args.repeat, export)
+            try:
+                pd.testing.assert_frame_equal(frame, baseline.sort_values('_id', ignore_index=True),
+                                              check_dtype=False, check_categorical=False)
+            except AssertionError as e:
+                raise Exception(f'Parallel export with {workers} workers differs from the streaming export') from e
+            results.append({'mode': 'parallel', 'workers': workers, 'seconds': seconds,
+                            'documents_per_second': args.rows / seconds, 'speedup': results[0]['seconds'] / seconds,
+                            'peak_rss_bytes': data.export_stats['peak_rss_bytes']})
+            print(f"{workers} workers: {results[-1]['documents_per_second']:.0f} docs/s "
+                  f"({results[-1]['speedup']:.2f}x streaming)", file=sys.stderr)
+    finally:
+        if not args.keep:
+            MongoDBClient.client.drop_database(BENCHMARK_DATABASE_NAME)
+
+    write_report(build_report(args, results), args.output)
+
+if __name__ == '__main__':
+    main()
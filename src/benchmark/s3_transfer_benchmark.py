@@ -0,0 +1,96 @@
+'''
+throughput benchmark of SimpleStorageService transfers against S3 or any S3 compatible endpoint
+
+python -m src.benchmark.s3_transfer_benchmark --bucket proj1-benchmark [--endpoint-url http://localhost:9000]
+    [--size-mb 64] [--part-size-mb 4 8 16] [--concurrency 1 4 8] [--repeat 3] [--output result.json]
+
+uploads one random object of size_mb, then times the single stream baseline (read_object /
+one GET) against download_to_file & download_to_buffer, and the default upload against the
+multipart upload, for every (part size, concurrency) pair. objects it creates are deleted after
+'''
+import argparse
+import os
+import sys
+import tempfile
+from src.benchmark.common import best_of, build_report, write_report
+
+BENCHMARK_KEY_PREFIX = 'transfer-benchmark/'
+
+def _result(operation: str, size_bytes: int, seconds: float, part_size: int = None, concurrency: int = None) -> dict:
+    return {'operation': operation, 'part_size_mb': part_size and part_size / 1024 ** 2, 'concurrency': concurrency,
+            'seconds': seconds, 'mb_per_second': size_bytes / 1024 ** 2 / seconds if seconds else 0.0}
+
+def run_benchmark(storage, bucket_name: str, size_mb: int, part_sizes_mb: list, concurrencies: list,
+                  repeat: int, temp_dir: str) -> list:
+    size_bytes = size_mb * 1024 ** 2
+    source_file = os.path.join(temp_dir, 'source.bin')
+    target_file = os.path.join(temp_dir, 'target.bin')
+    with open(source_file, 'wb') as file_obj:
+        file_obj.write(os.urandom(size_bytes))
+    key = f'{BENCHMARK_KEY_PREFIX}object.bin'
+    upload_keys = [key]
+    storage.upload_file(source_file, key, bucket_name, remove=False)
+
+    results = []
+    # baseline: one GET streamed into memory, as read_object does
+    seconds = best_of(repeat, lambda: storage.read_object(storage.s3_resource.Object(bucket_name, key), decode=False))
+    results.append(_result('download_single_stream', size_bytes, seconds))
+    # baseline: single stream upload (no multipart)
+    def put_object() -> None:
+        with open(source_file, 'rb') as file_obj:
+            storage.s3_client.put_object(Bucket=bucket_name, Key=f'{key}.put', Body=file_obj)
+    seconds = best_of(repeat, put_object)
+    upload_keys.append(f'{key}.put')
+    results.append(_result('upload_single_stream', size_bytes, seconds))
+
+    for part_size_mb in part_sizes_mb:
+        part_size = int(part_size_mb * 1024 ** 2)
+        for concurrency in concurrencies:
+            seconds = best_of(repeat, lambda: storage.download_to_file(key, bucket_name, target_file,
+                                                                       part_size=part_size, max_concurrency=concurrency))
+            results.append(_result('download_to_file', size_bytes, seconds, part_size, concurrency))
+            seconds = best_of(repeat, lambda: storage.download_to_buffer(key, bucket_name,
+                                                                         part_size=part_size, max_concurrency=concurrency))
+            results.append(_result('download_to_buffer', size_bytes, seconds, part_size, concurrency))
+            upload_key = f'{key}.{part_size_mb}.{concurrency}'
+            upload_keys.append(upload_key)
+            seconds = best_of(repeat, lambda: storage.upload_file(source_file, upload_key, bucket_name, remove=False,
+                                                                  part_size=part_size, max_concurrency=concurrency))
+            results.append(_result('upload_multipart', size_bytes, seconds, part_size, concurrency))
+            print(f"part {part_size_mb}MB x{concurrency}: "
+                  + ', '.join(f"{result['operation']} {result['mb_per_second']:.0f}MB/s" for result in results[-3:]),
+                  file=sys.stderr)
+
+    with open(target_file, 'rb') as downloaded, open(source_file, 'rb') as source:
+        if downloaded.read() != source.read():
+            raise Exception('Downloaded object does not match the uploaded one')
+    for upload_key in upload_keys:
+        storage.s3_client.delete_object(Bucket=bucket_name, Key=upload_key)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark S3 download & upload throughput')
+    parser.add_argument('--bucket', required=True, help='bucket to use, created when missing')
+    parser.add_argument('--endpoint-url', default=None, help='S3 compatible endpoint (default: AWS / AWS_ENDPOINT_URL)')
+    parser.add_argument('--size-mb', type=int, default=64, help='size of the test object')
+    parser.add_argument('--part-size-mb', type=float, nargs='+', default=[4, 8, 16])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measurement, the fastest is reported')
+    parser.add_argument('--output', type=str, default=None, help='write the json result to this file')
+    args = parser.parse_args()
+
+    if args.endpoint_url:
+        # picked up by every boto3 client, including the per thread ones
+        os.environ['AWS_ENDPOINT_URL'] = args.endpoint_url
+    from src.cloud_storage.aws_storage import SimpleStorageService
+    storage = SimpleStorageService()
+    if args.bucket not in [bucket['Name'] for bucket in storage.s3_client.list_buckets().get('Buckets', [])]:
+        storage.s3_client.create_bucket(Bucket=args.bucket)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        results = run_benchmark(storage, args.bucket, args.size_mb, args.part_size_mb, args.concurrency,
+                                args.repeat, temp_dir)
+    write_report(build_report(args, results), args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler, MinMaxScaler
+from src.constants import SCHEMA_FILE_PATH
+from src.entity.config_entity import ModelTrainerConfig
+from src.entity.estimator import MyModel
+from src.utils.main_utils import read_yaml_file
+from src.utils.vehicle_features import generate_vehicle_dataframe, encode_vehicle_features
+
+def make_vehicle_input_dataframe(num_rows: int, seed: int = 42) -> pd.DataFrame:
+    '''
+    synthetic model input rows (already encoded, PREDICTION_INPUT_COLUMNS order) from the schema
+    driven generator, the same distribution the serving warm up predicts on
+    '''
+    return encode_vehicle_features(generate_vehicle_dataframe(num_rows, seed))
+
+def build_stand_in_model(num_rows: int = 20000, seed: int = 42, n_estimators: int = None) -> MyModel:
+    '''
+    MyModel trained on synthetic rows with the production preprocessing layout
+    (schema num_features -> StandardScaler, mm_columns -> MinMaxScaler, rest passthrough)
+    & the production RandomForest hyper parameters, so no MongoDB / S3 is needed
+    '''
+    schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+    trainer_config = ModelTrainerConfig()
+    df = make_vehicle_input_dataframe(num_rows, seed)
+
+    rng = np.random.default_rng(seed + 1)
+    logit = (-2.0 + 1.8 * df['Vehicle_Damage_Yes'] - 2.5 * df['Previously_Insured']
+             + 0.03 * (df['Age'] - 40) - 0.8 * df['Vehicle_Age_lt_1_Year'] + rng.normal(0, 0.5, num_rows))
+    target = (rng.random(num_rows) < 1 / (1 + np.exp(-logit))).astype(int)
+
+    preprocessor = Pipeline(steps=[('Preprocessor', ColumnTransformer(
+        transformers=[
+            ('StandarScaler', StandardScaler(), schema_config['num_features']),
+            ('MinMaxScaler', MinMaxScaler(), schema_config['mm_columns'])
+        ],
+        remainder='passthrough'
+    ))])
+    model = RandomForestClassifier(
+        n_estimators=n_estimators or trainer_config._n_estimators,
+        min_samples_split=trainer_config._min_samples_split,
+        min_samples_leaf=trainer_config._min_samples_leaf,
+        max_depth=trainer_config._max_depth,
+        criterion=trainer_config._criterion,
+        random_state=trainer_config._random_state
+    )
+    model.fit(preprocessor.fit_transform(df), target)
+    return MyModel(preprocessor, model)
@@ -0,0 +1,92 @@
+'''
+throughput & peak memory of the chunked schema validation against a data file
+
+python -m src.benchmark.validation_benchmark [--rows 2000000] [--format parquet]
+    [--chunk-rows 100000 500000] [--workers 1 4] [--output result.json]
+
+writes --rows generated rows (typed like the Mongo export) once, then validates the file for
+every (chunk rows, workers) in a fresh process, so each peak RSS is that run's own. the whole
+file loaded at once (--chunk-rows 0) is the baseline
+'''
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from src.benchmark.common import build_report, write_report
+
+GENERATE_BATCH_ROWS = 500000
+
+def write_data_file(file_path: str, rows: int) -> None:
+    '''generates & writes the rows in batches, the file can be larger than memory'''
+    from src.benchmark.feature_store_benchmark import make_exported_frame
+    if file_path.endswith('.csv'):
+        for start in range(0, rows, GENERATE_BATCH_ROWS):
+            batch = make_exported_frame(min(GENERATE_BATCH_ROWS, rows - start), seed=start)
+            batch.to_csv(file_path, mode='a', index=False, header=start == 0)
+        return
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    writer = None
+    try:
+        for start in range(0, rows, GENERATE_BATCH_ROWS):
+            batch = make_exported_frame(min(GENERATE_BATCH_ROWS, rows - start), seed=start)
+            # plain strings: the categories of the batches differ in order
+            table = pa.Table.from_pandas(batch.astype({column: str for column in batch.select_dtypes('category')}),
+                                         preserve_index=False)
+            if writer is None:
+                writer = (pq.ParquetWriter(file_path, table.schema, compression='zstd') if file_path.endswith('.parquet')
+                          else pa.ipc.new_file(file_path, table.schema, options=pa.ipc.IpcWriteOptions(compression='zstd')))
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+def validate(file_path: str, chunk_rows: int, workers: int) -> dict:
+    '''runs in its own process: Output: seconds, rows & the process' peak rss'''
+    import resource
+    from src.constants import SCHEMA_FILE_PATH
+    from src.utils.main_utils import read_yaml_file, read_dataframe
+    from src.utils.schema_validation import SchemaValidator
+    validator = SchemaValidator(read_yaml_file(SCHEMA_FILE_PATH), workers=workers)
+    start = time.perf_counter()
+    if chunk_rows:
+        result = validator.validate_file(file_path, chunk_rows)
+    else:
+        dataframe = read_dataframe(file_path)
+        result = validator.validate_frame(dataframe, max(len(dataframe), 1))
+    seconds = time.perf_counter() - start
+    return {'seconds': seconds, 'rows': result.rows, 'failures': result.failures(),
+            'peak_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the chunked schema validation')
+    parser.add_argument('--rows', type=int, default=2000000)
+    parser.add_argument('--format', choices=('csv', 'parquet', 'arrow'), default='parquet')
+    parser.add_argument('--chunk-rows', type=int, nargs='+', default=[100000, 500000])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--output', type=str, default=None, help='write the json result to this file')
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, f'data.{args.format}')
+        write_data_file(file_path, args.rows)
+        runs = [(0, 1)] + [(chunk_rows, workers) for chunk_rows in args.chunk_rows for workers in args.workers]
+        for chunk_rows, workers in runs:
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                result = pool.submit(validate, file_path, chunk_rows, workers).result()
+            result.update({'chunk_rows': chunk_rows or 'whole file', 'workers': workers,
+                           'rows_per_second': result['rows'] / result['seconds']})
+            results.append(result)
+            print(f"chunk rows {result['chunk_rows']} workers {workers}: {result['rows_per_second']:.0f} rows/s, "
+                  f"peak rss {result['peak_rss_bytes'] / 1024 ** 2:.0f}MB", file=sys.stderr)
+
+    write_report(build_report(args, results), args.output)
+
+if __name__ == '__main__':
+    main()
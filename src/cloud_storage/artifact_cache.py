@@ -0,0 +1,125 @@
+import os
+import re
+import sys
+import tempfile
+from typing import Callable, Optional
+from src.constants import ARTIFACT_CACHE_DIR, ARTIFACT_CACHE_MAX_SIZE_BYTES, ARTIFACT_CACHE_ENABLED
+from src.exception import MyException
+from src.logger import logging
+from src.monitoring.metrics import registry
+from src.utils.file_lock import file_lock
+
+
+class ArtifactCache:
+    '''
+    content addressed on disk cache of S3 objects, keyed by ETag
+
+    files live in <cache_dir>/objects/<etag> & are only ever created by an atomic rename of a
+    fully written temp file. a per key lock makes concurrent processes that miss the same
+    object wait for one download instead of all fetching it; a cache wide lock serializes LRU
+    eviction (by last use) down to max_size_bytes
+    '''
+    def __init__(self, cache_dir: str = ARTIFACT_CACHE_DIR, max_size_bytes: int = ARTIFACT_CACHE_MAX_SIZE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.objects_dir = os.path.join(cache_dir, 'objects')
+        self.locks_dir = os.path.join(cache_dir, 'locks')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.locks_dir, exist_ok=True)
+
+        self.hits_counter = registry.counter('artifact_cache_hits_total', 'Artifacts served from the local cache')
+        self.misses_counter = registry.counter('artifact_cache_misses_total', 'Artifacts downloaded into the local cache')
+        self.evictions_counter = registry.counter('artifact_cache_evictions_total', 'Artifacts evicted from the local cache')
+
+    @staticmethod
+    def key_for(etag: str) -> str:
+        return re.sub(r'[^A-Za-z0-9_-]', '_', etag.strip('"'))
+
+    def path_for(self, etag: str) -> str:
+        return os.path.join(self.objects_dir, self.key_for(etag))
+
+    def _lock(self, name: str):
+        # no lock on windows: atomic renames still keep readers safe, concurrent misses may download twice
+        return file_lock(os.path.join(self.locks_dir, f'{name}.lock'))
+
+    def _touch(self, path: str) -> bool:
+        '''marks path as recently used, False when it is not cached (anymore)'''
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def get(self, etag: str) -> Optional[str]:
+        '''Output: path of the cached object, None on a miss'''
+        path = self.path_for(etag)
+        return path if self._touch(path) else None
+
+    def get_or_fetch(self, etag: str, fetch: Callable[[str], None]) -> str:
+        '''
+        Output: path of the cached object, calling fetch(temp_path) to download it on a miss
+        '''
+        try:
+            path = self.get(etag)
+            if path is not None:
+                self.hits_counter.inc()
+                return path
+
+            key = self.key_for(etag)
+            with self._lock(key):
+                # another process may have fetched it while we waited for the lock
+                path = self.path_for(etag)
+                if self._touch(path):
+                    self.hits_counter.inc()
+                    return path
+
+                file_descriptor, temp_path = tempfile.mkstemp(prefix=f'.{key}.', dir=self.objects_dir)
+                os.close(file_descriptor)
+                try:
+                    fetch(temp_path)
+                    os.replace(temp_path, path)
+                except BaseException:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                    raise
+                self.misses_counter.inc()
+                logging.info(f'Cached artifact {key} ({os.path.getsize(path)} bytes)')
+
+            self.evict(keep=path)
+            return path
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def evict(self, keep: str = None) -> None:
+        '''drops least recently used objects until the cache fits max_size_bytes'''
+        with self._lock('evict'):
+            entries = []
+            for entry in os.scandir(self.objects_dir):
+                if entry.is_file() and not entry.name.startswith('.'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total_size <= self.max_size_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    # open readers keep their file, unlinking is safe
+                    os.remove(path)
+                    total_size -= size
+                    self.evictions_counter.inc()
+                    logging.info(f'Evicted artifact {os.path.basename(path)} from the local cache')
+                except FileNotFoundError:
+                    pass
+
+_default_artifact_cache: ArtifactCache = None
+
+def default_artifact_cache() -> Optional[ArtifactCache]:
+    '''Output: the process wide cache from constants, None when disabled'''
+    global _default_artifact_cache
+    if not ARTIFACT_CACHE_ENABLED:
+        return None
+    if _default_artifact_cache is None:
+        _default_artifact_cache = ArtifactCache()
+    return _default_artifact_cache
@@ -1,27 +1,51 @@
 import boto3
 import os
 import sys
-import pickle
+import dill
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
-from typing import Union, List
+from typing import Union, List, Optional
 from pandas import DataFrame, read_csv
 from src.configuration.aws_connection import S3Client
+from src.cloud_storage.artifact_cache import ArtifactCache, default_artifact_cache
+from src.cloud_storage.object_metadata import ObjectMetadata, ObjectMetadataCache, _MISSING
+from src.cloud_storage.storage_backend import ArtifactStorage
+from src.constants import S3_TRANSFER_PART_SIZE_BYTES, S3_TRANSFER_MAX_CONCURRENCY, S3_TRANSFER_STREAM_CHUNK_BYTES
 from src.logger import logging
 from src.exception import MyException
 from mypy_boto3_s3.service_resource import Bucket
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
 
-class SimpleStorageService:
+# one process wide pool for ranged GETs: its threads live on, so each keeps its S3Client.thread_client
+# (& that client's open connections) from one download to the next
+_download_pool: ThreadPoolExecutor = None
+_download_pool_lock = threading.Lock()
+
+def download_pool() -> ThreadPoolExecutor:
+    global _download_pool
+    with _download_pool_lock:
+        if _download_pool is None:
+            _download_pool = ThreadPoolExecutor(max_workers=S3_TRANSFER_MAX_CONCURRENCY, thread_name_prefix='s3-download')
+        return _download_pool
+
+class SimpleStorageService(ArtifactStorage):
     '''interacts with AWS S3 storage & 
     provide methods for file management, data uploads & data retrieval in s3 buckets'''
 
-    def __init__(self):
+    # HEAD results shared by every instance in the process
+    metadata_cache = ObjectMetadataCache()
+
+    def __init__(self, artifact_cache: ArtifactCache = None):
         
         s3_client = S3Client()
         self.s3_resource = s3_client.s3_resource
         self.s3_client = s3_client.s3_client
+        self.artifact_cache = artifact_cache if artifact_cache is not None else default_artifact_cache()
 
     def s3_key_path_available(self, bucket_name, s3_key) -> bool:
+        '''True when any object starts with s3_key (a LIST); use object_exists for one exact key'''
         try:
             bucket = self.get_bucket(bucket_name)
             file_objects = [file_object for file_object in bucket.objects.filter(Prefix=s3_key)]
@@ -29,6 +53,43 @@ class SimpleStorageService:
         except Exception as e:
             raise MyException(e, sys) from e
     
+    def get_object_version(self, s3_key: str, bucket_name: str) -> str:
+        '''
+        Output: version id of the object (ETag when bucket versioning is off), from a single HEAD request
+        '''
+        try:
+            metadata = self.get_object_metadata(s3_key, bucket_name)
+            if metadata is None:
+                raise Exception(f'{s3_key} not found in bucket {bucket_name}')
+            return metadata.version
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def get_object_metadata(self, s3_key: str, bucket_name: str, use_cache: bool = True) -> Optional[ObjectMetadata]:
+        '''
+        Output: size, ETag, last-modified & version of exactly s3_key (one HEAD, none while cached),
+        None when the key does not exist
+        '''
+        try:
+            if use_cache:
+                metadata = self.metadata_cache.get(bucket_name, s3_key)
+                if metadata is not _MISSING:
+                    return metadata
+            try:
+                metadata = ObjectMetadata.from_head(s3_key, self.s3_client.head_object(Bucket=bucket_name, Key=s3_key))
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchKey', 'NotFound'):
+                    raise
+                metadata = None
+            self.metadata_cache.put(bucket_name, s3_key, metadata)
+            return metadata
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def object_exists(self, bucket_name: str, s3_key: str) -> bool:
+        '''True when exactly s3_key exists (a HEAD, not a prefix listing)'''
+        return self.get_object_metadata(s3_key, bucket_name) is not None
+
     @staticmethod
     def read_object(object_name: str, decode: bool = True, make_readable: bool = False) -> StringIO | str:
         '''Reads specified s# object with optional decoding & formatting
@@ -68,18 +129,153 @@ class SimpleStorageService:
         except Exception as e:
             raise MyException(e, sys) from e
         
-    def load_model(self, model_name: str, bucket_name: str, model_dir: str = None) -> object:
-        '''loads a serialized model from s3 bucket'''
+    def load_model(self, model_name: str, bucket_name: str, model_dir: str = None, if_match: str = None) -> object:
+        '''loads a serialized model from s3 bucket (only the object with ETag if_match, when given)'''
         try:
             model_file = model_dir + '/' + model_name if model_dir else model_name
-            file_object = self.get_file_object(model_file, bucket_name)
-            model_obj = self.read_object(file_object, decode=False)
-            model = pickle.loads(model_obj)
+            if self.artifact_cache is not None:
+                model_path = (self._download_cached_etag(model_file, bucket_name, if_match) if if_match is not None
+                              else self.download_cached(model_file, bucket_name))
+                with open(model_path, 'rb') as file_obj:
+                    model = dill.load(file_obj)
+                logging.info('Production model loaded from the local artifact cache')
+                return model
+            model = dill.loads(self.download_to_buffer(model_file, bucket_name, if_match=if_match))
             logging.info('Production model loaded from S3 bucekt')
             return model
         except Exception as e:
             raise MyException(e, sys) from e
         
+    def download_cached(self, s3_key: str, bucket_name: str) -> str:
+        '''
+        Output: local path of the object in the artifact cache; one HEAD checks the ETag &
+        the object is only downloaded when that ETag isn't cached yet
+        '''
+        try:
+            metadata = self.get_object_metadata(s3_key, bucket_name)
+            if metadata is None:
+                raise Exception(f'{s3_key} not found in bucket {bucket_name}')
+            try:
+                return self._download_cached_etag(s3_key, bucket_name, metadata.etag)
+            except Exception:
+                # the cached HEAD may predate a new upload: retry once with a fresh ETag
+                fresh_metadata = self.get_object_metadata(s3_key, bucket_name, use_cache=False)
+                if fresh_metadata is None or fresh_metadata.etag == metadata.etag:
+                    raise
+                return self._download_cached_etag(s3_key, bucket_name, fresh_metadata.etag)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _download_cached_etag(self, s3_key: str, bucket_name: str, etag: str) -> str:
+        # if_match: never store a newer object under the ETag we checked
+        return self.artifact_cache.get_or_fetch(
+            etag, lambda temp_path: self.download_to_file(s3_key, bucket_name, temp_path, if_match=etag))
+
+    @staticmethod
+    def _part_ranges(size: int, part_size: int) -> List[tuple]:
+        return [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+    @staticmethod
+    def _get_range(s3_key: str, bucket_name: str, start: int, end: int, if_match: str):
+        # every worker thread uses its own client
+        return S3Client.thread_client().get_object(Bucket=bucket_name, Key=s3_key, Range=f'bytes={start}-{end}',
+                                                   IfMatch=if_match)['Body']
+
+    def _parallel_ranged_get(self, s3_key: str, bucket_name: str, part_size: int, max_concurrency: int,
+                             if_match: str, write_part, allocate) -> None:
+        '''HEADs the object (uncached), allocate(size) the target, then GETs its ranges in parallel through write_part'''
+        metadata = self.get_object_metadata(s3_key, bucket_name, use_cache=False)
+        if metadata is None:
+            raise Exception(f'{s3_key} not found in bucket {bucket_name}')
+        size = metadata.size
+        # all ranges must come from the same object version
+        if_match = if_match or metadata.etag
+        allocate(size)
+        ranges = self._part_ranges(size, part_size)
+        if len(ranges) <= 1 or max_concurrency <= 1:
+            for start, end in ranges:
+                write_part(start, self._get_range(s3_key, bucket_name, start, end, if_match))
+            return
+        # the pool is shared: at most max_concurrency of this download's parts are submitted at once
+        slots = threading.BoundedSemaphore(max_concurrency)
+
+        def get_part(start: int, end: int) -> None:
+            try:
+                write_part(start, self._get_range(s3_key, bucket_name, start, end, if_match))
+            finally:
+                slots.release()
+
+        futures = []
+        for start, end in ranges:
+            slots.acquire()
+            futures.append(download_pool().submit(get_part, start, end))
+        for future in futures:
+            future.result()
+
+    def download_to_file(self, s3_key: str, bucket_name: str, file_path: str,
+                         part_size: int = S3_TRANSFER_PART_SIZE_BYTES, max_concurrency: int = S3_TRANSFER_MAX_CONCURRENCY,
+                         if_match: str = None) -> None:
+        '''
+        streams an object into file_path with parallel ranged GETs, each written at its offset
+        of the preallocated file (nothing is buffered whole in memory)
+        '''
+        try:
+            def allocate(size: int) -> None:
+                with open(file_path, 'wb') as file_obj:
+                    file_obj.truncate(size)
+
+            def write_part(offset: int, body) -> None:
+                with open(file_path, 'r+b') as file_obj:
+                    file_obj.seek(offset)
+                    for chunk in body.iter_chunks(S3_TRANSFER_STREAM_CHUNK_BYTES):
+                        file_obj.write(chunk)
+
+            self._parallel_ranged_get(s3_key, bucket_name, part_size, max_concurrency, if_match, write_part, allocate)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def download_to_buffer(self, s3_key: str, bucket_name: str, part_size: int = S3_TRANSFER_PART_SIZE_BYTES,
+                           max_concurrency: int = S3_TRANSFER_MAX_CONCURRENCY, if_match: str = None) -> bytearray:
+        '''
+        Output: the object's bytes, fetched with parallel ranged GETs into one preallocated buffer
+        '''
+        try:
+            buffer = bytearray()
+
+            def allocate(size: int) -> None:
+                buffer.extend(bytes(size))
+
+            def write_part(offset: int, body) -> None:
+                view = memoryview(buffer)
+                for chunk in body.iter_chunks(S3_TRANSFER_STREAM_CHUNK_BYTES):
+                    view[offset:offset + len(chunk)] = chunk
+                    offset += len(chunk)
+
+            self._parallel_ranged_get(s3_key, bucket_name, part_size, max_concurrency, if_match, write_part, allocate)
+            return buffer
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def read_bytes(self, s3_key: str, bucket_name: str) -> bytes:
+        return bytes(self.download_to_buffer(s3_key, bucket_name))
+
+    @staticmethod
+    def transfer_config(part_size: int = S3_TRANSFER_PART_SIZE_BYTES,
+                        max_concurrency: int = S3_TRANSFER_MAX_CONCURRENCY) -> TransferConfig:
+        '''multipart above one part, parts uploaded by max_concurrency threads'''
+        return TransferConfig(multipart_threshold=part_size, multipart_chunksize=part_size,
+                              max_concurrency=max_concurrency, use_threads=max_concurrency > 1)
+
+    def upload_fileobj(self, file_obj, to_filename: str, bucket_name: str,
+                       part_size: int = S3_TRANSFER_PART_SIZE_BYTES, max_concurrency: int = S3_TRANSFER_MAX_CONCURRENCY) -> None:
+        '''streams a binary file-like object to s3 as a multipart upload'''
+        try:
+            S3Client.thread_client().upload_fileobj(file_obj, bucket_name, to_filename,
+                                                    Config=self.transfer_config(part_size, max_concurrency))
+            self.metadata_cache.invalidate(bucket_name, to_filename)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
     def create_folder(self, folder_name: str, bucket_name: str) -> None:
         '''creates a folder in s3 bucket'''
         logging.info('Entered create_folder method of SimpleStorageService class')
@@ -91,12 +287,15 @@ class SimpleStorageService:
                 self.s3_client.put_object(Bucket=bucket_name, Key=folder_obj)
             logging.info('Exited create_folder method of SimpleStorageService class')
 
-    def upload_file(self, from_filename: str, to_filename: str, bucket_name: str, remove: bool = True):
-        '''uploads local file to a specified s3 bucket'''
+    def upload_file(self, from_filename: str, to_filename: str, bucket_name: str, remove: bool = True,
+                    part_size: int = S3_TRANSFER_PART_SIZE_BYTES, max_concurrency: int = S3_TRANSFER_MAX_CONCURRENCY):
+        '''uploads local file to a specified s3 bucket (multipart, part_size parts on max_concurrency threads)'''
         logging.info("Entered the upload_file method of SimpleStorageService class")
         try:
             logging.info(f"Uploading {from_filename} to {to_filename} in {bucket_name}")
-            self.s3_resource.meta.client.upload_file(from_filename, bucket_name, to_filename)
+            S3Client.thread_client().upload_file(from_filename, bucket_name, to_filename,
+                                                 Config=self.transfer_config(part_size, max_concurrency))
+            self.metadata_cache.invalidate(bucket_name, to_filename)
             logging.info(f"Uploaded {from_filename} to {to_filename} in {bucket_name}")
 
             if remove:
@@ -124,8 +323,8 @@ class SimpleStorageService:
         """
         logging.info("Entered the get_df_from_object method of SimpleStorageService class")
         try:
-            content = self.read_object(object_, make_readable=True)
-            df = read_csv(content, na_values="na")
+            # parse straight from the response stream, no decoded copy / StringIO of the whole file
+            df = read_csv(object_.get()['Body'], na_values="na")
             logging.info("Exited the get_df_from_object method of SimpleStorageService class")
             return df
         except Exception as e:
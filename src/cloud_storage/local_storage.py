@@ -0,0 +1,90 @@
+import os
+import sys
+import dill
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from typing import Optional
+from src.exception import MyException
+from src.logger import logging
+from src.cloud_storage.object_metadata import ObjectMetadata
+from src.cloud_storage.storage_backend import ArtifactStorage
+
+class LocalFileStorage(ArtifactStorage):
+    '''
+    S3 stand in on the local filesystem: bucket_name/s3_key is a file under root_dir, for single
+    node deployments, offline pipeline runs & benchmarks at local disk latency
+    '''
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+
+    def object_path(self, s3_key: str, bucket_name: str) -> str:
+        path = os.path.normpath(os.path.join(self.root_dir, bucket_name, s3_key))
+        if not path.startswith(os.path.normpath(os.path.join(self.root_dir, bucket_name)) + os.sep):
+            raise ValueError(f'Key {s3_key} points outside of bucket {bucket_name}')
+        return path
+
+    @staticmethod
+    def _etag(stat: os.stat_result) -> str:
+        # uploads replace the file, so (mtime, size) changes with every new object like an ETag
+        return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+    def get_object_metadata(self, s3_key: str, bucket_name: str, use_cache: bool = True) -> Optional[ObjectMetadata]:
+        '''every call stats the file, use_cache is only there for the interface'''
+        try:
+            stat = os.stat(self.object_path(s3_key, bucket_name))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            raise MyException(e, sys) from e
+        return ObjectMetadata(key=s3_key, size=stat.st_size, etag=self._etag(stat),
+                              last_modified=datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc))
+
+    def get_object_version(self, s3_key: str, bucket_name: str) -> str:
+        try:
+            metadata = self.get_object_metadata(s3_key, bucket_name)
+            if metadata is None:
+                raise Exception(f'{s3_key} not found in bucket {bucket_name}')
+            return metadata.version
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def load_model(self, model_name: str, bucket_name: str, model_dir: str = None, if_match: str = None) -> object:
+        try:
+            model_file = model_dir + '/' + model_name if model_dir else model_name
+            with open(self.object_path(model_file, bucket_name), 'rb') as file_obj:
+                # the open file is the object read, whatever is renamed over the path meanwhile
+                if if_match is not None and self._etag(os.fstat(file_obj.fileno())) != if_match:
+                    raise Exception(f'{model_file} was replaced, its ETag is no longer {if_match}')
+                model = dill.load(file_obj)
+            logging.info(f'Production model loaded from {self.root_dir}')
+            return model
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def read_bytes(self, s3_key: str, bucket_name: str) -> bytes:
+        try:
+            with open(self.object_path(s3_key, bucket_name), 'rb') as file:
+                return file.read()
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def upload_file(self, from_filename: str, to_filename: str, bucket_name: str, remove: bool = True):
+        '''copies to a temp file next to the target & renames it into place'''
+        try:
+            path = self.object_path(to_filename, bucket_name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            file_descriptor, temp_path = tempfile.mkstemp(prefix='.upload-', dir=os.path.dirname(path))
+            os.close(file_descriptor)
+            try:
+                shutil.copyfile(from_filename, temp_path)
+                os.replace(temp_path, path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            logging.info(f'Uploaded {from_filename} to {path}')
+            if remove:
+                os.remove(from_filename)
+        except Exception as e:
+            raise MyException(e, sys) from e
@@ -0,0 +1,67 @@
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from src.constants import S3_METADATA_CACHE_TTL_SECONDS
+from src.monitoring.metrics import registry
+
+@dataclass(frozen=True)
+class ObjectMetadata:
+    '''what a HEAD request tells about one exact S3 key'''
+    key: str
+    size: int
+    etag: str
+    last_modified: datetime
+    version_id: Optional[str] = None
+
+    @property
+    def version(self) -> str:
+        '''version id of the object, its ETag when bucket versioning is off'''
+        if self.version_id and self.version_id != 'null':
+            return self.version_id
+        return self.etag.strip('"')
+
+    @classmethod
+    def from_head(cls, key: str, response: dict) -> 'ObjectMetadata':
+        return cls(key=key, size=response['ContentLength'], etag=response['ETag'],
+                   last_modified=response.get('LastModified'), version_id=response.get('VersionId'))
+
+_MISSING = object()
+
+class ObjectMetadataCache:
+    '''
+    short lived, process wide cache of HEAD results keyed by (bucket, key); a missing key is
+    cached too (as None), so repeated existence checks within ttl_seconds cost no request
+    '''
+    def __init__(self, ttl_seconds: float = S3_METADATA_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[Tuple[str, str], Tuple[float, Optional[ObjectMetadata]]] = {}
+        self._lock = threading.Lock()
+
+        self.hits_counter = registry.counter('s3_metadata_cache_hits_total', 'S3 HEAD results served from memory')
+        self.misses_counter = registry.counter('s3_metadata_cache_misses_total', 'S3 HEAD requests sent')
+
+    def get(self, bucket_name: str, s3_key: str):
+        '''Output: cached ObjectMetadata / None (known missing), _MISSING when not cached'''
+        with self._lock:
+            entry = self._entries.get((bucket_name, s3_key))
+            if entry is None or entry[0] < time.monotonic():
+                self.misses_counter.inc()
+                return _MISSING
+        self.hits_counter.inc()
+        return entry[1]
+
+    def put(self, bucket_name: str, s3_key: str, metadata: Optional[ObjectMetadata]) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[(bucket_name, s3_key)] = (time.monotonic() + self.ttl_seconds, metadata)
+
+    def invalidate(self, bucket_name: str, s3_key: str) -> None:
+        with self._lock:
+            self._entries.pop((bucket_name, s3_key), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,48 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+from src.constants import STORAGE_BACKEND, LOCAL_STORAGE_ROOT
+from src.cloud_storage.object_metadata import ObjectMetadata
+
+class ArtifactStorage(ABC):
+    '''
+    where models are pushed to & served from; Proj1Estimator, ModelEvaluation & ModelPusher
+    only use these methods, so the backend (S3 or a local directory) is a deployment choice
+    '''
+    @abstractmethod
+    def get_object_metadata(self, s3_key: str, bucket_name: str, use_cache: bool = True) -> Optional[ObjectMetadata]:
+        '''Output: metadata of exactly s3_key, None when it does not exist (use_cache=False: never a cached result)'''
+
+    def object_exists(self, bucket_name: str, s3_key: str) -> bool:
+        return self.get_object_metadata(s3_key, bucket_name) is not None
+
+    @abstractmethod
+    def get_object_version(self, s3_key: str, bucket_name: str) -> str:
+        '''Output: identifier that changes whenever the object is replaced'''
+
+    @abstractmethod
+    def load_model(self, model_name: str, bucket_name: str, model_dir: str = None, if_match: str = None) -> object:
+        '''
+        Output: the deserialized model; with if_match only the object with that ETag is read,
+        an object replaced since raises instead of being loaded under the old version
+        '''
+
+    @abstractmethod
+    def read_bytes(self, s3_key: str, bucket_name: str) -> bytes:
+        '''Output: content of a (small) object, e.g. the drift reference next to the model'''
+
+    @abstractmethod
+    def upload_file(self, from_filename: str, to_filename: str, bucket_name: str, remove: bool = True):
+        '''publishes a local file as to_filename, readers see either the old or the new object'''
+
+def create_storage(backend: str = STORAGE_BACKEND) -> ArtifactStorage:
+    '''
+    Output: storage for backend ("s3" or "local"); the S3 backend (& boto3) is only
+    imported when chosen, so the local one needs no AWS packages or credentials
+    '''
+    if backend == 's3':
+        from src.cloud_storage.aws_storage import SimpleStorageService
+        return SimpleStorageService()
+    if backend == 'local':
+        from src.cloud_storage.local_storage import LocalFileStorage
+        return LocalFileStorage(LOCAL_STORAGE_ROOT)
+    raise ValueError(f'Unknown storage backend {backend!r}, expected "s3" or "local"')
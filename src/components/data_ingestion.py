@@ -1,5 +1,6 @@
 import os
 import sys
+from typing import Optional
 from pandas import DataFrame
 from sklearn.model_selection import train_test_split
 from src.entity.config_entity import DataIngestionConfig
@@ -7,34 +8,122 @@ from src.entity.artifact_entity import DataIngestionArtifact
 from src.exception import MyException
 from src.logger import logging
 from src.data_access.proj1_data import Proj1Data
+from src.data_access.feature_store import FeatureStore
+from src.entity.artifact_store import ArtifactStore
+from src.entity.s3_estimator import Proj1Estimator
+from src.monitoring.drift import DriftSketch, drift_report
+from src.constants import DRIFT_CURRENT_FILE_NAME
+from src.utils.main_utils import write_dataframe, read_yaml_file, write_yaml_file
 
 class DataIngestion:
-    def __init__(self, data_ingestion_config: DataIngestionConfig = DataIngestionConfig()):
+    def __init__(self, data_ingestion_config: DataIngestionConfig = DataIngestionConfig(),
+                 artifact_store: ArtifactStore = None):
 
         try:
             self.data_ingestion_config = data_ingestion_config
+            # without a pipeline's store every artifact goes through disk
+            self.artifact_store = artifact_store or ArtifactStore(max_bytes=0)
+            # set by incremental runs that could compare the new data with the production model's
+            self.drift_report: Optional[dict] = None
         except Exception as e:
             raise MyException(e, sys)
         
+    def _export(self, my_data: Proj1Data, min_object_id: str = None, sort: bool = None) -> DataFrame:
+        '''one streaming cursor (in _id order when sort), or _id ranges on export_workers threads (always in _id order)'''
+        config = self.data_ingestion_config
+        if config.export_workers > 1:
+            return my_data.export_collection_parallel(collection_name=config.collection_name, workers=config.export_workers,
+                                                      batch_size=config.export_batch_size, min_object_id=min_object_id)
+        return my_data.export_collection_streaming(collection_name=config.collection_name,
+                                                   batch_size=config.export_batch_size, min_object_id=min_object_id,
+                                                   sort=sort)
+
     def export_data_into_feature_store(self) -> DataFrame:
         """
         exports data from MongoDb to csv file
         """
         try:
+            if self.data_ingestion_config.incremental:
+                return self.export_new_data_into_feature_store()
             logging.info(f'Exporting data from MongoDB')
             my_data = Proj1Data()
-            dataframe = my_data.export_collection_as_datafram(collection_name=self.data_ingestion_config.collection_name)
+            dataframe = self._export(my_data)
             logging.info(f'Shape of DataFrame: {dataframe.shape}')
             feature_store_file_path = self.data_ingestion_config.feature_store_file_path
             dir_path = os.path.dirname(feature_store_file_path)
             os.makedirs(dir_path, exist_ok=True)
             logging.info(f'Saving exported data into feature store file path: {feature_store_file_path}')
-            dataframe.to_csv(feature_store_file_path, index=False, header=True)
+            write_dataframe(dataframe, feature_store_file_path)
             return dataframe
         
         except Exception as e:
             raise MyException(e, sys)
         
+    def export_new_data_into_feature_store(self) -> DataFrame:
+        """
+        exports only documents added since the last run (past the _id watermark) & appends them
+        as a partition of the persistent feature store, so export time follows the new data
+        instead of the collection size (documents updated in place are not picked up)
+
+        Output  :   all data in the feature store
+        """
+        try:
+            feature_store = FeatureStore(self.data_ingestion_config.persistent_feature_store_dir)
+            with feature_store.lock():
+                watermark = feature_store.watermark
+                logging.info(f'Exporting documents after _id {watermark} from MongoDB')
+                my_data = Proj1Data()
+                # partitions in _id order, also on the first run (no watermark yet)
+                new_data = self._export(my_data, min_object_id=watermark, sort=True)
+                logging.info(f'{len(new_data)} new documents exported')
+                feature_store.append(new_data)
+                if len(new_data):
+                    self.drift_report = self.update_drift(feature_store, new_data)
+            dataframe = feature_store.read()
+            logging.info(f'Shape of DataFrame: {dataframe.shape}')
+            return dataframe
+
+        except Exception as e:
+            raise MyException(e, sys)
+
+    def update_drift(self, feature_store: FeatureStore, new_data: DataFrame) -> Optional[dict]:
+        '''
+        folds new_data into the feature store's sketch of everything added since the production
+        model was trained (reset when another model is pushed) & scores that sketch against the
+        model's drift reference, so each run only summarizes its own new documents
+
+        Output: drift report (also written to drift_report_file_path), None without a production
+        model / reference. advisory: a failed check is logged & never fails the ingestion
+        '''
+        try:
+            config = self.data_ingestion_config
+            estimator = Proj1Estimator(config.model_bucket_name, config.model_file_path, storage_backend=config.storage_backend)
+            reference = estimator.load_drift_reference()
+            if reference is None:
+                logging.info('Production model has no drift reference, drift not checked')
+                return None
+            model_version = estimator.get_model_version()
+
+            current_file_path = os.path.join(feature_store.store_dir, DRIFT_CURRENT_FILE_NAME)
+            current = reference.empty_like()
+            if os.path.exists(current_file_path):
+                saved = read_yaml_file(current_file_path)
+                if saved.get('model_version') == model_version:
+                    current = DriftSketch.from_dict(saved['sketch'])
+            current.update(new_data)
+            temp_file_path = os.path.join(feature_store.store_dir, f'.{DRIFT_CURRENT_FILE_NAME}')
+            write_yaml_file(temp_file_path, {'model_version': model_version, 'sketch': current.to_dict()})
+            os.replace(temp_file_path, current_file_path)
+
+            report = {'model_version': model_version, **drift_report(reference, current)}
+            write_yaml_file(config.drift_report_file_path, report)
+            logging.info(f"Drift since model {model_version}: {report['current_rows']} rows, "
+                         f"drifted features {report['drifted_features']}")
+            return report
+        except Exception as e:
+            logging.warning(f'Drift check failed: {e}')
+            return None
+
     def split_data_as_train_test(self, dataframe: DataFrame) -> None:
         """
         splits dataframe into test-train sets
@@ -50,8 +139,10 @@ class DataIngestion:
             dir_path = os.path.dirname(self.data_ingestion_config.training_file_path)
             os.makedirs(dir_path, exist_ok=True)
             logging.info('Exporting test & train file path')
-            train_set.to_csv(self.data_ingestion_config.training_file_path, index=False, header=True)
-            test_set.to_csv(self.data_ingestion_config.testing_file_path, index=False, header=True)
+            # reset index: the kept frames match what reading the files back gives
+            save = lambda file_path, df: write_dataframe(df, file_path)
+            self.artifact_store.put(self.data_ingestion_config.training_file_path, train_set.reset_index(drop=True), save)
+            self.artifact_store.put(self.data_ingestion_config.testing_file_path, test_set.reset_index(drop=True), save)
             logging.info('Exported test & train file path')
         
         except Exception as e:
@@ -70,6 +161,9 @@ class DataIngestion:
             logging.info('Exited initiate_data_ingestion method of Data_Ingestion class')
             data_ingestion_artifact = DataIngestionArtifact(trained_file_path=self.data_ingestion_config.training_file_path,
                                                             test_file_path=self.data_ingestion_config.testing_file_path)
+            if self.drift_report is not None:
+                data_ingestion_artifact.drift_report_file_path = self.data_ingestion_config.drift_report_file_path
+                data_ingestion_artifact.retrain_recommended = self.drift_report['retrain_recommended']
             logging.info(f'Data Ingestion artifacts: {data_ingestion_artifact}')
             return data_ingestion_artifact
         except Exception as e:
@@ -10,24 +10,28 @@ from src.entity.config_entity import DataTransformationConfig
 from src.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact, DataTransformationArtifact
 from src.exception import MyException
 from src.logger import logging
-from src.utils.main_utils import save_object, save_np_array_data, read_yaml_file
+from src.utils.main_utils import save_object, save_np_array_data, read_yaml_file, read_dataframe
+from src.entity.artifact_store import ArtifactStore
+from src.monitoring.drift import DriftSketch
 
 class DataTransformation:
     def __init__(self, data_ingestion_artifact: DataIngestionArtifact,
                  data_validation_artifact: DataValidationArtifact,
-                 data_transformation_config: DataTransformationConfig):
+                 data_transformation_config: DataTransformationConfig,
+                 artifact_store: ArtifactStore = None):
         try:
             self.data_ingestion_artifact = data_ingestion_artifact
             self.data_validation_artifact = data_validation_artifact
             self.data_transformation_config = data_transformation_config
+            self.artifact_store = artifact_store or ArtifactStore(max_bytes=0)
             self._schema_config = read_yaml_file(SCHEMA_FILE_PATH)
         except Exception as e:
             raise MyException(e, sys) from e
         
     @staticmethod
-    def read_data(file_path) -> pd.DataFrame:
+    def read_data(file_path, columns: list = None) -> pd.DataFrame:
         try:
-            return pd.read_csv(file_path)
+            return read_dataframe(file_path, columns)
         except Exception as e:
             raise MyException(e, sys) from e
     
@@ -102,14 +106,23 @@ class DataTransformation:
             if not self.data_validation_artifact.validation_status:
                 raise Exception(self.data_validation_artifact.message)
             
-            train_df = self.read_data(self.data_ingestion_artifact.trained_file_path)
-            test_df = self.read_data(self.data_ingestion_artifact.test_file_path)
+            # only the model's columns (& target): the _id strings are never parsed
+            model_columns = set(self._schema_config['numerical_columns'] + self._schema_config['categorical_columns'])
+            columns = [name for column in self._schema_config['columns'] for name in column if name in model_columns]
+            # a partial read from disk isn't kept: the resident frame must stay the whole file
+            read_columns = lambda file_path: self.read_data(file_path, columns)
+            train_df = self.artifact_store.get(self.data_ingestion_artifact.trained_file_path, read_columns, keep=False)[columns]
+            test_df = self.artifact_store.get(self.data_ingestion_artifact.test_file_path, read_columns, keep=False)[columns]
             logging.info('Train/Test data loaded')
 
-            input_feature_train_df = train_df.drop(columns=[TARGET_COLUMN], axis=1)
+            # raw training features summarized for drift checks of later data against this model
+            DriftSketch.from_reference(train_df, self._schema_config).save(self.data_transformation_config.drift_reference_file_path)
+            logging.info('Drift reference of the training data saved')
+
+            input_feature_train_df = train_df.drop(columns=[TARGET_COLUMN])
             target_feature_train_df = train_df[TARGET_COLUMN]
 
-            input_feature_test_df = test_df.drop(columns=[TARGET_COLUMN], axis=1)
+            input_feature_test_df = test_df.drop(columns=[TARGET_COLUMN])
             target_feature_test_df = test_df[TARGET_COLUMN]
             logging.info('Input & Target colums defined for both train/test df')
 
@@ -148,15 +161,16 @@ class DataTransformation:
             test_arr = np.c_[input_feature_test_final, np.array(target_feature_test_final)]
             logging.info('feature-target concatenation done for train/test df')
 
-            save_object(self.data_transformation_config.transformed_object_file_path, preprocessor)
-            save_np_array_data(self.data_transformation_config.transformed_train_file_path, train_arr)
-            save_np_array_data(self.data_transformation_config.transformed_test_file_path, test_arr)
+            self.artifact_store.put(self.data_transformation_config.transformed_object_file_path, preprocessor, save_object)
+            self.artifact_store.put(self.data_transformation_config.transformed_train_file_path, train_arr, save_np_array_data)
+            self.artifact_store.put(self.data_transformation_config.transformed_test_file_path, test_arr, save_np_array_data)
             logging.info('saving transformation object & transformed files')
 
             return DataTransformationArtifact(
                 self.data_transformation_config.transformed_object_file_path,
                 self.data_transformation_config.transformed_train_file_path,
-                self.data_transformation_config.transformed_test_file_path
+                self.data_transformation_config.transformed_test_file_path,
+                self.data_transformation_config.drift_reference_file_path
             )
         except Exception as e:
             raise MyException(e, sys) from e
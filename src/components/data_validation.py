@@ -1,21 +1,22 @@
-import json
-import os
 import sys
-import pandas as pd
 from pandas import DataFrame
 from src.exception import MyException
 from src.logger import logging
-from src.utils.main_utils import read_yaml_file
+from src.utils.main_utils import read_yaml_file, write_yaml_file, read_dataframe
+from src.utils.schema_validation import SchemaValidator, ValidationResult
 from src.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact
 from src.entity.config_entity import DataValidationConfig
 from src.constants import SCHEMA_FILE_PATH
+from src.entity.artifact_store import ArtifactStore
 
 class DataValidation:
-    def __init__(self, data_ingestion_artifact: DataIngestionArtifact, data_validation_config: DataValidationConfig):
+    def __init__(self, data_ingestion_artifact: DataIngestionArtifact, data_validation_config: DataValidationConfig,
+                 artifact_store: ArtifactStore = None):
 
         try:
             self.data_ingestion_artifact = data_ingestion_artifact
             self.data_validation_config = data_validation_config
+            self.artifact_store = artifact_store or ArtifactStore(max_bytes=0)
             self._schema_config = read_yaml_file(SCHEMA_FILE_PATH)
         except Exception as e:
             raise MyException(e, sys)
@@ -62,10 +63,24 @@ class DataValidation:
     @staticmethod
     def read_data(file_path) -> DataFrame:
         try:
-            return pd.read_csv(file_path)
+            return read_dataframe(file_path)
         except Exception as e:
             raise MyException(e, sys)
         
+    def validate_file(self, file_path: str, validator: SchemaValidator) -> ValidationResult:
+        '''
+        runs the schema checks over the frame the ingestion left in memory, else streams the file
+
+        Output: ValidationResult (per column stats & the header for the column checks)
+        '''
+        try:
+            dataframe = self.artifact_store.resident(file_path)
+            if dataframe is not None:
+                return validator.validate_frame(dataframe, self.data_validation_config.chunk_rows)
+            return validator.validate_file(file_path, self.data_validation_config.chunk_rows)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
     def initiate_data_validation(self) -> DataValidationArtifact:
         '''
         Output: bool vals based on validation results
@@ -73,53 +88,60 @@ class DataValidation:
         try:
             validation_error_msg = ''
             logging.info('Starting Data Validation')
-            train_df, test_df = (DataValidation.read_data(file_path=self.data_ingestion_artifact.trained_file_path),
-                                 DataValidation.read_data(file_path=self.data_ingestion_artifact.test_file_path))
+            validator = SchemaValidator(self._schema_config, workers=self.data_validation_config.workers)
+            train_result = self.validate_file(self.data_ingestion_artifact.trained_file_path, validator)
+            test_result = self.validate_file(self.data_ingestion_artifact.test_file_path, validator)
             
-            status = self.validate_num_of_columns(train_df)
+            status = self.validate_num_of_columns(train_result.header)
             if not status:
-                validation_error_msg += 'columns are missing in training datatframe'
+                validation_error_msg += 'columns are missing in training datatframe. '
             else:
                 logging.info(f'All required columns present in training dataframe: {status}')
 
-            status = self.validate_num_of_columns(test_df)
+            status = self.validate_num_of_columns(test_result.header)
             if not status:
-                validation_error_msg += 'columns are missing in testing datatframe'
+                validation_error_msg += 'columns are missing in testing datatframe. '
             else:
                 logging.info(f'All required columns present in testing dataframe: {status}')
 
-            status = self.is_column_exist(train_df)
+            status = self.is_column_exist(train_result.header)
             if not status:
-                validation_error_msg += 'columns are having datatype mismatch in training datatframe'
+                validation_error_msg += 'numerical/categorical columns are missing in training datatframe. '
             else:
-                logging.info(f'All required columns have correct datatypes in training dataframe: {status}')
+                logging.info(f'All numerical/categorical columns exist in training dataframe: {status}')
 
-            status = self.is_column_exist(test_df)
+            status = self.is_column_exist(test_result.header)
             if not status:
-                validation_error_msg += 'columns are having datatype mismatch in testing datatframe'
+                validation_error_msg += 'numerical/categorical columns are missing in testing datatframe. '
             else:
-                logging.info(f'All required columns have correct datatypes in testing dataframe: {status}')
+                logging.info(f'All numerical/categorical columns exist in testing dataframe: {status}')
+
+            for name, result in (('training', train_result), ('testing', test_result)):
+                failures = result.failures(self.data_validation_config.max_invalid_fraction)
+                if failures:
+                    validation_error_msg += f'{name} datatframe failed schema checks: {"; ".join(failures)}. '
+                elif result.failures():
+                    logging.warning(f'{name} dataframe within the invalid fraction, passed with: {"; ".join(result.failures())}')
+                else:
+                    logging.info(f'Dtypes, nulls, values & ids valid in {name} dataframe ({result.rows} rows)')
 
             validation_status = len(validation_error_msg) == 0
 
             data_validation_artifact = DataValidationArtifact(
                 validation_status= validation_status,
-                message= validation_error_msg,
+                message= validation_error_msg.strip(),
                 validation_report_file_path=self.data_validation_config.validation_report_file_path
             )
 
-            report_dir = os.path.dirname(self.data_validation_config.validation_report_file_path)
-            os.makedirs(report_dir, exist_ok=True)
-
             validation_report = {
                 'validation_status': validation_status,
-                'message': validation_error_msg.strip()
+                'message': validation_error_msg.strip(),
+                'train': train_result.to_report(),
+                'test': test_result.to_report()
             }
+            write_yaml_file(self.data_validation_config.validation_report_file_path, validation_report)
 
-            with open(self.data_validation_config.validation_report_file_path, 'w') as report_file:
-                json.dump(validation_report, report_file, indent=4)
-
-            logging.info('Data validation artifact created & saved to json file')
+            logging.info('Data validation artifact created & saved to yaml file')
             logging.info(f'Data validation artifact: {data_validation_artifact}')
             return data_validation_artifact
         except Exception as e:
@@ -6,10 +6,11 @@ from sklearn.metrics import f1_score
 from src.exception import MyException
 from src.logger import logging
 from src.constants import TARGET_COLUMN
-from src.utils.main_utils import load_object
+from src.utils.main_utils import load_object, read_dataframe
 from src.entity.config_entity import ModelEvaluationConfig
 from src.entity.artifact_entity import DataIngestionArtifact, ModelTrainerArtifact, ModelEvaluationArtifact
 from src.entity.s3_estimator import Proj1Estimator
+from src.entity.artifact_store import ArtifactStore
 
 @dataclass
 class EvaluateModelResponse:
@@ -21,11 +22,13 @@ class EvaluateModelResponse:
 class ModelEvaluation:
     def __init__(self, model_eval_config: ModelEvaluationConfig,
                  data_ingestion_artifact: DataIngestionArtifact,
-                 model_trainer_artifact: ModelTrainerArtifact):
+                 model_trainer_artifact: ModelTrainerArtifact,
+                 artifact_store: ArtifactStore = None):
         try:
             self.model_eval_config = model_eval_config
             self.data_ingestion_artifact = data_ingestion_artifact
             self.model_trainer_artifact = model_trainer_artifact
+            self.artifact_store = artifact_store or ArtifactStore(max_bytes=0)
         except Exception as e:
             raise MyException(e, sys) from e
         
@@ -33,7 +36,8 @@ class ModelEvaluation:
         try:
             bucket_name = self.model_eval_config.bucket_name
             model_path = self.model_eval_config.s3_model_key_path
-            proj1_estimator = Proj1Estimator(bucket_name, model_path)
+            proj1_estimator = Proj1Estimator(bucket_name, model_path,
+                                             storage_backend=self.model_eval_config.storage_backend)
 
             if proj1_estimator.is_model_present(model_path):
                 return proj1_estimator
@@ -71,7 +75,7 @@ class ModelEvaluation:
     def evaluate_model(self) -> EvaluateModelResponse:
         '''evaluates trained model with production model & chooses the best model'''
         try:
-            test_df = pd.read_csv(self.data_ingestion_artifact.test_file_path)
+            test_df = self.artifact_store.get(self.data_ingestion_artifact.test_file_path, read_dataframe)
             x, y = test_df.drop(TARGET_COLUMN, axis=1), test_df[TARGET_COLUMN]
             logging.info('Test data loaded & mow transforming it for predictions')
 
@@ -80,7 +84,7 @@ class ModelEvaluation:
             x = self._create_dummy_columns(x)
             x = self._rename_columns(x)
             
-            trained_model = load_object(self.model_trainer_artifact.trained_model_file_path)
+            trained_model = self.artifact_store.get(self.model_trainer_artifact.trained_model_file_path, load_object)
             logging.info('Trained model loaded/exists')
             trained_model_f1_score = self.model_trainer_artifact.metric_artifact.f1_score
             logging.info(f'f1 score for this model: {trained_model_f1_score}')
@@ -1,24 +1,30 @@
+import os
 import sys
 from src.logger import logging
 from src.exception import MyException
 from src.entity.s3_estimator import Proj1Estimator
+from src.monitoring.drift import drift_reference_path
 from src.entity.config_entity import ModelPusherConfig
 from src.entity.artifact_entity import ModelEvaluationArtifact, ModelPusherArtifact
-from src.cloud_storage.aws_storage import SimpleStorageService
 
 class ModelPusher:
     def __init__(self, model_evaluation_artifact: ModelEvaluationArtifact,
                  model_pusher_config: ModelPusherConfig):
-        self.s3 = SimpleStorageService()
         self.model_evaluation_artifact = model_evaluation_artifact
         self.model_pusher_config = model_pusher_config
-        self.proj1_estimator = Proj1Estimator(model_pusher_config.bucket_name, model_pusher_config.s3_model_key_path)
+        self.proj1_estimator = Proj1Estimator(model_pusher_config.bucket_name, model_pusher_config.s3_model_key_path,
+                                              storage_backend=model_pusher_config.storage_backend)
 
     def initiate_model_pusher(self) -> ModelPusherArtifact:
         logging.info('Entered initiate_model_pusher method of ModelPusher class')
 
         try:
             print('____________________________________________________________________________________________________________________')
+            drift_reference_file = drift_reference_path(self.model_evaluation_artifact.trained_model_path)
+            if os.path.exists(drift_reference_file):
+                # before the model, so a serving model always finds its own reference
+                self.proj1_estimator.save_drift_reference(drift_reference_file)
+                logging.info('Uploaded drift reference of the new model')
             logging.info('Uploading new model to s3 bucket')
             self.proj1_estimator.save_model(self.model_evaluation_artifact.trained_model_path)
             model_pusher_artifact = ModelPusherArtifact(self.model_pusher_config.bucket_name,
@@ -1,3 +1,4 @@
+import shutil
 import sys
 from typing import Tuple
 import numpy as np
@@ -9,12 +10,16 @@ from src.utils.main_utils import load_np_array_data, load_object, save_object
 from src.entity.config_entity import ModelTrainerConfig
 from src.entity.artifact_entity import DataTransformationArtifact, ClassificationMetricArtifact, ModelTrainerArtifact
 from src.entity.estimator import MyModel
+from src.entity.artifact_store import ArtifactStore
+from src.monitoring.drift import drift_reference_path
 
 class ModelTrainer:
     def __init__(self, data_transformation_artifact: DataTransformationArtifact,
-                 model_trainer_config: ModelTrainerConfig):
+                 model_trainer_config: ModelTrainerConfig,
+                 artifact_store: ArtifactStore = None):
         self.data_tansformation_artifact = data_transformation_artifact
         self.model_trainer_config = model_trainer_config
+        self.artifact_store = artifact_store or ArtifactStore(max_bytes=0)
 
     def get_model_object_and_report(self, train: np.array, test: np.array) -> Tuple[object, object]:
         '''
@@ -61,14 +66,14 @@ class ModelTrainer:
             print('_____________________________________________________________________________')
             print('Starting Model Trainer Component')
 
-            train_arr = load_np_array_data(self.data_tansformation_artifact.transformed_train_file_path)
-            test_arr = load_np_array_data(self.data_tansformation_artifact.transformed_test_file_path)
+            train_arr = self.artifact_store.get(self.data_tansformation_artifact.transformed_train_file_path, load_np_array_data)
+            test_arr = self.artifact_store.get(self.data_tansformation_artifact.transformed_test_file_path, load_np_array_data)
             logging.info('train/test data loaded')
 
             trained_model, metric_artifact = self.get_model_object_and_report(train_arr, test_arr)
             logging.info('Model object & artifact loaded')
 
-            preprocessing_obj = load_object(self.data_tansformation_artifact.transformed_object_file_path)
+            preprocessing_obj = self.artifact_store.get(self.data_tansformation_artifact.transformed_object_file_path, load_object)
             logging.info('Preprocessing object loaded')
 
             if accuracy_score(train_arr[:,-1], trained_model.predict(train_arr[:,:-1])) < self.model_trainer_config.expected_accuracy:
@@ -77,8 +82,12 @@ class ModelTrainer:
             
             logging.info('Saving new model as performance is better than the previous one')
             my_model = MyModel(preprocessing_obj, trained_model)
-            save_object(self.model_trainer_config.trained_model_file_path, my_model)
+            self.artifact_store.put(self.model_trainer_config.trained_model_file_path, my_model, save_object)
             logging.info('Saved final model object includes both preprocessing & trained model')
+            if self.data_tansformation_artifact.drift_reference_file_path is not None:
+                shutil.copyfile(self.data_tansformation_artifact.drift_reference_file_path,
+                                drift_reference_path(self.model_trainer_config.trained_model_file_path))
+                logging.info('Drift reference saved next to the model')
 
             model_trainer_artifact = ModelTrainerArtifact(
                 self.model_trainer_config.trained_model_file_path,
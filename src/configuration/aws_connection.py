@@ -1,21 +1,19 @@
 import boto3
 import os
-from src.constants import AWS_ACCESS_KEY_ID_ENV_KEY, AWS_SECRET_ACCESS_KEY_ENV_KEY, REGION_NAME
+import threading
+from botocore.config import Config
+from src.constants import AWS_ACCESS_KEY_ID_ENV_KEY, AWS_SECRET_ACCESS_KEY_ENV_KEY, REGION_NAME, S3_TRANSFER_MAX_CONCURRENCY
 
 class S3Client:
     s3_client = None
     s3_resource = None
+    _thread_local = threading.local()
 
     def __init__(self, region_name=REGION_NAME):
         '''gets aws creds from env_variable & creates a connection with s3 bucket'''
 
         if S3Client.s3_resource == None or S3Client.s3_client == None:
-            __access_key_id = os.getenv(AWS_ACCESS_KEY_ID_ENV_KEY)
-            __secret_access_key = os.getenv(AWS_SECRET_ACCESS_KEY_ENV_KEY)
-            if __access_key_id is None:
-                raise Exception(f'Environment variable: {AWS_ACCESS_KEY_ID_ENV_KEY} is not set')
-            if __secret_access_key is None:
-                raise Exception(f'Environment variable: {AWS_SECRET_ACCESS_KEY_ENV_KEY} is not set')
+            __access_key_id, __secret_access_key = S3Client._credentials()
             
             S3Client.s3_resource = boto3.resource('s3',
                                                   aws_access_key_id = __access_key_id,
@@ -26,4 +24,31 @@ class S3Client:
                                               aws_secret_access_key = __secret_access_key,
                                               region_name = region_name)
             self.s3_resource = S3Client.s3_resource
-            self.s3_client = S3Client.s3_client
\ No newline at end of file
+            self.s3_client = S3Client.s3_client
+
+    @staticmethod
+    def _credentials():
+        access_key_id = os.getenv(AWS_ACCESS_KEY_ID_ENV_KEY)
+        secret_access_key = os.getenv(AWS_SECRET_ACCESS_KEY_ENV_KEY)
+        if access_key_id is None:
+            raise Exception(f'Environment variable: {AWS_ACCESS_KEY_ID_ENV_KEY} is not set')
+        if secret_access_key is None:
+            raise Exception(f'Environment variable: {AWS_SECRET_ACCESS_KEY_ENV_KEY} is not set')
+        return access_key_id, secret_access_key
+
+    @staticmethod
+    def thread_client(region_name=REGION_NAME):
+        '''
+        s3 client owned by the calling thread (own session & connection pool), for parallel
+        transfers; the shared class level resource must not be used from several threads
+        '''
+        client = getattr(S3Client._thread_local, 'client', None)
+        if client is None:
+            access_key_id, secret_access_key = S3Client._credentials()
+            client = boto3.session.Session().client('s3',
+                                                    aws_access_key_id = access_key_id,
+                                                    aws_secret_access_key = secret_access_key,
+                                                    region_name = region_name,
+                                                    config = Config(max_pool_connections=S3_TRANSFER_MAX_CONCURRENCY))
+            S3Client._thread_local.client = client
+        return client
@@ -4,7 +4,7 @@ import pymongo
 import certifi
 from src.exception import MyException
 from src.logger import logging
-from src.constants import DATABASE_NAME, MONGODB_URL_KEY
+from src.constants import DATABASE_NAME, MONGODB_URL_KEY, MONGODB_MAX_POOL_SIZE
 
 ca = certifi.where()
 
@@ -23,7 +23,7 @@ class MongoDBClient():
                 if mongodb_url is None:
                     raise Exception(f'Environment variable {MONGODB_URL_KEY} is not set')
                 
-                MongoDBClient.client = pymongo.MongoClient(mongodb_url, tlsCAFile=ca)
+                MongoDBClient.client = pymongo.MongoClient(mongodb_url, tlsCAFile=ca, maxPoolSize=MONGODB_MAX_POOL_SIZE)
 
             self.client = MongoDBClient.client
             self.database = self.client[database_name]
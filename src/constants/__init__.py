@@ -1,3 +1,4 @@
+import importlib.util
 import os
 from datetime import date
 
@@ -6,6 +7,8 @@ from datetime import date
 DATABASE_NAME = 'Proj1'
 COLLECTION_NAME = 'Proj1-Data'
 MONGODB_URL_KEY = 'MONGODB_URL'
+# connections of the shared client, parallel exports use one per worker
+MONGODB_MAX_POOL_SIZE: int = int(os.getenv('MONGODB_MAX_POOL_SIZE', 32))
 
 PIPELINE_NAME: str = ''
 ARTIFACT_DIR: str = 'artifact'
@@ -16,15 +19,45 @@ TARGET_COLUMN = 'Response'
 CURRENT_YEAR = date.today().year
 PREPROCESSING_OBJECT_FILE_NAME = 'preprocessing.pkl'
 
-FILE_NAME: str = 'data.csv'
-TRAIN_FILE_NAME: str = 'train.csv'
-TEST_FILE_NAME: str = 'test.csv'
+# format of the feature store & train/test splits: "parquet", "arrow" (Arrow IPC / feather),
+# "csv", or "auto" = parquet when pyarrow is installed, else csv. the columnar formats keep the
+# exported dtypes (categories, nullable ints) & can read a subset of the columns
+DATA_FILE_FORMAT: str = os.getenv('DATA_FILE_FORMAT', 'auto')
+if DATA_FILE_FORMAT == 'auto':
+    DATA_FILE_FORMAT = 'parquet' if importlib.util.find_spec('pyarrow') is not None else 'csv'
+DATA_FILE_COMPRESSION: str = os.getenv('DATA_FILE_COMPRESSION', 'zstd')
+DATA_FILE_EXTENSIONS: dict = {'csv': 'csv', 'parquet': 'parquet', 'arrow': 'arrow'}
+
+FILE_NAME: str = f'data.{DATA_FILE_EXTENSIONS[DATA_FILE_FORMAT]}'
+TRAIN_FILE_NAME: str = f'train.{DATA_FILE_EXTENSIONS[DATA_FILE_FORMAT]}'
+TEST_FILE_NAME: str = f'test.{DATA_FILE_EXTENSIONS[DATA_FILE_FORMAT]}'
 SCHEMA_FILE_PATH = os.path.join('config', 'schema.yaml')
 
 AWS_ACCESS_KEY_ID_ENV_KEY = 'AWS_ACCESS_KEY_ID'
 AWS_SECRET_ACCESS_KEY_ENV_KEY = 'AWS_SECRET_ACCESS_KEY'
 REGION_NAME = 'us-east-1'
 
+# where models are pushed to / served from: "s3" or "local" (a directory standing in for S3)
+STORAGE_BACKEND: str = os.getenv('STORAGE_BACKEND', 's3')
+LOCAL_STORAGE_ROOT: str = os.getenv('LOCAL_STORAGE_ROOT', 'local_storage')
+
+# parallel ranged downloads & multipart uploads
+S3_TRANSFER_PART_SIZE_BYTES: int = 8 * 1024 * 1024
+S3_TRANSFER_MAX_CONCURRENCY: int = 8
+# response bodies are copied in pieces of this size, a part is never held in memory twice
+S3_TRANSFER_STREAM_CHUNK_BYTES: int = 1024 * 1024
+
+# exact key HEAD results (existence, size, ETag, version) are reused for this long
+S3_METADATA_CACHE_TTL_SECONDS: float = float(os.getenv('S3_METADATA_CACHE_TTL_SECONDS', 5.0))
+
+# local cache of downloaded model artifacts, shared by all processes on the host
+ARTIFACT_CACHE_ENABLED: bool = os.getenv('ARTIFACT_CACHE_ENABLED', '1') != '0'
+ARTIFACT_CACHE_DIR: str = os.getenv('ARTIFACT_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'proj1', 'artifacts'))
+ARTIFACT_CACHE_MAX_SIZE_BYTES: int = int(os.getenv('ARTIFACT_CACHE_MAX_SIZE_BYTES', 2 * 1024 ** 3))
+
+# stage outputs a training run keeps in memory for the next stages (files are written regardless)
+TRAINING_ARTIFACT_STORE_MAX_BYTES: int = int(os.getenv('TRAINING_ARTIFACT_STORE_MAX_BYTES', 2 * 1024 ** 3))
+
 # Data Ingestsion
 
 DATA_INGESTION_COLLECTION_NAME: str = "Proj1-Data"
@@ -32,11 +65,27 @@ DATA_INGESTION_DIR_NAME: str = "data_ingestion"
 DATA_INGESTION_FEATURE_STORE_DIR: str = "feature_store"
 DATA_INGESTION_INGESTED_DIR: str = "ingested"
 DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO: float = 0.25
+# documents per cursor batch of the streaming MongoDB export
+DATA_INGESTION_EXPORT_BATCH_SIZE: int = 10000
+# parallel export: _id ranges are read by this many threads (1 = one streaming cursor);
+# several ranges per worker even out gaps in the _id distribution
+DATA_INGESTION_EXPORT_WORKERS: int = int(os.getenv('DATA_INGESTION_EXPORT_WORKERS', min(8, os.cpu_count() or 1)))
+DATA_INGESTION_EXPORT_RANGES_PER_WORKER: int = 4
+# incremental mode: only documents newer than the last run's _id watermark are exported &
+# appended as a partition of a feature store that persists across runs
+DATA_INGESTION_INCREMENTAL: bool = os.getenv('DATA_INGESTION_INCREMENTAL', '0') == '1'
+DATA_INGESTION_PERSISTENT_FEATURE_STORE_DIR: str = os.getenv('FEATURE_STORE_DIR', 'feature_store')
 
 # Data Validation
 
 DATA_VALIDATION_DIR_NAME: str = "data_validation"
 DATA_VALIDATION_REPORT_FILE_NAME: str = "report.yaml"
+# rows read & checked at a time (memory stays at about one chunk) & threads checking the columns of a chunk
+DATA_VALIDATION_CHUNK_ROWS: int = int(os.getenv('DATA_VALIDATION_CHUNK_ROWS', 500000))
+DATA_VALIDATION_WORKERS: int = int(os.getenv('DATA_VALIDATION_WORKERS', 1))
+# share of the rows a check (nulls, dtype, allowed values / range, duplicate ids) may fail on before
+# validation fails; smaller problems are only reported. 0 fails on a single bad value
+DATA_VALIDATION_MAX_INVALID_FRACTION: float = float(os.getenv('DATA_VALIDATION_MAX_INVALID_FRACTION', 0.01))
 
 # Data Transformation
 
@@ -64,6 +113,69 @@ MODEL_EVALUATION_CHANGED_THRESHOLD_SCORE: float = 0.02
 MODEL_BUCKET_NAME = "ammar-model-mlopsproj"
 MODEL_PUSHER_S3_KEY = "model-registry"
 
+# Drift
+
+# summary of the training data next to model.pkl & the new data folded in by incremental ingestion
+DRIFT_REFERENCE_FILE_NAME: str = 'drift_reference.yaml'
+DRIFT_CURRENT_FILE_NAME: str = 'drift_current.yaml'
+DRIFT_REPORT_FILE_NAME: str = 'drift_report.yaml'
+DRIFT_HISTOGRAM_BINS: int = 20
+# PSI >= 0.2 (or KS >= 0.1) on a feature counts as a significant shift
+DRIFT_PSI_THRESHOLD: float = float(os.getenv('DRIFT_PSI_THRESHOLD', 0.2))
+DRIFT_KS_THRESHOLD: float = float(os.getenv('DRIFT_KS_THRESHOLD', 0.1))
+DRIFT_MIN_ROWS: int = int(os.getenv('DRIFT_MIN_ROWS', 1000))
+# incremental training runs stop after ingestion when the new data hasn't drifted
+DRIFT_SKIP_RETRAIN: bool = os.getenv('DRIFT_SKIP_RETRAIN', '0') == '1'
+# score served traffic against the serving model's reference (see /drift)
+DRIFT_MONITOR_SERVING: bool = os.getenv('DRIFT_MONITOR_SERVING', '0') == '1'
+DRIFT_SERVING_FLUSH_ROWS: int = 1024
+
+# Prediction
+
+PREDICTION_INPUT_COLUMNS: list = ['Gender', 'Age', 'Driving_License', 'Region_Code', 'Previously_Insured',
+                                  'Annual_Premium', 'Policy_Sales_Channel', 'Vintage',
+                                  'Vehicle_Age_lt_1_Year', 'Vehicle_Age_gt_2_Years', 'Vehicle_Damage_Yes']
+PREDICTION_MAX_BATCH_ROWS: int = 10000
+PREDICTION_BATCHING_ENABLED: bool = True
+PREDICTION_BATCH_MAX_SIZE: int = 64
+PREDICTION_BATCH_MAX_WAIT_MS: float = 5.0
+PREDICTION_USE_COMPILED_MODEL: bool = True
+PREDICTION_COMPILED_MODEL_MAX_ROWS: int = 512
+PREDICTION_CACHE_ENABLED: bool = True
+PREDICTION_CACHE_MAX_SIZE: int = 10000
+PREDICTION_CACHE_TTL_SECONDS: float = 600.0
+
+# Model preload & hot reload
+
+# when set, workers share one memory-mapped compiled model per version under this directory
+SHARED_MODEL_DIR_ENV_KEY = 'SHARED_MODEL_DIR'
+SHARED_MODEL_KEEP_VERSIONS: int = 2
+
+MODEL_PRELOAD_ENABLED: bool = True
+MODEL_WARM_UP_BATCH_SIZES: tuple = (1, 16, 1024)
+MODEL_REFRESH_ENABLED: bool = True
+MODEL_REFRESH_INTERVAL_SECONDS: float = 60.0
+
+# Executors
+
+INFERENCE_EXECUTOR_MAX_WORKERS: int = 4
+INFERENCE_EXECUTOR_MAX_QUEUE_SIZE: int = 256
+TRAINING_EXECUTOR_MAX_WORKERS: int = 1
+TRAINING_EXECUTOR_MAX_QUEUE_SIZE: int = 1
+
+# Batch scoring
+
+BATCH_SCORING_CHUNK_ROWS: int = 100000
+BATCH_SCORING_MAX_IN_FLIGHT_PER_WORKER: int = 2
+BATCH_SCORING_ID_COLUMN: str = 'id'
+BATCH_SCORING_OUTPUT_COLUMN: str = 'prediction'
+
+# Training jobs
+
+TRAINING_JOB_STAGES: list = ['data_ingestion', 'data_validation', 'data_transformation',
+                             'model_trainer', 'model_evaluation', 'model_pusher']
+TRAINING_JOB_HISTORY_SIZE: int = 20
+
 # app
 
 APP_HOST = "0.0.0.0"
@@ -0,0 +1,93 @@
+import os
+import sys
+import tempfile
+from datetime import datetime, timezone
+from typing import List, Optional
+import pandas as pd
+from src.exception import MyException
+from src.logger import logging
+from src.constants import DATA_FILE_FORMAT, DATA_FILE_EXTENSIONS
+from src.utils.file_lock import file_lock
+from src.utils.main_utils import read_yaml_file, write_yaml_file, read_dataframe, write_dataframe
+
+MANIFEST_FILE_NAME = 'manifest.yaml'
+PARTITIONS_DIR_NAME = 'partitions'
+
+class FeatureStore:
+    '''
+    append only store of exported documents on local disk, reused by every training run
+
+    each incremental ingestion adds one immutable partition; manifest.yaml lists the committed
+    partitions & the largest _id each holds, the last one being the watermark of the next run.
+    a partition is renamed into place before the manifest naming it is replaced, so a crash
+    leaves at most an unlisted partition file, which readers ignore & the next append overwrites
+    '''
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        self.partitions_dir = os.path.join(store_dir, PARTITIONS_DIR_NAME)
+        self.manifest_file_path = os.path.join(store_dir, MANIFEST_FILE_NAME)
+        os.makedirs(self.partitions_dir, exist_ok=True)
+
+    def lock(self):
+        '''
+        held from reading the watermark to appending, so concurrent runs don't export the same documents
+        (no lock on windows: only run one incremental ingestion at a time there)
+        '''
+        return file_lock(os.path.join(self.store_dir, '.lock'))
+
+    def partitions(self) -> List[dict]:
+        '''Output: committed partitions, oldest first ({file, rows, max_object_id, created_at})'''
+        if not os.path.exists(self.manifest_file_path):
+            return []
+        return (read_yaml_file(self.manifest_file_path) or {}).get('partitions', [])
+
+    @property
+    def watermark(self) -> Optional[str]:
+        '''largest _id already in the store, None while it is empty'''
+        partitions = self.partitions()
+        return partitions[-1]['max_object_id'] if partitions else None
+
+    def append(self, dataframe: pd.DataFrame, object_id_column: str = '_id') -> Optional[str]:
+        '''
+        adds dataframe as a new partition & moves the watermark to its largest _id (whatever
+        the row order, so a natural order export doesn't leave the watermark short)
+
+        Output: path of the partition, None when dataframe is empty
+        '''
+        try:
+            if dataframe.empty:
+                return None
+            partitions = self.partitions()
+            file_name = f'part-{len(partitions):05d}.{DATA_FILE_EXTENSIONS[DATA_FILE_FORMAT]}'
+            path = os.path.join(self.partitions_dir, file_name)
+            file_descriptor, temp_path = tempfile.mkstemp(prefix='.part-', suffix=os.path.splitext(file_name)[1],
+                                                          dir=self.partitions_dir)
+            os.close(file_descriptor)
+            try:
+                write_dataframe(dataframe, temp_path)
+                os.replace(temp_path, path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+            partitions.append({'file': file_name, 'rows': len(dataframe),
+                               # 24 hex digit ObjectIds: string order is _id order
+                               'max_object_id': str(dataframe[object_id_column].astype(str).max()),
+                               'created_at': datetime.now(timezone.utc).isoformat()})
+            temp_manifest = os.path.join(self.store_dir, f'.{MANIFEST_FILE_NAME}')
+            write_yaml_file(temp_manifest, {'partitions': partitions})
+            os.replace(temp_manifest, self.manifest_file_path)
+            logging.info(f'Appended partition {file_name} ({len(dataframe)} rows) to the feature store')
+            return path
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def read(self, columns: List[str] = None) -> pd.DataFrame:
+        '''Output: all committed partitions (only columns when given) as one DataFrame'''
+        try:
+            frames = [read_dataframe(os.path.join(self.partitions_dir, partition['file']), columns)
+                      for partition in self.partitions()]
+            return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        except Exception as e:
+            raise MyException(e, sys) from e
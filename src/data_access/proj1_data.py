@@ -1,10 +1,129 @@
 import sys
+import time
 import pandas as pd
 import numpy as np
-from typing import Optional
+from bson import ObjectId
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import List, Optional
+from pandas.api.types import union_categoricals
 from src.configuration.mongo_db_connection import MongoDBClient
-from src.constants import DATABASE_NAME
+from src.constants import (DATABASE_NAME, SCHEMA_FILE_PATH, DATA_INGESTION_EXPORT_BATCH_SIZE,
+                           DATA_INGESTION_EXPORT_WORKERS, DATA_INGESTION_EXPORT_RANGES_PER_WORKER)
 from src.exception import MyException
+from src.logger import logging
+from src.utils.main_utils import read_yaml_file
+
+try:
+    import resource
+except ImportError:
+    # no getrusage (windows): peak memory is not reported
+    resource = None
+
+# the old export dropped the "id" field & kept Mongo's "_id", later removed as schema drop_columns
+EXPORT_EXCLUDED_COLUMNS = ('id',)
+OBJECT_ID_COLUMN = '_id'
+
+def _to_float(value) -> float:
+    '''numbers (or numeric strings) as float, "na" / None / missing fields as NaN'''
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+def _category_code(value, codes: dict) -> int:
+    '''code of value in codes (added when new), -1 for a missing value like pandas.Categorical'''
+    if value is None or value == 'na':
+        return -1
+    return codes.setdefault(value, len(codes))
+
+def _export_schema_types(schema_file_path: str) -> dict:
+    '''Output: {column: schema dtype} of the exported columns'''
+    return {name: dtype for column in read_yaml_file(schema_file_path)['columns']
+            for name, dtype in column.items() if name not in EXPORT_EXCLUDED_COLUMNS}
+
+def _read_typed_frame(collection, query: dict, schema_types: dict, batch_size: int, sort: bool = False) -> pd.DataFrame:
+    '''reads the documents matching query batch by batch into typed column buffers'''
+    cursor = collection.find(query, projection={name: 1 for name in schema_types}, batch_size=batch_size)
+    if sort:
+        cursor = cursor.sort(OBJECT_ID_COLUMN, 1)
+
+    object_ids = []
+    numeric_chunks = {name: [] for name, dtype in schema_types.items() if dtype != 'category'}
+    category_chunks = {name: [] for name, dtype in schema_types.items() if dtype == 'category'}
+    category_codes = {name: {} for name in category_chunks}
+    num_documents = 0
+    while True:
+        documents = list(islice(cursor, batch_size))
+        if not documents:
+            break
+        count = len(documents)
+        object_ids.append(np.array([str(document[OBJECT_ID_COLUMN]) for document in documents], dtype=object))
+        for name, chunks in numeric_chunks.items():
+            chunks.append(np.fromiter((_to_float(document.get(name)) for document in documents),
+                                      dtype=np.float64, count=count))
+        for name, chunks in category_chunks.items():
+            codes = category_codes[name]
+            chunks.append(np.fromiter((_category_code(document.get(name), codes) for document in documents),
+                                      dtype=np.int32, count=count))
+        num_documents += count
+
+    columns = {OBJECT_ID_COLUMN: np.concatenate(object_ids) if object_ids else np.array([], dtype=object)}
+    for name, dtype in schema_types.items():
+        if dtype == 'category':
+            codes = np.concatenate(category_chunks.pop(name)) if num_documents else np.array([], dtype=np.int32)
+            # sorted categories: dummy columns come out in the same order as from plain strings
+            categorical = pd.Categorical.from_codes(codes, categories=list(category_codes[name]))
+            columns[name] = categorical.reorder_categories(sorted(categorical.categories))
+            continue
+        values = np.concatenate(numeric_chunks.pop(name)) if num_documents else np.array([], dtype=np.float64)
+        if dtype == 'int':
+            values = pd.array(values, dtype='Int64') if np.isnan(values).any() else values.astype(np.int64)
+        columns[name] = values
+    return pd.DataFrame(columns, copy=False)
+
+def _concat_typed_frames(frames: List[pd.DataFrame], schema_types: dict) -> pd.DataFrame:
+    '''joins per range frames column by column, merging category codes instead of falling back to object'''
+    # empty ranges carry no categories (& an untyped category dtype)
+    frames = [frame for frame in frames if len(frame)] or frames[:1]
+    if len(frames) == 1:
+        return frames[0]
+    columns = {OBJECT_ID_COLUMN: np.concatenate([frame[OBJECT_ID_COLUMN].to_numpy(dtype=object) for frame in frames])}
+    for name, dtype in schema_types.items():
+        if dtype == 'category':
+            columns[name] = union_categoricals([frame[name].array for frame in frames], sort_categories=True)
+        else:
+            # int64 & Int64 (a range with gaps) combine to Int64
+            columns[name] = pd.concat([frame[name] for frame in frames], ignore_index=True).array
+    return pd.DataFrame(columns, copy=False)
+
+def _object_id_split_points(collection, num_ranges: int, min_object_id: Optional[str] = None) -> List[str]:
+    '''
+    Output: num_ranges + 1 ascending _id bounds, evenly spaced over the 96 bit ObjectId values
+    between min_object_id (or the smallest _id) & the largest _id; [] for an empty collection
+    '''
+    query = {} if min_object_id is None else {OBJECT_ID_COLUMN: {'$gt': ObjectId(min_object_id)}}
+    first = collection.find_one(query, projection={OBJECT_ID_COLUMN: 1}, sort=[(OBJECT_ID_COLUMN, 1)])
+    if first is None:
+        return []
+    last = collection.find_one(query, projection={OBJECT_ID_COLUMN: 1}, sort=[(OBJECT_ID_COLUMN, -1)])
+    lower = int(min_object_id, 16) if min_object_id is not None else int(str(first[OBJECT_ID_COLUMN]), 16)
+    upper = int(str(last[OBJECT_ID_COLUMN]), 16)
+    num_ranges = max(1, min(num_ranges, upper - lower))
+    points = sorted({lower + (upper - lower) * index // num_ranges for index in range(num_ranges + 1)})
+    bounds = [format(point, '024x') for point in points]
+    if len(bounds) == 1:
+        # a single _id: one range [_id, _id]
+        bounds.append(bounds[0])
+    if min_object_id is not None:
+        bounds[0] = min_object_id
+    return bounds
+
+def _peak_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
 
 class Proj1Data:
     """
@@ -15,24 +134,101 @@ class Proj1Data:
 
         try:
             self.mongo_client = MongoDBClient()
+            self.export_stats: dict = {}
         except Exception as e:
             raise MyException(e, sys)
-        
+
+    def _get_collection(self, collection_name: str, database_name: Optional[str] = None):
+        if database_name is None:
+            return self.mongo_client.database[collection_name]
+        return self.mongo_client.client[database_name][collection_name]
+
     def export_collection_as_datafram(self, collection_name: str, database_name: Optional[str] = None) -> pd.DataFrame:
 
         try:
-            if database_name is None:
-                collection = self.mongo_client.database[collection_name]
-            else:
-                collection = self.mongo_client[database_name][collection_name]
+            collection = self._get_collection(collection_name, database_name)
 
             print('Fetching data from MongoDb')
             df = pd.DataFrame(list(collection.find()))
             print(f'Data fetched with len: {len(df)}')
             if 'id' in df.columns.to_list():
-                df = df.drop(columns=['id'], axis=1)
+                df = df.drop(columns=['id'])
             df.replace({'na': np.nan}, inplace=True)
             return df
 
         except Exception as e:
             raise MyException(e, sys)
+
+    def export_collection_streaming(self, collection_name: str, database_name: Optional[str] = None,
+                                    batch_size: int = DATA_INGESTION_EXPORT_BATCH_SIZE,
+                                    schema_file_path: str = SCHEMA_FILE_PATH,
+                                    min_object_id: Optional[str] = None, sort: Optional[bool] = None) -> pd.DataFrame:
+        '''
+        same frame as export_collection_as_datafram with far less memory: only the schema columns
+        are fetched, the cursor is read batch_size documents at a time & every batch goes straight
+        into typed per column buffers (float64 / int codes of categories), so no list of all
+        documents or object dtype frame is ever built. "na" becomes NaN on the way in
+
+        with min_object_id only documents with a larger _id are read. they come in _id order (an
+        index scan) when sort, which defaults to whether min_object_id is given
+
+        Output: DataFrame with the schema dtypes (int64, float64, category; Int64 when an int
+        column has missing values), stats in self.export_stats
+        '''
+        try:
+            schema_types = _export_schema_types(schema_file_path)
+            collection = self._get_collection(collection_name, database_name)
+            query = {} if min_object_id is None else {OBJECT_ID_COLUMN: {'$gt': ObjectId(min_object_id)}}
+
+            start = time.perf_counter()
+            sort = min_object_id is not None if sort is None else sort
+            df = _read_typed_frame(collection, query, schema_types, batch_size, sort=sort)
+            self._record_export_stats(collection_name, df, time.perf_counter() - start)
+            return df
+
+        except Exception as e:
+            raise MyException(e, sys)
+
+    def export_collection_parallel(self, collection_name: str, database_name: Optional[str] = None,
+                                   workers: int = DATA_INGESTION_EXPORT_WORKERS,
+                                   batch_size: int = DATA_INGESTION_EXPORT_BATCH_SIZE,
+                                   schema_file_path: str = SCHEMA_FILE_PATH,
+                                   min_object_id: Optional[str] = None) -> pd.DataFrame:
+        '''
+        export_collection_streaming split over workers threads: the _id span (above min_object_id)
+        is cut into DATA_INGESTION_EXPORT_RANGES_PER_WORKER ranges per worker, each range is read
+        on its own pooled connection & decoded into its own typed frame, and the frames are
+        joined in _id order, so the result does not depend on which range finished first
+
+        Output: same DataFrame as export_collection_streaming (in _id order), stats in self.export_stats
+        '''
+        try:
+            schema_types = _export_schema_types(schema_file_path)
+            collection = self._get_collection(collection_name, database_name)
+            start = time.perf_counter()
+            bounds = _object_id_split_points(collection, workers * DATA_INGESTION_EXPORT_RANGES_PER_WORKER, min_object_id)
+            queries = [{OBJECT_ID_COLUMN: {'$gt' if lower == min_object_id else '$gte': ObjectId(lower), '$lt': ObjectId(upper)}}
+                       for lower, upper in zip(bounds[:-1], bounds[1:])]
+            if queries:
+                # the last range includes the largest _id
+                queries[-1][OBJECT_ID_COLUMN]['$lte'] = queries[-1][OBJECT_ID_COLUMN].pop('$lt')
+            else:
+                # nothing to export: one (empty) read still gives the typed columns
+                queries = [{} if min_object_id is None else {OBJECT_ID_COLUMN: {'$gt': ObjectId(min_object_id)}}]
+
+            with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='mongo-export') as pool:
+                frames = list(pool.map(lambda query: _read_typed_frame(collection, query, schema_types, batch_size, sort=True),
+                                       queries))
+            df = _concat_typed_frames(frames, schema_types)
+            self._record_export_stats(collection_name, df, time.perf_counter() - start, workers=workers, ranges=len(queries))
+            return df
+
+        except Exception as e:
+            raise MyException(e, sys)
+
+    def _record_export_stats(self, collection_name: str, df: pd.DataFrame, seconds: float, **extra) -> None:
+        self.export_stats = {'documents': len(df), 'seconds': seconds,
+                             'documents_per_second': len(df) / seconds if seconds else 0.0,
+                             'frame_bytes': int(df.memory_usage(deep=True).sum()),
+                             'peak_rss_bytes': _peak_rss_bytes(), **extra}
+        logging.info(f'Exported {collection_name}: {self.export_stats}')
@@ -4,6 +4,9 @@ from dataclasses import dataclass
 class DataIngestionArtifact:
     trained_file_path: str
     test_file_path: str
+    # incremental runs: drift of the data added since the production model was trained
+    drift_report_file_path: str = None
+    retrain_recommended: bool = None
 
 @dataclass
 class DataValidationArtifact:
@@ -16,6 +19,7 @@ class DataTransformationArtifact:
     transformed_object_file_path: str
     transformed_train_file_path: str
     transformed_test_file_path: str
+    drift_reference_file_path: str = None
 
 @dataclass
 class ClassificationMetricArtifact:
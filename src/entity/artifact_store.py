@@ -0,0 +1,103 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+import numpy as np
+import pandas as pd
+from src.constants import TRAINING_ARTIFACT_STORE_MAX_BYTES
+from src.exception import MyException
+from src.logger import logging
+
+def _size_of(obj: object, file_path: str) -> int:
+    '''in memory size of arrays & frames, the written file size for anything else (models)'''
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    return os.path.getsize(file_path) if os.path.exists(file_path) else 0
+
+class ArtifactStore:
+    '''
+    hands stage outputs of one TrainPipeline run to the next stages in memory
+
+    artifacts are keyed by their file path: put() always writes the file (for auditing & for
+    runs that resume from disk) and keeps the object resident, get() returns the resident
+    object or loads the file. past max_bytes the least recently used objects are dropped from
+    memory, their files are already on disk. resident objects are shared, treat them as read-only
+    '''
+    def __init__(self, max_bytes: int = TRAINING_ARTIFACT_STORE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._objects: OrderedDict = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(file_path: str) -> str:
+        return os.path.abspath(file_path)
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def _keep(self, key: str, obj: object, size: int) -> None:
+        with self._lock:
+            self._discard(key)
+            if size > self.max_bytes:
+                return
+            self._objects[key] = obj
+            self._sizes[key] = size
+            while self.resident_bytes > self.max_bytes:
+                spilled, _ = self._objects.popitem(last=False)
+                self._sizes.pop(spilled)
+                logging.info(f'Artifact store over budget, {spilled} is read from disk from now on')
+
+    def _discard(self, key: str) -> None:
+        self._objects.pop(key, None)
+        self._sizes.pop(key, None)
+
+    def put(self, file_path: str, obj: object, save: Callable[[str, object], None]) -> None:
+        '''save(file_path, obj) writes the artifact, then it stays resident (within the budget)'''
+        try:
+            save(file_path, obj)
+            self._keep(self._key(file_path), obj, _size_of(obj, file_path))
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def get(self, file_path: str, load: Callable[[str], object], keep: bool = True) -> object:
+        '''
+        Output: the resident artifact, else load(file_path) (kept resident unless keep=False,
+        e.g. when load reads only part of the file)
+        '''
+        try:
+            key = self._key(file_path)
+            with self._lock:
+                if key in self._objects:
+                    self._objects.move_to_end(key)
+                    self.hits += 1
+                    return self._objects[key]
+                self.misses += 1
+            obj = load(file_path)
+            if keep:
+                self._keep(key, obj, _size_of(obj, file_path))
+            return obj
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def resident(self, file_path: str) -> Optional[object]:
+        '''Output: the artifact when it is in memory, else None (the caller reads the file its own way)'''
+        with self._lock:
+            key = self._key(file_path)
+            if key not in self._objects:
+                self.misses += 1
+                return None
+            self._objects.move_to_end(key)
+            self.hits += 1
+            return self._objects[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._objects.clear()
+            self._sizes.clear()
@@ -0,0 +1,318 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, replace
+from typing import List, Union
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler, MinMaxScaler, FunctionTransformer
+from src.exception import MyException
+from src.logger import logging
+from src.constants import PREDICTION_INPUT_COLUMNS
+from src.monitoring.metrics import stage_histogram
+from src.utils.main_utils import save_np_array_data, load_np_array_data, write_yaml_file, read_yaml_file
+
+# trees are walked for this many rows at a time to keep the (n_trees, rows) node index matrix small
+COMPILED_MODEL_ROW_BLOCK_SIZE = 1024
+
+# on disk layout of a saved CompiledModel: one .npy per array + a yaml with the scalar fields
+COMPILED_MODEL_META_FILE_NAME = 'compiled_model.yaml'
+PREPROCESSOR_ARRAYS = ('column_order', 'shift', 'divisor', 'multiplier', 'add')
+FOREST_ARRAYS = ('roots', 'feature', 'threshold', 'children', 'value', 'classes')
+
+TRANSFORM_SECONDS = stage_histogram('transform')
+PREDICT_SECONDS = stage_histogram('predict')
+
+@dataclass
+class AffinePreprocessor:
+    '''
+    fitted ColumnTransformer of scalers flattened into per output column coefficients
+
+    output[:, j] = (X[:, column_order[j]] - shift[j]) / divisor[j] * multiplier[j] + add[j]
+
+    StandardScaler -> (x - mean) / scale  |  MinMaxScaler -> x * scale + min  |  passthrough -> x
+    the operations are the same ones sklearn applies, so outputs match bit for bit
+    '''
+    input_columns: List[str]
+    column_order: np.ndarray
+    shift: np.ndarray
+    divisor: np.ndarray
+    multiplier: np.ndarray
+    add: np.ndarray
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        '''X: float64 array with columns in input_columns order'''
+        return (X[:, self.column_order] - self.shift) / self.divisor * self.multiplier + self.add
+
+def _scaler_coefficients(transformer, num_columns: int):
+    '''Output: (shift, divisor, multiplier, add) arrays for one fitted transformer'''
+    ones, zeros = np.ones(num_columns), np.zeros(num_columns)
+    # newer sklearn stores a fitted 'passthrough' as an identity FunctionTransformer
+    if (isinstance(transformer, str) and transformer == 'passthrough') or \
+            (isinstance(transformer, FunctionTransformer) and transformer.func is None):
+        return zeros, ones, ones, zeros
+    if isinstance(transformer, StandardScaler):
+        shift = transformer.mean_ if transformer.with_mean else zeros
+        divisor = transformer.scale_ if transformer.with_std else ones
+        return np.asarray(shift, dtype=np.float64), np.asarray(divisor, dtype=np.float64), ones, zeros
+    if isinstance(transformer, MinMaxScaler):
+        if transformer.clip:
+            raise Exception('MinMaxScaler with clip=True is not supported by the compiled model')
+        return zeros, ones, np.asarray(transformer.scale_, dtype=np.float64), np.asarray(transformer.min_, dtype=np.float64)
+    raise Exception(f'Transformer {type(transformer).__name__} is not supported by the compiled model')
+
+def compile_preprocessor(preprocessing_object: Union[Pipeline, ColumnTransformer]) -> AffinePreprocessor:
+    '''
+    flattens the fitted preprocessing pipeline (a ColumnTransformer of StandardScaler / MinMaxScaler
+    with passthrough remainder, optionally wrapped in a one step Pipeline) into an AffinePreprocessor
+    '''
+    try:
+        column_transformer = preprocessing_object
+        if isinstance(column_transformer, Pipeline):
+            if len(column_transformer.steps) != 1:
+                raise Exception('Only single step preprocessing pipelines can be compiled')
+            column_transformer = column_transformer.steps[0][1]
+        if not isinstance(column_transformer, ColumnTransformer):
+            raise Exception(f'Cannot compile preprocessor of type {type(column_transformer).__name__}')
+
+        input_columns = [str(column) for column in column_transformer.feature_names_in_]
+        column_index = {column: index for index, column in enumerate(input_columns)}
+
+        order, shift, divisor, multiplier, add = [], [], [], [], []
+        for name, transformer, columns in column_transformer.transformers_:
+            if isinstance(transformer, str) and transformer == 'drop':
+                continue
+            indices = [column if isinstance(column, (int, np.integer)) else column_index[column] for column in columns]
+            if not indices:
+                continue
+            coefficients = _scaler_coefficients(transformer, len(indices))
+            order.extend(indices)
+            for target, values in zip((shift, divisor, multiplier, add), coefficients):
+                target.append(values)
+
+        return AffinePreprocessor(input_columns=input_columns,
+                                  column_order=np.asarray(order, dtype=np.intp),
+                                  shift=np.concatenate(shift), divisor=np.concatenate(divisor),
+                                  multiplier=np.concatenate(multiplier), add=np.concatenate(add))
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+def prepare_array_preprocessor(preprocessing_object: Union[Pipeline, AffinePreprocessor]) -> AffinePreprocessor:
+    '''
+    compiles the preprocessor (or re-targets an already compiled one) for inputs in
+    PREDICTION_INPUT_COLUMNS order; column order is resolved here once, so array
+    predictions need no per call checks
+
+    Output: AffinePreprocessor whose input_columns == PREDICTION_INPUT_COLUMNS
+    '''
+    if isinstance(preprocessing_object, AffinePreprocessor):
+        preprocessor = replace(preprocessing_object)
+    else:
+        preprocessor = compile_preprocessor(preprocessing_object)
+    if sorted(preprocessor.input_columns) != sorted(PREDICTION_INPUT_COLUMNS):
+        raise Exception(f'Model input columns {preprocessor.input_columns} do not match {PREDICTION_INPUT_COLUMNS}')
+    position = {column: index for index, column in enumerate(PREDICTION_INPUT_COLUMNS)}
+    to_documented_order = np.asarray([position[column] for column in preprocessor.input_columns], dtype=np.intp)
+    preprocessor.column_order = to_documented_order[preprocessor.column_order]
+    preprocessor.input_columns = list(PREDICTION_INPUT_COLUMNS)
+    return preprocessor
+
+@dataclass
+class CompiledForest:
+    '''
+    every tree of a fitted RandomForestClassifier laid out in contiguous node arrays
+
+    node ids are global across trees (roots[t] is the root of tree t); children[2 * node] is the
+    left & children[2 * node + 1] the right child. leaves point to themselves so all trees can
+    be advanced max_depth times in lock step
+    '''
+    roots: np.ndarray
+    feature: np.ndarray
+    threshold: np.ndarray
+    children: np.ndarray
+    value: np.ndarray
+    classes: np.ndarray
+    max_depth: int
+
+    @classmethod
+    def from_estimator(cls, forest) -> 'CompiledForest':
+        try:
+            if getattr(forest, 'n_outputs_', 1) != 1:
+                raise Exception('Only single output forests can be compiled')
+
+            roots, features, thresholds, children, values = [], [], [], [], []
+            offset, max_depth = 0, 0
+            for estimator in forest.estimators_:
+                tree = estimator.tree_
+                node_ids = np.arange(tree.node_count)
+                is_leaf = tree.children_left == -1
+
+                roots.append(offset)
+                features.append(np.where(is_leaf, 0, tree.feature))
+                thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+                left = np.where(is_leaf, node_ids, tree.children_left) + offset
+                right = np.where(is_leaf, node_ids, tree.children_right) + offset
+                children.append(np.column_stack([left, right]).ravel())
+
+                # same normalisation DecisionTreeClassifier.predict_proba applies
+                value = tree.value[:, 0, :].astype(np.float64)
+                normalizer = value.sum(axis=1, keepdims=True)
+                normalizer[normalizer == 0.0] = 1.0
+                values.append(value / normalizer)
+
+                offset += tree.node_count
+                max_depth = max(max_depth, tree.max_depth)
+
+            if offset >= np.iinfo(np.int32).max // 2:
+                raise Exception('Forest is too large to compile with 32 bit node ids')
+            return cls(roots=np.asarray(roots, dtype=np.int32),
+                       feature=np.concatenate(features).astype(np.int32),
+                       threshold=np.concatenate(thresholds).astype(np.float64),
+                       children=np.concatenate(children).astype(np.int32),
+                       value=np.ascontiguousarray(np.concatenate(values)),
+                       classes=np.asarray(forest.classes_),
+                       max_depth=int(max_depth))
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _predict_proba_block(self, X: np.ndarray) -> np.ndarray:
+        num_rows, num_features = X.shape
+        # sklearn trees compare float32 features against float64 thresholds
+        flat_X = X.astype(np.float32).ravel()
+        row_offsets = (np.arange(num_rows, dtype=np.int32) * num_features)[np.newaxis, :]
+
+        nodes = np.repeat(self.roots[:, np.newaxis], num_rows, axis=1)
+        for _ in range(self.max_depth):
+            # written as not(x <= threshold) so NaN goes right, like sklearn
+            go_right = ~(flat_X[row_offsets + self.feature[nodes]] <= self.threshold[nodes])
+            nodes = self.children[2 * nodes + go_right]
+
+        # accumulate tree by tree, in the same order as sklearn, so averaged probabilities match exactly
+        proba = np.zeros((num_rows, self.value.shape[1]), dtype=np.float64)
+        for tree_nodes in nodes:
+            proba += self.value[tree_nodes]
+        proba /= len(self.roots)
+        return proba
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        if len(X) <= COMPILED_MODEL_ROW_BLOCK_SIZE:
+            return self._predict_proba_block(X)
+        return np.concatenate([self._predict_proba_block(X[start:start + COMPILED_MODEL_ROW_BLOCK_SIZE])
+                               for start in range(0, len(X), COMPILED_MODEL_ROW_BLOCK_SIZE)])
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.classes.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+class CompiledModel:
+    '''
+    sklearn free stand in for MyModel: same predict(dataframe) interface & the same predictions,
+    computed with plain numpy over the flattened scaler coefficients & tree arrays
+    '''
+    def __init__(self, preprocessor: AffinePreprocessor, forest: CompiledForest):
+        self.preprocessor = preprocessor
+        self.forest = forest
+        try:
+            self.array_preprocessor = prepare_array_preprocessor(preprocessor)
+        except Exception as e:
+            logging.warning(f'Array prediction path disabled for the compiled model: {e}')
+            self.array_preprocessor = None
+
+    @classmethod
+    def from_model(cls, model) -> 'CompiledModel':
+        '''compiles a MyModel (preprocessing_object + RandomForestClassifier)'''
+        logging.info(f'Compiling {model} into flat numpy arrays')
+        compiled_model = cls(compile_preprocessor(model.preprocessing_object),
+                             CompiledForest.from_estimator(model.trained_model_object))
+        logging.info(f'Compiled {len(compiled_model.forest.roots)} trees with '
+                     f'{len(compiled_model.forest.feature)} nodes, max depth {compiled_model.forest.max_depth}')
+        return compiled_model
+
+    def save(self, dir_path: str) -> None:
+        '''writes the model in the directory layout load() can memory-map'''
+        try:
+            for name in PREPROCESSOR_ARRAYS:
+                save_np_array_data(os.path.join(dir_path, f'preprocessor_{name}.npy'), getattr(self.preprocessor, name))
+            for name in FOREST_ARRAYS:
+                save_np_array_data(os.path.join(dir_path, f'forest_{name}.npy'), getattr(self.forest, name))
+            write_yaml_file(os.path.join(dir_path, COMPILED_MODEL_META_FILE_NAME),
+                            {'input_columns': list(self.preprocessor.input_columns), 'max_depth': self.forest.max_depth})
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    @classmethod
+    def load(cls, dir_path: str, mmap_mode: str = 'r') -> 'CompiledModel':
+        '''
+        loads a model written by save(); with mmap_mode='r' the tree arrays stay in the page cache,
+        shared by every process that maps them, & nothing is deserialized
+        '''
+        try:
+            meta = read_yaml_file(os.path.join(dir_path, COMPILED_MODEL_META_FILE_NAME))
+            preprocessor = AffinePreprocessor(input_columns=meta['input_columns'], **{
+                name: load_np_array_data(os.path.join(dir_path, f'preprocessor_{name}.npy')) for name in PREPROCESSOR_ARRAYS
+            })
+            forest = CompiledForest(max_depth=int(meta['max_depth']), **{
+                name: load_np_array_data(os.path.join(dir_path, f'forest_{name}.npy'),
+                                         mmap_mode=None if name == 'classes' else mmap_mode) for name in FOREST_ARRAYS
+            })
+            return cls(preprocessor, forest)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _to_array(self, dataframe: pd.DataFrame) -> np.ndarray:
+        return dataframe[self.preprocessor.input_columns].to_numpy(dtype=np.float64)
+
+    def predict_proba(self, dataframe: pd.DataFrame) -> np.ndarray:
+        try:
+            with TRANSFORM_SECONDS.time():
+                X = self.preprocessor.transform(self._to_array(dataframe))
+            with PREDICT_SECONDS.time():
+                return self.forest.predict_proba(X)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def predict(self, dataframe: pd.DataFrame) -> np.ndarray:
+        try:
+            with TRANSFORM_SECONDS.time():
+                X = self.preprocessor.transform(self._to_array(dataframe))
+            with PREDICT_SECONDS.time():
+                return self.forest.predict(X)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def predict_array(self, features) -> np.ndarray:
+        '''
+        features: 2d numpy array or list of tuples, columns in PREDICTION_INPUT_COLUMNS order
+        '''
+        try:
+            X = np.asarray(features, dtype=np.float64)
+            if X.ndim == 1:
+                X = X.reshape(1, -1)
+            if self.array_preprocessor is None:
+                return self.predict(pd.DataFrame(X, columns=PREDICTION_INPUT_COLUMNS))
+            if X.shape[1] != len(PREDICTION_INPUT_COLUMNS):
+                raise Exception(f'Expected {len(PREDICTION_INPUT_COLUMNS)} feature columns, got {X.shape[1]}')
+            with TRANSFORM_SECONDS.time():
+                X = self.array_preprocessor.transform(X)
+            with PREDICT_SECONDS.time():
+                return self.forest.predict(X)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def check_parity(self, model, dataframe: pd.DataFrame) -> bool:
+        '''
+        Output: True when predictions (& class probabilities) match model.predict on dataframe
+        '''
+        try:
+            expected = model.predict(dataframe)
+            expected_proba = model.trained_model_object.predict_proba(model.preprocessing_object.transform(dataframe))
+            return bool(np.array_equal(expected, self.predict(dataframe))
+                        and np.allclose(expected_proba, self.predict_proba(dataframe), rtol=0, atol=1e-12))
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def __repr__(self):
+        return f"CompiledModel({len(self.forest.roots)} trees)"
+
+    def __str__(self):
+        return f"CompiledModel({len(self.forest.roots)} trees)"
@@ -22,18 +22,32 @@ class DataIngestionConfig:
     testing_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_INGESTED_DIR, TEST_FILE_NAME)
     train_test_split_ratio: float = DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO
     collection_name: str = DATA_INGESTION_COLLECTION_NAME
+    export_batch_size: int = DATA_INGESTION_EXPORT_BATCH_SIZE
+    export_workers: int = DATA_INGESTION_EXPORT_WORKERS
+    incremental: bool = DATA_INGESTION_INCREMENTAL
+    persistent_feature_store_dir: str = DATA_INGESTION_PERSISTENT_FEATURE_STORE_DIR
+    drift_report_file_path: str = os.path.join(data_ingestion_dir, DRIFT_REPORT_FILE_NAME)
+    skip_retrain_without_drift: bool = DRIFT_SKIP_RETRAIN
+    # the production model, whose drift reference new data is compared with
+    model_bucket_name: str = MODEL_BUCKET_NAME
+    model_file_path: str = MODEL_FILE_NAME
+    storage_backend: str = STORAGE_BACKEND
 
 @dataclass
 class DataValidationConfig:
     data_validation_dir: str = os.path.join(training_pipeline_config.artifact_dir, DATA_VALIDATION_DIR_NAME)
     validation_report_file_path: str = os.path.join(data_validation_dir, DATA_VALIDATION_REPORT_FILE_NAME)
+    chunk_rows: int = DATA_VALIDATION_CHUNK_ROWS
+    workers: int = DATA_VALIDATION_WORKERS
+    max_invalid_fraction: float = DATA_VALIDATION_MAX_INVALID_FRACTION
 
 @dataclass
 class DataTransformationConfig:
     data_transformation_dir: str = os.path.join(training_pipeline_config.artifact_dir, DATA_TRANSFORMATION_DIR_NAME)
-    transformed_train_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR, TRAIN_FILE_NAME.replace('csv', 'npy'))
-    transformed_test_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR, TEST_FILE_NAME.replace('csv', 'npy'))
+    transformed_train_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR, f'{os.path.splitext(TRAIN_FILE_NAME)[0]}.npy')
+    transformed_test_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR, f'{os.path.splitext(TEST_FILE_NAME)[0]}.npy')
     transformed_object_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR, PREPROCESSING_OBJECT_FILE_NAME)
+    drift_reference_file_path: str = os.path.join(data_transformation_dir, DRIFT_REFERENCE_FILE_NAME)
 
 @dataclass
 class ModelTrainerConfig:
@@ -53,13 +67,57 @@ class ModelEvaluationConfig:
     changed_threshold_score: float = MODEL_EVALUATION_CHANGED_THRESHOLD_SCORE
     bucket_name: str = MODEL_BUCKET_NAME
     s3_model_key_path: str = MODEL_FILE_NAME
+    storage_backend: str = STORAGE_BACKEND
 
 @dataclass
 class ModelPusherConfig:
     bucket_name: str = MODEL_BUCKET_NAME
     s3_model_key_path: str = MODEL_FILE_NAME
+    storage_backend: str = STORAGE_BACKEND
 
 @dataclass
 class VehiclePredictorConfig:
     model_file_path: str = MODEL_FILE_NAME
-    model_bucket_name: str = MODEL_BUCKET_NAME
\ No newline at end of file
+    model_bucket_name: str = MODEL_BUCKET_NAME
+    use_compiled_model: bool = PREDICTION_USE_COMPILED_MODEL
+    compiled_model_max_rows: int = PREDICTION_COMPILED_MODEL_MAX_ROWS
+    cache_enabled: bool = PREDICTION_CACHE_ENABLED
+    cache_max_size: int = PREDICTION_CACHE_MAX_SIZE
+    cache_ttl_seconds: float = PREDICTION_CACHE_TTL_SECONDS
+    shared_model_dir: str = os.getenv(SHARED_MODEL_DIR_ENV_KEY)
+    storage_backend: str = STORAGE_BACKEND
+    drift_monitor_enabled: bool = DRIFT_MONITOR_SERVING
+
+@dataclass
+class PredictionBatcherConfig:
+    enabled: bool = PREDICTION_BATCHING_ENABLED
+    max_batch_size: int = PREDICTION_BATCH_MAX_SIZE
+    max_wait_ms: float = PREDICTION_BATCH_MAX_WAIT_MS
+
+@dataclass
+class ExecutorConfig:
+    inference_max_workers: int = INFERENCE_EXECUTOR_MAX_WORKERS
+    inference_max_queue_size: int = INFERENCE_EXECUTOR_MAX_QUEUE_SIZE
+    training_max_workers: int = TRAINING_EXECUTOR_MAX_WORKERS
+    training_max_queue_size: int = TRAINING_EXECUTOR_MAX_QUEUE_SIZE
+
+@dataclass
+class ModelPreloadConfig:
+    enabled: bool = MODEL_PRELOAD_ENABLED
+    warm_up_batch_sizes: tuple = MODEL_WARM_UP_BATCH_SIZES
+
+@dataclass
+class ModelRefresherConfig:
+    enabled: bool = MODEL_REFRESH_ENABLED
+    interval_seconds: float = MODEL_REFRESH_INTERVAL_SECONDS
+
+@dataclass
+class BatchScoringConfig:
+    chunk_rows: int = BATCH_SCORING_CHUNK_ROWS
+    workers: int = os.cpu_count() or 1
+    max_in_flight_per_worker: int = BATCH_SCORING_MAX_IN_FLIGHT_PER_WORKER
+    id_column: str = BATCH_SCORING_ID_COLUMN
+    output_column: str = BATCH_SCORING_OUTPUT_COLUMN
+    model_bucket_name: str = MODEL_BUCKET_NAME
+    model_file_path: str = MODEL_FILE_NAME
+    storage_backend: str = STORAGE_BACKEND
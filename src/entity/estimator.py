@@ -1,9 +1,18 @@
 import sys
+import numpy as np
 import pandas as pd
 from pandas import DataFrame
 from sklearn.pipeline import Pipeline
 from src.exception import MyException
 from src.logger import logging
+from src.constants import PREDICTION_INPUT_COLUMNS
+from src.entity.compiled_estimator import prepare_array_preprocessor
+from src.monitoring.metrics import stage_histogram
+
+logger = logging.getLogger(__name__)
+
+TRANSFORM_SECONDS = stage_histogram('transform')
+PREDICT_SECONDS = stage_histogram('predict')
 
 class TargetValueMapping:
     def __init__(self):
@@ -18,21 +27,66 @@ class TargetValueMapping:
         return dict(zip(mapping_response.values(), mapping_response.keys()))
     
 class MyModel:
+    # column order expected by predict_array (same order as VehicleData / the web form)
+    INPUT_COLUMNS = PREDICTION_INPUT_COLUMNS
+
     def __init__(self, preprocessing_object: Pipeline, trained_model_object: object):
 
         self.preprocessing_object = preprocessing_object
         self.trained_model_object = trained_model_object
+        self._prepare_array_path()
+
+    def __getstate__(self):
+        # the array preprocessor is derived data, rebuilt on load so older pickles get it too
+        state = self.__dict__.copy()
+        state.pop('_array_preprocessor', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._prepare_array_path()
+
+    def _prepare_array_path(self) -> None:
+        '''precomputes scaler parameters & checks the column order once, at construction / load time'''
+        try:
+            self._array_preprocessor = prepare_array_preprocessor(self.preprocessing_object)
+        except Exception as e:
+            logger.warning(f'Array prediction path disabled, falling back to DataFrame predictions: {e}')
+            self._array_preprocessor = None
+
+    def predict_array(self, features) -> np.ndarray:
+        '''
+        pandas free prediction for raw feature vectors
+
+        features: 2d numpy array or list of tuples, columns in MyModel.INPUT_COLUMNS order
+        '''
+        try:
+            X = np.asarray(features, dtype=np.float64)
+            if X.ndim == 1:
+                X = X.reshape(1, -1)
+            if X.shape[1] != len(self.INPUT_COLUMNS):
+                raise Exception(f'Expected {len(self.INPUT_COLUMNS)} feature columns, got {X.shape[1]}')
+            if self._array_preprocessor is None:
+                return self.predict(DataFrame(X, columns=self.INPUT_COLUMNS))
+            with TRANSFORM_SECONDS.time():
+                transformed_feature = self._array_preprocessor.transform(X)
+            with PREDICT_SECONDS.time():
+                return self.trained_model_object.predict(transformed_feature)
+        except Exception as e:
+            raise MyException(e, sys) from e
 
     def predict(self, dataframe: pd.DataFrame) -> DataFrame:
 
         try:
-            logging.info('Starting prediction process...')
-            transformed_feature = self.preprocessing_object.transform(dataframe)
-            logging.info('Using the trained model to get predictions')
-            predictions = self.trained_model_object.predict(transformed_feature)
+            logger.info('Starting prediction process...')
+            with TRANSFORM_SECONDS.time():
+                transformed_feature = self.preprocessing_object.transform(dataframe)
+            logger.info('Using the trained model to get predictions')
+            with PREDICT_SECONDS.time():
+                predictions = self.trained_model_object.predict(transformed_feature)
             return predictions
         except Exception as e:
-            logging.error("Error occurred in predict method", exc_info=True)
+            logger.error("Error occurred in predict method", exc_info=True)
             raise MyException(e, sys) from e
         
     def __repr__(self):
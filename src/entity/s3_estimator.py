@@ -1,37 +1,202 @@
+import os
 import sys
+import shutil
+import hashlib
+import tempfile
+import yaml
+from typing import Optional
 from pandas import DataFrame
 from src.exception import MyException
+from src.logger import logging
 from src.entity.estimator import MyModel
-from src.cloud_storage.aws_storage import SimpleStorageService
+from src.entity.compiled_estimator import CompiledModel
+from src.cloud_storage.object_metadata import ObjectMetadata
+from src.cloud_storage.storage_backend import ArtifactStorage, create_storage
+from src.monitoring.drift import DriftSketch, drift_reference_path
+from src.constants import SHARED_MODEL_KEEP_VERSIONS, STORAGE_BACKEND
 
 class Proj1Estimator:
-    '''saves & retrieves model from s3 bucket and then do prediction'''
-    def __init__(self, bucket_name, model_path):
+    '''saves & retrieves model from s3 bucket (or another ArtifactStorage) and then do prediction
+
+    with use_compiled_model, batches of up to compiled_max_rows rows are scored by the
+    sklearn free CompiledModel (lower per call overhead), larger ones by the MyModel itself
+
+    with shared_model_dir, the model is compiled once per version into that directory & every
+    worker process memory-maps it read-only instead of unpickling its own copy of the forest;
+    the compiled model then serves all batch sizes & the MyModel is not kept in memory
+    '''
+    def __init__(self, bucket_name, model_path, use_compiled_model: bool = False, compiled_max_rows: int = 0,
+                 shared_model_dir: str = None, storage_backend: str = STORAGE_BACKEND):
         self.bucket_name = bucket_name
-        self.s3 = SimpleStorageService()
+        self.storage_backend = storage_backend
+        self._s3: ArtifactStorage = None
         self.model_path = model_path
         self.loaded_model: MyModel = None
+        self.use_compiled_model = use_compiled_model
+        self.compiled_max_rows = compiled_max_rows
+        self.compiled_model: CompiledModel = None
+        self.model_version: str = None
+        self.shared_model_dir = shared_model_dir
+        # summary of the model's training data, set by ModelLoader when served traffic is monitored
+        self.drift_reference: DriftSketch = None
+
+    @property
+    def s3(self) -> ArtifactStorage:
+        # created on first use, so an estimator holding an already loaded model needs no AWS credentials
+        if self._s3 is None:
+            self._s3 = create_storage(self.storage_backend)
+        return self._s3
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_model is not None or self.compiled_model is not None
 
     def is_model_present(self, model_path):
+        '''True when exactly model_path exists (a cached HEAD, so e.g. model.pkl.bak doesn't count)'''
         try:
-            return self.s3.s3_key_path_available(self.bucket_name, model_path)
+            return self.s3.object_exists(self.bucket_name, model_path)
         except MyException as e:
             print(e)
             return False
         
-    def load_model(self) -> MyModel:
-        return self.s3.load_model(self.model_path, self.bucket_name)
+    def load_model(self, if_match: str = None) -> MyModel:
+        '''with if_match (an ETag) only that object is loaded, a replaced one raises'''
+        if not self.s3.object_exists(self.bucket_name, self.model_path):
+            raise Exception(f'Model {self.model_path} not found in bucket {self.bucket_name}')
+        return self.s3.load_model(self.model_path, self.bucket_name, if_match=if_match)
+
+    def get_model_version(self) -> str:
+        '''version (or ETag) of the model object currently in the bucket'''
+        return self.s3.get_object_version(self.model_path, self.bucket_name)
+
+    def load(self) -> None:
+        '''
+        eagerly loads (& compiles) the model, recording the bucket version it was loaded from
+
+        the download is pinned to the ETag the version was read with, so a model pushed in between
+        is never tagged with the old version: the pinned read fails & the load starts over once
+        from a fresh HEAD
+        '''
+        try:
+            metadata = self.s3.get_object_metadata(self.model_path, self.bucket_name)
+            try:
+                self._load_version(metadata)
+            except Exception:
+                fresh_metadata = self.s3.get_object_metadata(self.model_path, self.bucket_name, use_cache=False)
+                if metadata is None or fresh_metadata is None or fresh_metadata.etag == metadata.etag:
+                    raise
+                logging.warning(f'Model {self.model_path} replaced while loading, loading version {fresh_metadata.version}')
+                self._load_version(fresh_metadata)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _load_version(self, metadata: Optional[ObjectMetadata]) -> None:
+        if metadata is None:
+            raise Exception(f'Model {self.model_path} not found in bucket {self.bucket_name}')
+        model_version = metadata.version
+        if self.shared_model_dir:
+            try:
+                self.compiled_model = self.load_shared_model(model_version, if_match=metadata.etag)
+                self.loaded_model = None
+                self.model_version = model_version
+                logging.info(f'Memory-mapped shared model version {self.model_version}')
+                return
+            except Exception as e:
+                logging.warning(f'Shared model unavailable, loading a private copy: {e}')
+
+        model = self.load_model(if_match=metadata.etag)
+        self.compiled_model = self.compile_model(model) if self.use_compiled_model else None
+        self.model_version = model_version
+        self.loaded_model = model
+        logging.info(f'Loaded model version {self.model_version}')
     
+    def shared_model_path(self, model_version: str) -> str:
+        key = hashlib.sha256(f'{self.bucket_name}/{self.model_path}@{model_version}'.encode()).hexdigest()[:16]
+        return os.path.join(self.shared_model_dir, key)
+
+    def load_shared_model(self, model_version: str, if_match: str = None) -> CompiledModel:
+        '''
+        maps the compiled model of model_version from shared_model_dir, building it first when no
+        worker has yet (from the object with ETag if_match, when given). it is written to a temp
+        dir & renamed into place, so readers never see a partial model & concurrent builders
+        don't clash (the first rename wins)
+        '''
+        bundle_dir = self.shared_model_path(model_version)
+        if not os.path.isdir(bundle_dir):
+            os.makedirs(self.shared_model_dir, exist_ok=True)
+            compiled_model = CompiledModel.from_model(self.load_model(if_match=if_match))
+            temp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=self.shared_model_dir)
+            try:
+                compiled_model.save(temp_dir)
+                os.rename(temp_dir, bundle_dir)
+                logging.info(f'Published shared model version {model_version} to {bundle_dir}')
+            except OSError:
+                # another worker published it first
+                shutil.rmtree(temp_dir, ignore_errors=True)
+            self._prune_shared_models(keep=bundle_dir)
+        return CompiledModel.load(bundle_dir, mmap_mode='r')
+
+    def _prune_shared_models(self, keep: str) -> None:
+        '''drops all but the newest SHARED_MODEL_KEEP_VERSIONS versions (mapped files stay valid after unlink)'''
+        bundles = [entry.path for entry in os.scandir(self.shared_model_dir)
+                   if entry.is_dir() and not entry.name.startswith('.') and entry.path != keep]
+        bundles.sort(key=os.path.getmtime, reverse=True)
+        for bundle in bundles[SHARED_MODEL_KEEP_VERSIONS - 1:]:
+            shutil.rmtree(bundle, ignore_errors=True)
+
     def save_model(self, from_file, remove: bool = False) -> None:
         try:
             self.s3.upload_file(from_file, self.model_path, self.bucket_name, remove)
         except Exception as e:
             raise MyException(e, sys) from e
 
+    @property
+    def drift_reference_key(self) -> str:
+        return drift_reference_path(self.model_path)
+
+    def load_drift_reference(self) -> Optional[DriftSketch]:
+        '''Output: the drift reference pushed with the model, None for models pushed without one'''
+        try:
+            if not self.s3.object_exists(self.bucket_name, self.drift_reference_key):
+                return None
+            return DriftSketch.from_dict(yaml.safe_load(self.s3.read_bytes(self.drift_reference_key, self.bucket_name)))
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def save_drift_reference(self, from_file) -> None:
+        try:
+            self.s3.upload_file(from_file, self.drift_reference_key, self.bucket_name, remove=False)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    @staticmethod
+    def compile_model(model: MyModel) -> CompiledModel:
+        '''compiles the model, falls back to None (plain MyModel predictions) when it can't be compiled'''
+        try:
+            return CompiledModel.from_model(model)
+        except Exception as e:
+            logging.warning(f'Model could not be compiled, using sklearn predictions: {e}')
+            return None
+
+    def _ensure_loaded(self) -> None:
+        if not self.is_loaded:
+            self.load()
+
     def predict(self, dataframe: DataFrame):
         try:
-            if self.loaded_model is None:
-                self.loaded_model = self.load_model()
+            self._ensure_loaded()
+            if self.compiled_model is not None and (self.loaded_model is None or len(dataframe) <= self.compiled_max_rows):
+                return self.compiled_model.predict(dataframe)
             return self.loaded_model.predict(dataframe)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def predict_array(self, features):
+        '''features: 2d array / list of tuples in MyModel.INPUT_COLUMNS order (no DataFrame needed)'''
+        try:
+            self._ensure_loaded()
+            if self.compiled_model is not None and (self.loaded_model is None or len(features) <= self.compiled_max_rows):
+                return self.compiled_model.predict_array(features)
+            return self.loaded_model.predict_array(features)
         except Exception as e:
             raise MyException(e, sys) from e
\ No newline at end of file
@@ -1,6 +1,9 @@
+import atexit
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from from_root import from_root
 from datetime import datetime
 
@@ -9,13 +12,73 @@ LOG_FILE = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
 MAX_LOG_FILE_SIZE = 5 * 1024 * 1024
 BACKUP_COUNT = 3
 
+# LOG_QUEUE=0 writes on the calling thread (the old behaviour), otherwise a background listener writes
+LOG_QUEUE_ENV_KEY = 'LOG_QUEUE'
+# per module levels, e.g. LOG_LEVELS="src.entity.estimator=WARNING,src.cloud_storage=DEBUG"
+LOG_LEVELS_ENV_KEY = 'LOG_LEVELS'
+# keep 1 of every N INFO/DEBUG records of each hot path message (1 keeps all)
+LOG_SAMPLE_EVERY_ENV_KEY = 'LOG_SAMPLE_EVERY'
+DEFAULT_LOG_SAMPLE_EVERY = 100
+# per prediction loggers whose routine messages are sampled
+HOT_PATH_LOGGERS = ('src.pipeline.prediction_pipeline', 'src.entity.estimator')
+
 log_dir_path = os.path.join(from_root(), LOG_DIR)
 os.makedirs(log_dir_path, exist_ok=True)
 log_file_path = os.path.join(log_dir_path, LOG_FILE)
 
+_queue_listener: QueueListener = None
+
+class SamplingFilter(logging.Filter):
+    '''
+    lets through 1 of every sample_every records per logging call site below WARNING;
+    warnings, errors & records logged with extra={'sample': False} always pass. sampled
+    records say how many they stand for
+
+    keyed by call site rather than message, so f-string messages are sampled too & the counts
+    stay bounded by the number of log calls in the code (hot paths still pass %-style args,
+    which skip formatting for the dropped records)
+    '''
+    def __init__(self, sample_every: int):
+        super().__init__()
+        self.sample_every = max(1, sample_every)
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.sample_every == 1 or not getattr(record, 'sample', True):
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        if count % self.sample_every:
+            return False
+        if count:
+            record.msg = f'{record.msg} [sampled 1/{self.sample_every}]'
+        return True
+
+def parse_log_levels(value: str) -> dict:
+    '''"a.b=WARNING,c=DEBUG" -> {'a.b': 'WARNING', 'c': 'DEBUG'}'''
+    levels = {}
+    for item in filter(None, (part.strip() for part in (value or '').split(','))):
+        name, _, level = item.partition('=')
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+def stop_queue_listener():
+    '''writes out what is still queued & stops the background writer'''
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
 def configure_logger():
     """
     configures logging with a roatting file handle & a console handler
+
+    by default records are put on a queue & written by a QueueListener thread, so request
+    threads never format to / wait on the file or console. LOG_LEVELS sets per module levels
+    & hot path loggers are sampled (LOG_SAMPLE_EVERY)
     """
 
     logger = logging.getLogger()
@@ -31,7 +94,22 @@ def configure_logger():
     console_handler.setFormatter(formatter)
     console_handler.setLevel(logging.INFO)
 
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    if os.getenv(LOG_QUEUE_ENV_KEY, '1') != '0':
+        global _queue_listener
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(QueueHandler(log_queue))
+        _queue_listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+        _queue_listener.start()
+        atexit.register(stop_queue_listener)
+    else:
+        logger.addHandler(file_handler)
+        logger.addHandler(console_handler)
+
+    for name, level in parse_log_levels(os.getenv(LOG_LEVELS_ENV_KEY)).items():
+        logging.getLogger(name).setLevel(level)
+
+    sampling_filter = SamplingFilter(int(os.getenv(LOG_SAMPLE_EVERY_ENV_KEY, DEFAULT_LOG_SAMPLE_EVERY)))
+    for name in HOT_PATH_LOGGERS:
+        logging.getLogger(name).addFilter(sampling_filter)
 
-configure_logger()
\ No newline at end of file
+configure_logger()
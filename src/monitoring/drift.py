@@ -0,0 +1,301 @@
+'''
+data drift of raw features against the data the serving model was trained on
+
+python -m src.monitoring.drift --reference drift_reference.yaml --input new.parquet [--chunk-rows 500000]
+
+DataTransformation summarizes the training data into a DriftSketch (a histogram per numerical
+feature, on quantile bins of the training data, & a frequency table per categorical one) that
+travels next to model.pkl. sketches with the same bins merge by adding counts, so new data is
+folded in batch by batch (ingestion runs, served traffic, file chunks) & scored against the
+reference with PSI (& KS for numerical features) without the training data
+'''
+import argparse
+import json
+import os
+import sys
+import threading
+from typing import Dict, Iterable
+import numpy as np
+import pandas as pd
+from src.constants import (TARGET_COLUMN, SCHEMA_FILE_PATH, DRIFT_REFERENCE_FILE_NAME, DRIFT_HISTOGRAM_BINS,
+                           DRIFT_PSI_THRESHOLD, DRIFT_KS_THRESHOLD, DRIFT_MIN_ROWS, DRIFT_SERVING_FLUSH_ROWS)
+from src.exception import MyException
+from src.logger import logging
+from src.monitoring.metrics import registry
+from src.utils.main_utils import read_yaml_file, write_yaml_file, iter_dataframe_chunks
+from src.utils.vehicle_features import decode_vehicle_features
+
+# proportions of empty bins / unseen categories, keeps PSI finite
+PSI_EPSILON = 1e-4
+
+def drift_reference_path(model_path: str) -> str:
+    '''Output: where the drift reference of the model at model_path (a file or a bucket key) lives'''
+    return os.path.join(os.path.dirname(model_path), DRIFT_REFERENCE_FILE_NAME).replace(os.sep, '/')
+
+def psi(expected: np.ndarray, actual: np.ndarray) -> float:
+    '''population stability index of two count vectors over the same bins'''
+    expected = np.clip(expected / max(expected.sum(), 1), PSI_EPSILON, None)
+    actual = np.clip(actual / max(actual.sum(), 1), PSI_EPSILON, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+class HistogramSketch:
+    '''
+    counts of a numerical feature over fixed bins: below edges[0], [edges[i], edges[i + 1]),
+    at or above edges[-1]; nulls are counted apart
+    '''
+    kind = 'histogram'
+
+    def __init__(self, edges: np.ndarray, counts: np.ndarray = None, nulls: int = 0):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        self.nulls = nulls
+
+    @classmethod
+    def with_quantile_bins(cls, values: pd.Series, bins: int) -> 'HistogramSketch':
+        '''bins at the quantiles of values (fewer for discrete features, whose quantiles repeat)'''
+        numbers = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        numbers = numbers[~np.isnan(numbers)]
+        edges = np.unique(np.quantile(numbers, np.linspace(0, 1, bins + 1))) if len(numbers) else np.array([0.0])
+        return cls(edges)
+
+    def empty_like(self) -> 'HistogramSketch':
+        return HistogramSketch(self.edges)
+
+    def update(self, values: pd.Series) -> 'HistogramSketch':
+        numbers = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        missing = np.isnan(numbers)
+        self.nulls += int(missing.sum())
+        indexes = np.searchsorted(self.edges, numbers[~missing], side='right')
+        self.counts += np.bincount(indexes, minlength=len(self.counts))
+        return self
+
+    def merge(self, other: 'HistogramSketch') -> 'HistogramSketch':
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError('Histograms with different bins cannot be merged')
+        self.counts += other.counts
+        self.nulls += other.nulls
+        return self
+
+    @property
+    def rows(self) -> int:
+        return int(self.counts.sum()) + self.nulls
+
+    def scores(self, current: 'HistogramSketch') -> dict:
+        '''Output: psi & ks (largest gap of the two CDFs at the bin edges) of current against self'''
+        expected = self.counts / max(self.counts.sum(), 1)
+        actual = current.counts / max(current.counts.sum(), 1)
+        return {'psi': psi(self.counts, current.counts),
+                'ks': float(np.abs(np.cumsum(expected) - np.cumsum(actual)).max())}
+
+    def to_dict(self) -> dict:
+        return {'kind': self.kind, 'edges': self.edges.tolist(), 'counts': self.counts.tolist(), 'nulls': self.nulls}
+
+class FrequencySketch:
+    '''counts of every value of a categorical feature, nulls counted apart'''
+    kind = 'frequency'
+
+    def __init__(self, counts: Dict[str, int] = None, nulls: int = 0):
+        self.counts = dict(counts or {})
+        self.nulls = nulls
+
+    def empty_like(self) -> 'FrequencySketch':
+        return FrequencySketch()
+
+    def update(self, values: pd.Series) -> 'FrequencySketch':
+        self.nulls += int(values.isna().sum())
+        counts = values.value_counts(dropna=True, sort=False)
+        for value, count in counts[counts > 0].items():
+            self.counts[str(value)] = self.counts.get(str(value), 0) + int(count)
+        return self
+
+    def merge(self, other: 'FrequencySketch') -> 'FrequencySketch':
+        for value, count in other.counts.items():
+            self.counts[value] = self.counts.get(value, 0) + count
+        self.nulls += other.nulls
+        return self
+
+    @property
+    def rows(self) -> int:
+        return sum(self.counts.values()) + self.nulls
+
+    def scores(self, current: 'FrequencySketch') -> dict:
+        '''Output: psi over the categories of both (unseen ones count as new bins)'''
+        values = sorted(set(self.counts) | set(current.counts))
+        return {'psi': psi(np.array([self.counts.get(value, 0) for value in values], dtype=np.float64),
+                           np.array([current.counts.get(value, 0) for value in values], dtype=np.float64))}
+
+    def to_dict(self) -> dict:
+        return {'kind': self.kind, 'counts': dict(sorted(self.counts.items())), 'nulls': self.nulls}
+
+SKETCH_KINDS = {HistogramSketch.kind: HistogramSketch, FrequencySketch.kind: FrequencySketch}
+
+class DriftSketch:
+    '''one mergeable sketch per raw feature (the schema's model columns without the target)'''
+    def __init__(self, features: dict):
+        self.features = features
+
+    @classmethod
+    def from_reference(cls, dataframe: pd.DataFrame, schema_config: dict,
+                       bins: int = DRIFT_HISTOGRAM_BINS) -> 'DriftSketch':
+        '''Output: sketch of dataframe with histogram bins at its quantiles, the reference of later data'''
+        try:
+            features = {}
+            for column in schema_config['numerical_columns']:
+                if column != TARGET_COLUMN and column in dataframe.columns:
+                    features[column] = HistogramSketch.with_quantile_bins(dataframe[column], bins)
+            for column in schema_config['categorical_columns']:
+                if column in dataframe.columns:
+                    features[column] = FrequencySketch()
+            return cls(features).update(dataframe)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def empty_like(self) -> 'DriftSketch':
+        '''Output: sketch with the same bins & no data, to fold new data into'''
+        return DriftSketch({name: sketch.empty_like() for name, sketch in self.features.items()})
+
+    def update(self, dataframe: pd.DataFrame) -> 'DriftSketch':
+        '''adds the rows of dataframe (raw schema columns; missing features are skipped)'''
+        for name, sketch in self.features.items():
+            if name in dataframe.columns:
+                sketch.update(dataframe[name])
+        return self
+
+    def merge(self, other: 'DriftSketch') -> 'DriftSketch':
+        for name, sketch in self.features.items():
+            if name in other.features:
+                sketch.merge(other.features[name])
+        return self
+
+    @property
+    def rows(self) -> int:
+        return max((sketch.rows for sketch in self.features.values()), default=0)
+
+    def to_dict(self) -> dict:
+        return {'rows': self.rows, 'features': {name: sketch.to_dict() for name, sketch in self.features.items()}}
+
+    @classmethod
+    def from_dict(cls, content: dict) -> 'DriftSketch':
+        features = {}
+        for name, sketch in content['features'].items():
+            sketch = dict(sketch)
+            features[name] = SKETCH_KINDS[sketch.pop('kind')](**sketch)
+        return cls(features)
+
+    def save(self, file_path: str) -> None:
+        write_yaml_file(file_path, self.to_dict())
+
+    @classmethod
+    def load(cls, file_path: str) -> 'DriftSketch':
+        return cls.from_dict(read_yaml_file(file_path))
+
+def drift_report(reference: DriftSketch, current: DriftSketch, psi_threshold: float = DRIFT_PSI_THRESHOLD,
+                 ks_threshold: float = DRIFT_KS_THRESHOLD, min_rows: int = DRIFT_MIN_ROWS) -> dict:
+    '''
+    per feature PSI (& KS) of current against reference; a feature drifted when its PSI reaches
+    psi_threshold or its KS ks_threshold. with fewer than min_rows current rows the scores are
+    noise, so no retrain is recommended yet
+
+    Output: {reference_rows, current_rows, features: {name: scores}, drifted_features, retrain_recommended}
+    '''
+    features = {name: sketch.scores(current.features[name]) for name, sketch in reference.features.items()
+                if name in current.features}
+    drifted = [name for name, scores in features.items()
+               if scores['psi'] >= psi_threshold or scores.get('ks', 0.0) >= ks_threshold]
+    enough_rows = current.rows >= min_rows
+    return {'reference_rows': reference.rows, 'current_rows': current.rows,
+            'features': {name: {key: round(value, 6) for key, value in scores.items()} for name, scores in features.items()},
+            'drifted_features': drifted if enough_rows else [],
+            'retrain_recommended': enough_rows and len(drifted) > 0,
+            'enough_rows': enough_rows}
+
+class DriftMonitor:
+    '''
+    folds served model inputs into a sketch against the serving model's reference, thread safe
+
+    observe() only appends the rows to a buffer under a short lock. once flush_rows rows are
+    buffered, one background thread takes the buffer, decodes it to raw features, updates the
+    sketch & publishes feature_drift_psi / feature_drift_ks gauges per feature, so requests
+    never decode, score or wait for a flush. every served row is counted, cache hits included,
+    as they are part of the traffic the model sees
+    '''
+    def __init__(self, reference: DriftSketch, model_version: str = None, flush_rows: int = DRIFT_SERVING_FLUSH_ROWS):
+        self.reference = reference
+        self.model_version = model_version
+        self.current = reference.empty_like()
+        self.flush_rows = flush_rows
+        self._pending = []
+        self._pending_rows = 0
+        self._flushing = False
+        # guards the buffer only, held by requests
+        self._lock = threading.Lock()
+        # guards self.current, held by the flush thread & report()
+        self._sketch_lock = threading.Lock()
+
+    def observe(self, features: np.ndarray) -> None:
+        '''features: model input rows (PREDICTION_INPUT_COLUMNS order) that were just served'''
+        features = np.asarray(features, dtype=np.float64)
+        with self._lock:
+            self._pending.append(features)
+            self._pending_rows += len(features)
+            if self._pending_rows < self.flush_rows or self._flushing:
+                return
+            self._flushing = True
+        threading.Thread(target=self._flush, name='drift-flush', daemon=True).start()
+
+    def _fold(self) -> dict:
+        '''folds the buffered rows into the sketch; Output: drift report of the sketch'''
+        with self._sketch_lock:
+            with self._lock:
+                pending, self._pending, self._pending_rows = self._pending, [], 0
+            if pending:
+                self.current.update(decode_vehicle_features(np.vstack(pending)))
+            return drift_report(self.reference, self.current)
+
+    def _flush(self) -> None:
+        try:
+            self._publish(self._fold())
+        except Exception as e:
+            # advisory: a failed flush never reaches the requests
+            logging.warning(f'Drift flush failed: {e}')
+        finally:
+            with self._lock:
+                self._flushing = False
+
+    @staticmethod
+    def _publish(report: dict) -> None:
+        for name, scores in report['features'].items():
+            for score, value in scores.items():
+                registry.gauge(f'feature_drift_{score}', f'{score.upper()} of served {name} against the training data',
+                               labels={'feature': name}).set(value)
+
+    def report(self) -> dict:
+        '''Output: drift report including the rows still buffered'''
+        report = self._fold()
+        self._publish(report)
+        return {'model_version': self.model_version, **report}
+
+def sketch_chunks(reference: DriftSketch, chunks: Iterable[pd.DataFrame]) -> DriftSketch:
+    '''Output: sketch of all chunks on the reference bins, one chunk in memory at a time'''
+    current = reference.empty_like()
+    for chunk in chunks:
+        current.update(chunk)
+    return current
+
+def main():
+    parser = argparse.ArgumentParser(description='Score a data file for drift against a drift reference')
+    parser.add_argument('--reference', required=True, help='drift_reference.yaml saved next to the model')
+    parser.add_argument('--input', required=True, help='raw schema columns as csv, parquet or arrow')
+    parser.add_argument('--chunk-rows', type=int, default=500000)
+    args = parser.parse_args()
+
+    reference = DriftSketch.load(args.reference)
+    schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+    columns = [column for column in schema_config['numerical_columns'] + schema_config['categorical_columns']
+               if column in reference.features]
+    report = drift_report(reference, sketch_chunks(reference, iter_dataframe_chunks(args.input, args.chunk_rows, columns)))
+    logging.info(f"Drifted features: {report['drifted_features']}")
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Optional, Sequence
+
+DEFAULT_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# per stage timings are sub millisecond for single rows, so the low end is finer
+PREDICTION_STAGE_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _escape_label_value(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels: Optional[dict]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label_value(value)}"' for key, value in sorted(labels.items())) + '}'
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+class Counter:
+    '''monotonically increasing value'''
+    prometheus_type = 'counter'
+
+    def __init__(self, name: str, description: str, labels: dict = None):
+        self.name = name
+        self.description = description
+        self.labels = dict(labels or {})
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def snapshot(self) -> dict:
+        return {'type': 'counter', 'value': self._value}
+
+    def samples(self) -> list:
+        return [(self.name, self.labels, self._value)]
+
+class Gauge:
+    '''value that can go up & down'''
+    prometheus_type = 'gauge'
+
+    def __init__(self, name: str, description: str, labels: dict = None):
+        self.name = name
+        self.description = description
+        self.labels = dict(labels or {})
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value -= amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def snapshot(self) -> dict:
+        return {'type': 'gauge', 'value': self._value}
+
+    def samples(self) -> list:
+        return [(self.name, self.labels, self._value)]
+
+class _Timer:
+    '''context manager observing the elapsed time of its block into a histogram'''
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram: 'Histogram'):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+class Histogram:
+    '''
+    fixed bucket histogram (cumulative on export, like prometheus)
+    bucket upper bounds are inclusive
+    '''
+    prometheus_type = 'histogram'
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS, labels: dict = None):
+        self.name = name
+        self.description = description
+        self.labels = dict(labels or {})
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def time(self) -> _Timer:
+        '''with histogram.time(): ... -> observes the block's duration in seconds'''
+        return _Timer(self)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative, running = {}, 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            running += bucket_count
+            cumulative[str(bound)] = running
+        cumulative['+Inf'] = count
+        return {'type': 'histogram', 'buckets': cumulative, 'sum': total, 'count': count}
+
+    def samples(self) -> list:
+        snapshot = self.snapshot()
+        samples = [(f'{self.name}_bucket', {**self.labels, 'le': bound if bound == '+Inf' else _format_value(float(bound))}, count)
+                   for bound, count in snapshot['buckets'].items()]
+        samples.append((f'{self.name}_sum', self.labels, snapshot['sum']))
+        samples.append((f'{self.name}_count', self.labels, snapshot['count']))
+        return samples
+
+class MetricsRegistry:
+    '''
+    process wide collection of named metrics, get-or-create on access
+
+    a metric with labels is one series of its name; look series up once & keep the object,
+    so the hot path only pays for the observation itself
+    '''
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, metric_type, name: str, labels: Optional[dict], *args):
+        key = name + _format_labels(labels)
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                for existing in self._metrics.values():
+                    if existing.name == name and not isinstance(existing, metric_type):
+                        raise ValueError(f'Metric {name} is already registered as {type(existing).__name__}')
+                metric = metric_type(name, *args, labels=labels)
+                self._metrics[key] = metric
+            elif not isinstance(metric, metric_type):
+                raise ValueError(f'Metric {name} is already registered as {type(metric).__name__}')
+            return metric
+
+    def counter(self, name: str, description: str = '', labels: dict = None) -> Counter:
+        return self._get_or_create(Counter, name, labels, description)
+
+    def gauge(self, name: str, description: str = '', labels: dict = None) -> Gauge:
+        return self._get_or_create(Gauge, name, labels, description)
+
+    def histogram(self, name: str, description: str = '', buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+                  labels: dict = None) -> Histogram:
+        return self._get_or_create(Histogram, name, labels, description, buckets)
+
+    def set_info(self, name: str, description: str = '', labels: dict = None) -> Gauge:
+        '''
+        makes labels the only series of the info gauge name (value 1), replacing the others in
+        one step, so a concurrent render shows either the old or the new labels, never none
+        '''
+        metric = Gauge(name, description, labels=labels)
+        metric.set(1)
+        with self._lock:
+            for key in [key for key, existing in self._metrics.items() if existing.name == name]:
+                del self._metrics[key]
+            self._metrics[name + _format_labels(labels)] = metric
+        return metric
+
+    def remove(self, name: str) -> None:
+        '''drops every series of a metric (e.g. an info gauge whose label value changed)'''
+        with self._lock:
+            for key in [key for key, metric in self._metrics.items() if metric.name == name]:
+                del self._metrics[key]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+        return {key: metric.snapshot() for key, metric in sorted(metrics.items())}
+
+    def render_prometheus(self) -> str:
+        '''Output: all metrics in the prometheus text exposition format (0.0.4)'''
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines, current_name = [], None
+        for metric in metrics:
+            if metric.name != current_name:
+                current_name = metric.name
+                lines.append(f'# HELP {metric.name} {metric.description}')
+                lines.append(f'# TYPE {metric.name} {metric.prometheus_type}')
+            for sample_name, labels, value in metric.samples():
+                lines.append(f'{sample_name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+def stage_histogram(stage: str) -> Histogram:
+    '''latency histogram of one prediction stage (parse, input_build, transform, predict)'''
+    return registry.histogram('prediction_stage_seconds', 'Time spent in each stage of a prediction',
+                              PREDICTION_STAGE_BUCKETS, labels={'stage': stage})
+
+def root_cause(error: BaseException) -> BaseException:
+    '''the original exception behind MyException wrappers (raised "from e")'''
+    while error.__cause__ is not None:
+        error = error.__cause__
+    return error
+
+def update_process_metrics() -> None:
+    '''refreshes process memory gauges, called at scrape time'''
+    try:
+        with open('/proc/self/statm') as statm:
+            virtual_pages, resident_pages = (int(value) for value in statm.read().split()[:2])
+        page_size = os.sysconf('SC_PAGE_SIZE')
+        registry.gauge('process_resident_memory_bytes', 'Resident memory size in bytes').set(resident_pages * page_size)
+        registry.gauge('process_virtual_memory_bytes', 'Virtual memory size in bytes').set(virtual_pages * page_size)
+    except (OSError, ValueError):
+        # no procfs (macOS, windows): peak rss is the best available
+        import resource
+        registry.gauge('process_max_resident_memory_bytes', 'Peak resident memory size in bytes').set(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
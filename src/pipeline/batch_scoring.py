@@ -0,0 +1,162 @@
+'''
+offline bulk scoring of lead files with the production (or a local) model
+
+python -m src.pipeline.batch_scoring --input leads.csv --output scores.csv [--model-file model.pkl]
+    [--chunk-rows 100000] [--workers 8]
+
+the input (csv, parquet or arrow, raw schema columns or already encoded model columns) is read in
+chunks of chunk_rows, chunks are encoded & scored on a process pool & written out in input
+order as they finish. at most workers * max_in_flight_per_worker chunks exist at any time,
+so peak memory does not grow with the file size
+'''
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from src.logger import logging
+from src.exception import MyException
+from src.constants import PREDICTION_INPUT_COLUMNS
+from src.entity.config_entity import BatchScoringConfig
+from src.entity.s3_estimator import Proj1Estimator
+from src.utils.main_utils import load_object, save_object, iter_dataframe_chunks
+from src.utils.vehicle_features import encode_vehicle_features
+
+# model loaded once per worker process by _init_worker
+_worker_model = None
+
+def _init_worker(model_file: str) -> None:
+    global _worker_model
+    _worker_model = load_object(model_file)
+
+def _score_chunk(chunk: pd.DataFrame, id_column: str, output_column: str, first_row: int) -> pd.DataFrame:
+    '''runs in a worker: encodes the raw chunk like DataTransformation & predicts it'''
+    if all(column in chunk.columns for column in PREDICTION_INPUT_COLUMNS):
+        features = chunk[PREDICTION_INPUT_COLUMNS]
+    else:
+        features = encode_vehicle_features(chunk)
+    predictions = _worker_model.predict_array(features.to_numpy(dtype=np.float64))
+    ids = chunk[id_column].to_numpy() if id_column in chunk.columns else np.arange(first_row, first_row + len(chunk))
+    return pd.DataFrame({id_column: ids, output_column: predictions})
+
+def _is_parquet(file_path: str) -> bool:
+    return file_path.lower().endswith(('.parquet', '.pq'))
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError as e:
+        raise Exception('Parquet files need pyarrow: pip install pyarrow') from e
+
+class ChunkWriter:
+    '''appends scored chunks to a csv or parquet file'''
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._parquet_writer = None
+        self._header_written = False
+        os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        if _is_parquet(self.file_path):
+            pyarrow = _import_pyarrow()
+            table = pyarrow.Table.from_pandas(chunk, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pyarrow.parquet.ParquetWriter(self.file_path, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            chunk.to_csv(self.file_path, mode='a' if self._header_written else 'w',
+                         header=not self._header_written, index=False)
+            self._header_written = True
+
+    def close(self) -> None:
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+class BatchScorer:
+    def __init__(self, batch_scoring_config: BatchScoringConfig = BatchScoringConfig()):
+        self.batch_scoring_config = batch_scoring_config
+
+    def _fetch_production_model(self, file_path: str) -> None:
+        '''downloads the production model once, workers load it from file_path'''
+        estimator = Proj1Estimator(bucket_name=self.batch_scoring_config.model_bucket_name,
+                                   model_path=self.batch_scoring_config.model_file_path,
+                                   storage_backend=self.batch_scoring_config.storage_backend)
+        save_object(file_path, estimator.load_model())
+
+    def score_file(self, input_file: str, output_file: str, model_file: str = None) -> dict:
+        '''
+        Output: summary with rows, chunks, seconds & rows_per_second
+        '''
+        try:
+            config = self.batch_scoring_config
+            with tempfile.TemporaryDirectory() as temp_dir:
+                if model_file is None:
+                    model_file = os.path.join(temp_dir, 'model.pkl')
+                    self._fetch_production_model(model_file)
+
+                start = time.perf_counter()
+                max_in_flight = config.workers * config.max_in_flight_per_worker
+                writer = ChunkWriter(output_file)
+                pending = deque()
+                rows, chunks = 0, 0
+
+                def write_oldest() -> None:
+                    nonlocal rows, chunks
+                    scored = pending.popleft().result()
+                    writer.write(scored)
+                    rows += len(scored)
+                    chunks += 1
+                    elapsed = time.perf_counter() - start
+                    logging.info(f'Scored {rows} rows in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)')
+
+                try:
+                    with ProcessPoolExecutor(max_workers=config.workers, mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=_init_worker, initargs=(model_file,)) as pool:
+                        first_row = 0
+                        for chunk in iter_dataframe_chunks(input_file, config.chunk_rows):
+                            # bounded read ahead: wait for the oldest chunk before reading more
+                            if len(pending) >= max_in_flight:
+                                write_oldest()
+                            pending.append(pool.submit(_score_chunk, chunk, config.id_column,
+                                                       config.output_column, first_row))
+                            first_row += len(chunk)
+                        while pending:
+                            write_oldest()
+                finally:
+                    writer.close()
+
+            seconds = time.perf_counter() - start
+            summary = {'input_file': input_file, 'output_file': output_file, 'rows': rows, 'chunks': chunks,
+                       'workers': config.workers, 'seconds': seconds, 'rows_per_second': rows / seconds if seconds else 0.0}
+            logging.info(f'Batch scoring finished: {summary}')
+            return summary
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+def main():
+    defaults = BatchScoringConfig()
+    parser = argparse.ArgumentParser(description='Score a csv / parquet lead file in chunks')
+    parser.add_argument('--input', required=True, help='csv or parquet file with raw schema (or encoded model) columns')
+    parser.add_argument('--output', required=True, help='csv or parquet file for the predictions')
+    parser.add_argument('--model-file', default=None, help='local MyModel pickle (default: production model from S3)')
+    parser.add_argument('--chunk-rows', type=int, default=defaults.chunk_rows)
+    parser.add_argument('--workers', type=int, default=defaults.workers)
+    parser.add_argument('--max-in-flight-per-worker', type=int, default=defaults.max_in_flight_per_worker)
+    args = parser.parse_args()
+
+    config = BatchScoringConfig(chunk_rows=args.chunk_rows, workers=args.workers,
+                                max_in_flight_per_worker=args.max_in_flight_per_worker)
+    summary = BatchScorer(config).score_file(args.input, args.output, args.model_file)
+    print(json.dumps(summary, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import sys
+import time
+import numpy as np
+from src.logger import logging
+from src.exception import MyException
+from src.entity.config_entity import ModelPreloadConfig, VehiclePredictorConfig
+from src.entity.s3_estimator import Proj1Estimator
+from src.monitoring.metrics import registry
+from src.pipeline.prediction_pipeline import VehicleDataClassifier
+from src.utils.vehicle_features import generate_vehicle_features
+
+class ModelLoader:
+    '''
+    downloads, deserializes & warms up a model before it takes traffic
+
+    warm-up scores synthetic rows drawn from config/schema.yaml at every warm_up_batch_sizes,
+    so both the compiled path (small batches) & the sklearn path (batches above
+    compiled_max_rows) have run once. used by the startup preload & by ModelRefresher
+    '''
+    def __init__(self, preload_config: ModelPreloadConfig = ModelPreloadConfig(),
+                 prediction_pipeline_config: VehiclePredictorConfig = VehiclePredictorConfig()):
+        self.preload_config = preload_config
+        self.prediction_pipeline_config = prediction_pipeline_config
+        self._warm_up_features: np.ndarray = None
+
+        self.load_seconds_gauge = registry.gauge('model_load_seconds', 'Download + deserialize time of the serving model')
+        self.warm_up_seconds_gauge = registry.gauge('model_warmup_seconds', 'Warm-up prediction time of the serving model')
+
+    @property
+    def warm_up_features(self) -> np.ndarray:
+        if self._warm_up_features is None:
+            num_rows = max(self.preload_config.warm_up_batch_sizes, default=1)
+            self._warm_up_features = generate_vehicle_features(num_rows)
+        return self._warm_up_features
+
+    def warm_up(self, estimator: Proj1Estimator) -> float:
+        '''
+        Output: seconds spent on the warm-up predictions
+        '''
+        start = time.perf_counter()
+        for batch_size in self.preload_config.warm_up_batch_sizes:
+            estimator.predict_array(self.warm_up_features[:batch_size])
+        return time.perf_counter() - start
+
+    def load(self) -> Proj1Estimator:
+        '''
+        Output: loaded & warmed estimator, not yet serving (see VehicleDataClassifier.swap_model)
+        '''
+        try:
+            start = time.perf_counter()
+            estimator = VehicleDataClassifier.build_estimator(self.prediction_pipeline_config)
+            estimator.load()
+            if self.prediction_pipeline_config.drift_monitor_enabled:
+                try:
+                    estimator.drift_reference = estimator.load_drift_reference()
+                except Exception as e:
+                    logging.warning(f'Drift reference not loaded, served traffic is not monitored: {e}')
+            load_seconds = time.perf_counter() - start
+            self.load_seconds_gauge.set(load_seconds)
+
+            warm_up_seconds = self.warm_up(estimator)
+            self.warm_up_seconds_gauge.set(warm_up_seconds)
+            logging.info(f'Model version {estimator.model_version} loaded in {load_seconds:.2f}s, '
+                         f'warmed up in {warm_up_seconds:.2f}s')
+            return estimator
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def preload(self) -> None:
+        '''loads, warms & starts serving the current model (blocking, run it off the event loop)'''
+        VehicleDataClassifier.swap_model(self.load())
@@ -0,0 +1,69 @@
+import sys
+import threading
+from src.logger import logging
+from src.exception import MyException
+from src.entity.config_entity import ModelRefresherConfig, VehiclePredictorConfig
+from src.monitoring.metrics import registry
+from src.pipeline.model_loader import ModelLoader
+from src.pipeline.prediction_pipeline import VehicleDataClassifier
+
+class ModelRefresher:
+    '''
+    background thread that keeps VehicleDataClassifier on the latest pushed model
+
+    every interval_seconds it HEADs the model object; when its version/ETag differs from the
+    serving one, the new model is downloaded, deserialized & warmed by the ModelLoader on
+    this thread (off the request path) and only then swapped in
+    '''
+    def __init__(self, refresher_config: ModelRefresherConfig = ModelRefresherConfig(),
+                 prediction_pipeline_config: VehiclePredictorConfig = VehiclePredictorConfig(),
+                 model_loader: ModelLoader = None):
+        self.refresher_config = refresher_config
+        self.prediction_pipeline_config = prediction_pipeline_config
+        self.model_loader = model_loader or ModelLoader(prediction_pipeline_config=prediction_pipeline_config)
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread = None
+        self._probe = None
+
+        self.reloads_counter = registry.counter('model_reloads_total', 'Models hot swapped into serving')
+        self.failures_counter = registry.counter('model_reload_failures_total', 'Failed model refresh attempts')
+
+    def refresh_once(self) -> bool:
+        '''
+        Output: True when a new model version was loaded & swapped in
+        '''
+        try:
+            if self._probe is None:
+                self._probe = VehicleDataClassifier.build_estimator(self.prediction_pipeline_config)
+            remote_version = self._probe.get_model_version()
+            if remote_version is not None and remote_version == VehicleDataClassifier.get_model_version():
+                return False
+
+            logging.info(f'New model version {remote_version} found, loading it in the background')
+            VehicleDataClassifier.swap_model(self.model_loader.load())
+            self.reloads_counter.inc()
+            return True
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.refresh_once()
+            except Exception as e:
+                self.failures_counter.inc()
+                logging.error(f'Model refresh failed, still serving version {VehicleDataClassifier.get_model_version()}: {e}')
+            self._stop_event.wait(self.refresher_config.interval_seconds)
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='model-refresher', daemon=True)
+            self._thread.start()
+            logging.info(f'Model refresher started, polling every {self.refresher_config.interval_seconds}s')
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
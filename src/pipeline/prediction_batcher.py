@@ -0,0 +1,160 @@
+import asyncio
+import os
+import time
+import numpy as np
+import pandas as pd
+from typing import Callable, List, Optional, Set, Tuple, Union
+from pandas import DataFrame
+from src.logger import logging
+from src.entity.config_entity import PredictionBatcherConfig
+from src.monitoring.metrics import registry
+from src.utils.executor import BoundedExecutor
+from src.pipeline.prediction_pipeline import VehicleDataClassifier
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+BATCH_WAIT_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+Rows = Union[np.ndarray, DataFrame]
+
+def _default_predict(features: np.ndarray) -> np.ndarray:
+    return VehicleDataClassifier().predict_array(features)
+
+def _concat_rows(parts: List[Rows]) -> Rows:
+    if len(parts) == 1:
+        return parts[0]
+    if isinstance(parts[0], DataFrame):
+        return pd.concat(parts, ignore_index=True)
+    return np.concatenate(parts)
+
+class PredictionBatcher:
+    '''
+    coalesces prediction requests from concurrent callers into one batched predict call
+
+    rows are collected until either max_batch_size rows are queued or the oldest row
+    has waited max_wait_ms, then a single predict runs & every caller gets its own slice.
+    up to one batch per executor worker is predicted at once; while all of them are busy
+    rows keep queuing, so the next batch comes out larger instead of waiting behind the others
+
+    rows are 2d feature arrays in PREDICTION_INPUT_COLUMNS order by default (predict_fn decides,
+    DataFrames work too). predictions run on the given executor (the loop's default one if None),
+    never on the event loop
+    '''
+    def __init__(self, batcher_config: PredictionBatcherConfig = PredictionBatcherConfig(),
+                 predict_fn: Callable[[Rows], np.ndarray] = _default_predict,
+                 executor: Optional[BoundedExecutor] = None):
+        self.batcher_config = batcher_config
+        self.predict_fn = predict_fn
+        self.executor = executor
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # batches being predicted, referenced until done so they aren't garbage collected
+        self._batches: Set[asyncio.Task] = set()
+
+        self.batch_size_histogram = registry.histogram('prediction_batch_size',
+                                                       'Rows per batched predict call', BATCH_SIZE_BUCKETS)
+        self.batch_wait_histogram = registry.histogram('prediction_batch_wait_seconds',
+                                                       'Time a request waited in the batching window', BATCH_WAIT_BUCKETS)
+        self.batches_counter = registry.counter('prediction_batches_total', 'Batched predict calls made')
+
+    @property
+    def max_in_flight(self) -> int:
+        '''batches predicted at once: the executor's workers (the default pool's size without one)'''
+        if self.executor is not None:
+            return self.executor.max_workers
+        return min(32, (os.cpu_count() or 1) + 4)
+
+    def _ensure_worker(self) -> None:
+        '''starts the collector task on the running event loop (once)'''
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def predict(self, rows: Rows) -> np.ndarray:
+        '''
+        Output: predictions for rows, computed as part of a shared batch
+        '''
+        if not self.batcher_config.enabled:
+            return await self._execute(rows)
+
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((rows, future, time.perf_counter()))
+        return await future
+
+    async def _execute(self, rows: Rows) -> np.ndarray:
+        if self.executor is None:
+            return await asyncio.get_running_loop().run_in_executor(None, self.predict_fn, rows)
+        return await self.executor.run(self.predict_fn, rows)
+
+    async def _collect_batch(self) -> List[Tuple[Rows, asyncio.Future, float]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        num_rows = len(batch[0][0])
+        deadline = loop.time() + self.batcher_config.max_wait_ms / 1000
+
+        while num_rows < self.batcher_config.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            num_rows += len(item[0])
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        while True:
+            # a batch is only collected once a worker can take it
+            await in_flight.acquire()
+            batch = await self._collect_batch()
+            # callers that went away (e.g. client disconnect) don't need a prediction
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                in_flight.release()
+                continue
+
+            task = loop.create_task(self._predict_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+            task.add_done_callback(lambda _: in_flight.release())
+
+    async def _predict_batch(self, batch: List[Tuple[Rows, asyncio.Future, float]]) -> None:
+        '''one predict for the batch, every caller's future gets its slice (or the error)'''
+        dispatched_at = time.perf_counter()
+        for _, _, enqueued_at in batch:
+            self.batch_wait_histogram.observe(dispatched_at - enqueued_at)
+
+        batch_rows = _concat_rows([item[0] for item in batch])
+        self.batch_size_histogram.observe(len(batch_rows))
+        self.batches_counter.inc()
+
+        try:
+            predictions = await self._execute(batch_rows)
+        except Exception as e:
+            logging.error(f'Batched prediction of {len(batch_rows)} rows failed: {e}')
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for rows, future, _ in batch:
+            if not future.done():
+                future.set_result(predictions[offset:offset + len(rows)])
+            offset += len(rows)
+
+    async def close(self) -> None:
+        '''stops the collector task, batches already dispatched still finish'''
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
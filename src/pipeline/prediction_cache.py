@@ -0,0 +1,91 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional
+import numpy as np
+from src.monitoring.metrics import registry
+
+class PredictionCache:
+    '''
+    bounded LRU cache of predictions with a TTL, keyed on the coerced feature values
+
+    a key is the blake2b hash of the row as float64 in PREDICTION_INPUT_COLUMNS order, so
+    '1', 1 & 1.0 (form strings vs json numbers) share an entry. entries belong to one model
+    version: a lookup for another version empties the cache first
+    '''
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.model_version: Optional[str] = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits_counter = registry.counter('prediction_cache_hits_total', 'Rows answered from the prediction cache')
+        self.misses_counter = registry.counter('prediction_cache_misses_total', 'Rows not found in the prediction cache')
+        self.evictions_counter = registry.counter('prediction_cache_evictions_total', 'Cache entries dropped for size or age')
+        self.size_gauge = registry.gauge('prediction_cache_size', 'Entries in the prediction cache')
+
+    @staticmethod
+    def make_keys(features: np.ndarray) -> List[bytes]:
+        '''Output: one key per row of the 2d feature array'''
+        rows = np.array(features, dtype=np.float64, ndmin=2)
+        # -0.0 -> 0.0 & one NaN bit pattern, so equal values always hash alike
+        rows += 0.0
+        rows[np.isnan(rows)] = np.nan
+        return [hashlib.blake2b(row.tobytes(), digest_size=16).digest() for row in rows]
+
+    def _reset(self, model_version: Optional[str]) -> None:
+        self._entries.clear()
+        self.model_version = model_version
+        self.size_gauge.set(0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset(self.model_version)
+
+    def lookup(self, keys: List[bytes], model_version: Optional[str]) -> List[Any]:
+        '''
+        Output: cached prediction per key, None where it is missing or expired
+        '''
+        now = time.monotonic()
+        values, evicted = [], 0
+        with self._lock:
+            if model_version != self.model_version:
+                self._reset(model_version)
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and now - entry[0] > self.ttl_seconds:
+                    del self._entries[key]
+                    evicted += 1
+                    entry = None
+                if entry is None:
+                    values.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    values.append(entry[1])
+            self.size_gauge.set(len(self._entries))
+
+        hits = sum(value is not None for value in values)
+        self.hits_counter.inc(hits)
+        self.misses_counter.inc(len(values) - hits)
+        if evicted:
+            self.evictions_counter.inc(evicted)
+        return values
+
+    def store(self, keys: List[bytes], values, model_version: Optional[str]) -> None:
+        '''stores predictions, ignored when the serving model changed since the lookup'''
+        now = time.monotonic()
+        evicted = 0
+        with self._lock:
+            if model_version != self.model_version:
+                return
+            for key, value in zip(keys, values):
+                self._entries[key] = (now, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                evicted += 1
+            self.size_gauge.set(len(self._entries))
+        if evicted:
+            self.evictions_counter.inc(evicted)
@@ -1,9 +1,20 @@
 import sys
+import numpy as np
+from typing import Optional, Tuple
 from pandas import DataFrame
 from src.logger import logging
 from src.exception import MyException
 from src.entity.s3_estimator import Proj1Estimator
 from src.entity.config_entity import VehiclePredictorConfig
+from src.pipeline.prediction_cache import PredictionCache
+from src.monitoring.drift import DriftMonitor
+from src.monitoring.metrics import registry
+from src.monitoring.metrics import stage_histogram
+from src.constants import PREDICTION_INPUT_COLUMNS, PREDICTION_MAX_BATCH_ROWS
+
+logger = logging.getLogger(__name__)
+
+INPUT_BUILD_SECONDS = stage_histogram('input_build')
 
 class VehicleData:
     def __init__(self, Gender, Age, Driving_License, Region_Code, Previously_Insured,
@@ -27,14 +38,29 @@ class VehicleData:
         
     def get_vehicle_input_dataframe(self) -> DataFrame:
         try:
-            vehicle_input_dict= self.get_vehicle_data_as_dict()
-            return DataFrame(vehicle_input_dict)
+            with INPUT_BUILD_SECONDS.time():
+                vehicle_input_dict= self.get_vehicle_data_as_dict()
+                return DataFrame(vehicle_input_dict)
         
         except Exception as e:
             raise MyException(e, sys) from e
         
+    def get_vehicle_input_array(self) -> np.ndarray:
+        '''
+        Output: (1, 11) float array in PREDICTION_INPUT_COLUMNS order, for the pandas free predict path
+        '''
+        try:
+            with INPUT_BUILD_SECONDS.time():
+                return np.array([[self.Gender, self.Age, self.Driving_License, self.Region_Code, self.Previously_Insured,
+                                  self.Annual_Premium, self.Policy_Sales_Channel, self.Vintage,
+                                  self.Vehicle_Age_lt_1_Year, self.Vehicle_Age_gt_2_Years, self.Vehicle_Damage_Yes]],
+                                dtype=np.float64)
+
+        except Exception as e:
+            raise MyException(e, sys) from e
+
     def get_vehicle_data_as_dict(self):
-        logging.info('Entered get_vehicle_data_as_dict method of VehicleData class')
+        logger.info('Entered get_vehicle_data_as_dict method of VehicleData class')
         try:
             input_data = {
                 'Gender': [self.Gender],
@@ -49,39 +75,211 @@ class VehicleData:
                 'Vehicle_Age_gt_2_Years': [self.Vehicle_Age_gt_2_Years],
                 'Vehicle_Damage_Yes': [self.Vehicle_Damage_Yes]
             }
-            logging.info('Created vehicle data dict')
-            logging.info('Exited get_vehicle_data_as_dict method of VehicleData class')
+            logger.info('Created vehicle data dict')
+            logger.info('Exited get_vehicle_data_as_dict method of VehicleData class')
             return input_data
         except Exception as e:
             raise MyException(e, sys) from e
         
+class VehicleBatchData:
+    '''
+    holds many vehicle records & builds a single input frame so the whole batch
+    goes through one transform + predict call
+
+    records : list of dicts keyed by column name        -> [{'Gender': 1, 'Age': 44, ...}, ...]
+    columns : dict of equal length lists per column     -> {'Gender': [1, 0], 'Age': [44, 23], ...}
+    '''
+    def __init__(self, records: list = None, columns: dict = None, max_rows: int = PREDICTION_MAX_BATCH_ROWS):
+        try:
+            if (records is None) == (columns is None):
+                raise Exception('Provide exactly one of "records" or "columns"')
+            self.records = records
+            self.columns = columns
+            self.max_rows = max_rows
+
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def get_vehicle_data_as_dict(self) -> dict:
+        '''
+        Output: columnar dict with one list per model input column
+        '''
+        logger.info('Entered get_vehicle_data_as_dict method of VehicleBatchData class')
+        try:
+            if self.records is not None:
+                missing_columns = {column for record in self.records for column in PREDICTION_INPUT_COLUMNS if column not in record}
+                if missing_columns:
+                    raise Exception(f'Records are missing columns: {sorted(missing_columns)}')
+                input_data = {column: [record[column] for record in self.records] for column in PREDICTION_INPUT_COLUMNS}
+            else:
+                missing_columns = [column for column in PREDICTION_INPUT_COLUMNS if column not in self.columns]
+                if missing_columns:
+                    raise Exception(f'Columns are missing: {missing_columns}')
+                input_data = {column: list(self.columns[column]) for column in PREDICTION_INPUT_COLUMNS}
+                if len({len(values) for values in input_data.values()}) > 1:
+                    raise Exception('All columns must have the same number of values')
+
+            num_rows = len(input_data[PREDICTION_INPUT_COLUMNS[0]])
+            if num_rows == 0:
+                raise Exception('Batch is empty')
+            if num_rows > self.max_rows:
+                raise Exception(f'Batch has {num_rows} rows, maximum allowed is {self.max_rows}')
+
+            logger.info('Created vehicle batch dict with %d rows', num_rows)
+            logger.info('Exited get_vehicle_data_as_dict method of VehicleBatchData class')
+            return input_data
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def get_vehicle_input_dataframe(self) -> DataFrame:
+        try:
+            with INPUT_BUILD_SECONDS.time():
+                return DataFrame(self.get_vehicle_data_as_dict(), columns=PREDICTION_INPUT_COLUMNS)
+
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def get_vehicle_input_array(self) -> np.ndarray:
+        '''
+        Output: (rows, 11) float array in PREDICTION_INPUT_COLUMNS order, for the pandas free predict path
+        '''
+        try:
+            with INPUT_BUILD_SECONDS.time():
+                input_data = self.get_vehicle_data_as_dict()
+                return np.column_stack([np.asarray(input_data[column], dtype=np.float64) for column in PREDICTION_INPUT_COLUMNS])
+
+        except Exception as e:
+            raise MyException(e, sys) from e
+
 class VehicleDataClassifier:
     _cached_model = None
+    _prediction_cache: PredictionCache = None
+    # served inputs against the serving model's drift reference (DRIFT_MONITOR_SERVING)
+    _drift_monitor: DriftMonitor = None
+    # config of classifiers built without one (the app's); e.g. the load test turns the cache off here
+    default_config: VehiclePredictorConfig = VehiclePredictorConfig()
+    # version in the model_info gauge, None until a model with a known version served
+    _published_version: str = None
     
-    def __init__(self, prediction_pipeline_config: VehiclePredictorConfig = VehiclePredictorConfig()) -> None:
+    def __init__(self, prediction_pipeline_config: VehiclePredictorConfig = None) -> None:
         try:
+            prediction_pipeline_config = prediction_pipeline_config or VehicleDataClassifier.default_config
             self.prediction_pipeline_config = prediction_pipeline_config
 
+            if prediction_pipeline_config.cache_enabled and VehicleDataClassifier._prediction_cache is None:
+                VehicleDataClassifier._prediction_cache = PredictionCache(prediction_pipeline_config.cache_max_size,
+                                                                          prediction_pipeline_config.cache_ttl_seconds)
+
             if VehicleDataClassifier._cached_model is None:
-                logging.info("Loading model for the first time...")
-                VehicleDataClassifier._cached_model = Proj1Estimator(
-                    bucket_name=self.prediction_pipeline_config.model_bucket_name,
-                    model_path=self.prediction_pipeline_config.model_file_path
-                )
-                logging.info("Model loaded and cached successfully.")
+                logger.info("Loading model for the first time...")
+                VehicleDataClassifier._cached_model = VehicleDataClassifier.build_estimator(self.prediction_pipeline_config)
+                logger.info("Model loaded and cached successfully.")
             else:
-                logging.info("Using cached model for prediction.")
+                logger.info("Using cached model for prediction.")
 
         except Exception as e:
             raise MyException(e, sys) from e
+
+    @staticmethod
+    def build_estimator(prediction_pipeline_config: VehiclePredictorConfig) -> Proj1Estimator:
+        return Proj1Estimator(
+            bucket_name=prediction_pipeline_config.model_bucket_name,
+            model_path=prediction_pipeline_config.model_file_path,
+            use_compiled_model=prediction_pipeline_config.use_compiled_model,
+            compiled_max_rows=prediction_pipeline_config.compiled_model_max_rows,
+            shared_model_dir=prediction_pipeline_config.shared_model_dir,
+            storage_backend=prediction_pipeline_config.storage_backend
+        )
+
+    @staticmethod
+    def swap_model(estimator: Proj1Estimator) -> None:
+        '''
+        atomically replaces the serving model; requests already holding the old
+        estimator finish on it, new requests pick up the new one
+        '''
+        VehicleDataClassifier._cached_model = estimator
+        if VehicleDataClassifier._prediction_cache is not None:
+            VehicleDataClassifier._prediction_cache.clear()
+        VehicleDataClassifier._drift_monitor = (None if estimator.drift_reference is None
+                                                else DriftMonitor(estimator.drift_reference, estimator.model_version))
+        VehicleDataClassifier._publish_model_info(estimator.model_version)
+        logger.info('Serving model swapped to version %s', estimator.model_version, extra={'sample': False})
+
+    @staticmethod
+    def _publish_model_info(model_version: Optional[str]) -> None:
+        '''the model_info gauge /metrics renders, set here so scrapes only read'''
+        if model_version is not None:
+            registry.set_info('model_info', 'Version of the serving model', labels={'version': model_version})
+            VehicleDataClassifier._published_version = model_version
+
+    @staticmethod
+    def get_model_version() -> Optional[str]:
+        model = VehicleDataClassifier._cached_model
+        return None if model is None else model.model_version
+
+    @staticmethod
+    def get_drift_report() -> Optional[dict]:
+        '''drift of the inputs served by the current model, None when they aren't monitored'''
+        monitor = VehicleDataClassifier._drift_monitor
+        return None if monitor is None else monitor.report()
+
+    @staticmethod
+    def is_model_ready() -> bool:
+        '''True once a loaded model is serving (readiness), without triggering a load'''
+        model = VehicleDataClassifier._cached_model
+        return model is not None and model.is_loaded
         
     def predict(self, df: DataFrame) -> str:
         try:
-            logging.info('Entered predict method of VehicleDataClassifier class')
+            logger.info('Entered predict method of VehicleDataClassifier class')
             model = VehicleDataClassifier._cached_model
             result = model.predict(df)
-            logging.info('Prediction completed successfully')
+            logger.info('Prediction completed successfully')
             
             return result
         except Exception as e:
-            raise MyException(e, sys) from e
\ No newline at end of file
+            raise MyException(e, sys) from e
+
+    def predict_array(self, features: np.ndarray) -> np.ndarray:
+        '''features: 2d array in PREDICTION_INPUT_COLUMNS order (see VehicleData.get_vehicle_input_array)'''
+        return self.predict_array_with_version(features)[0]
+
+    def predict_array_with_version(self, features: np.ndarray) -> Tuple[np.ndarray, Optional[str]]:
+        '''
+        Output: (predictions, version of the model that made them)
+        '''
+        model = VehicleDataClassifier._cached_model
+        try:
+            cache = VehicleDataClassifier._prediction_cache
+            monitor = VehicleDataClassifier._drift_monitor
+            if monitor is not None:
+                monitor.observe(features)
+            if cache is None or not self.prediction_pipeline_config.cache_enabled:
+                predictions = model.predict_array(features)
+                return predictions, model.model_version
+
+            keys = cache.make_keys(features)
+            model_version = model.model_version
+            cached = cache.lookup(keys, model_version)
+            missing = [i for i, value in enumerate(cached) if value is None]
+            if not missing:
+                return np.asarray(cached), model_version
+
+            missing_predictions = model.predict_array(np.asarray(features)[missing])
+            # a lazily loaded model only knows its version after this first predict
+            if model.model_version == model_version:
+                cache.store([keys[i] for i in missing], missing_predictions, model_version)
+            if len(missing) == len(cached):
+                return missing_predictions, model.model_version
+
+            predictions = np.empty(len(cached), dtype=np.asarray(missing_predictions).dtype)
+            predictions[missing] = missing_predictions
+            hits = [i for i, value in enumerate(cached) if value is not None]
+            predictions[hits] = [cached[i] for i in hits]
+            return predictions, model.model_version
+        except Exception as e:
+            raise MyException(e, sys) from e
+        finally:
+            # a model loaded lazily by this predict (not swapped in) publishes its version here, once
+            if VehicleDataClassifier._published_version is None and model is not None and model.is_loaded:
+                VehicleDataClassifier._publish_model_info(model.model_version)
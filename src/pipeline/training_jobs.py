@@ -0,0 +1,178 @@
+import asyncio
+import multiprocessing
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from src.logger import logging
+from src.constants import TRAINING_JOB_STAGES, TRAINING_JOB_HISTORY_SIZE
+from src.pipeline.training_pipeline import run_training_pipeline
+from src.utils.executor import BoundedExecutor
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLING, CANCELLED = (
+    'queued', 'running', 'succeeded', 'failed', 'cancelling', 'cancelled'
+)
+ACTIVE_STATUSES = (QUEUED, RUNNING, CANCELLING)
+
+class TrainingCancelled(Exception):
+    '''raised inside the worker at a stage boundary once cancellation was requested'''
+
+class TrainingProgress:
+    '''
+    stage listener handed to TrainPipeline inside the worker process
+
+    writes job progress into a manager backed dict the server process reads from &
+    checks the shared cancel event before every stage starts
+    '''
+    def __init__(self, status, cancel_event):
+        self.status = status
+        self.cancel_event = cancel_event
+
+    def _update_stage(self, stage: str, **fields) -> None:
+        # nested values of a DictProxy are copies, so the whole dict is written back
+        stages = self.status['stages']
+        stages[stage] = {**stages.get(stage, {}), **fields}
+        self.status['stages'] = stages
+
+    def stage_started(self, stage: str) -> None:
+        if self.cancel_event.is_set():
+            self.status['status'] = CANCELLED
+            raise TrainingCancelled(f'Training cancelled before stage {stage}')
+        now = time.time()
+        if self.status['started_at'] is None:
+            self.status['started_at'] = now
+            self.status['status'] = RUNNING
+        self.status['current_stage'] = stage
+        self._update_stage(stage, status=RUNNING, started_at=now)
+        logging.info(f'Training job {self.status["job_id"]}: stage {stage} started')
+
+    def stage_finished(self, stage: str) -> None:
+        now = time.time()
+        started_at = self.status['stages'][stage]['started_at']
+        self._update_stage(stage, status=SUCCEEDED, finished_at=now, elapsed_seconds=now - started_at)
+        logging.info(f'Training job {self.status["job_id"]}: stage {stage} finished in {now - started_at:.2f}s')
+
+class TrainingJob:
+    def __init__(self, job_id: str, status, cancel_event):
+        self.job_id = job_id
+        self.status = status
+        self.cancel_event = cancel_event
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def is_active(self) -> bool:
+        return self.status['status'] in ACTIVE_STATUSES
+
+    def to_dict(self) -> dict:
+        '''
+        Output: snapshot of the job with per stage status & elapsed time (live for the running stage)
+        '''
+        job = dict(self.status)
+        now = time.time()
+        stages = {}
+        for stage in TRAINING_JOB_STAGES:
+            stage_status = dict(job['stages'].get(stage, {'status': 'pending' if job['finished_at'] is None else 'skipped'}))
+            if stage_status['status'] == RUNNING:
+                stage_status['elapsed_seconds'] = now - stage_status['started_at']
+            stages[stage] = stage_status
+        job['stages'] = stages
+        end = job['finished_at'] or now
+        job['elapsed_seconds'] = None if job['started_at'] is None else end - job['started_at']
+        return job
+
+class TrainingJobManager:
+    '''
+    runs TrainPipeline as background jobs on the training executor
+
+    starting returns a job id at once, a run already in progress is reused instead of
+    starting an overlapping pipeline, & cancellation is cooperative: the worker stops
+    at the next stage boundary
+    '''
+    def __init__(self, executor: BoundedExecutor, history_size: int = TRAINING_JOB_HISTORY_SIZE):
+        self.executor = executor
+        self.history_size = history_size
+        self._jobs: Dict[str, TrainingJob] = OrderedDict()
+        self._manager = None
+
+    @property
+    def manager(self):
+        if self._manager is None:
+            self._manager = multiprocessing.get_context('spawn').Manager()
+        return self._manager
+
+    def active_job(self) -> Optional[TrainingJob]:
+        for job in reversed(self._jobs.values()):
+            if job.is_active:
+                return job
+        return None
+
+    def start_job(self) -> Tuple[TrainingJob, bool]:
+        '''
+        Output: (job, created) -> created is False when an active job was reused
+        '''
+        job = self.active_job()
+        if job is not None:
+            logging.info(f'Training job {job.job_id} already in progress, not starting another one')
+            return job, False
+
+        job_id = uuid.uuid4().hex
+        status = self.manager.dict({
+            'job_id': job_id, 'status': QUEUED, 'submitted_at': time.time(), 'started_at': None,
+            'finished_at': None, 'current_stage': None, 'stages': {}, 'error': None
+        })
+        job = TrainingJob(job_id, status, self.manager.Event())
+        job.task = asyncio.get_running_loop().create_task(self._run_job(job))
+        self._jobs[job_id] = job
+
+        while len(self._jobs) > self.history_size:
+            oldest_id = next(iter(self._jobs))
+            if self._jobs[oldest_id].is_active:
+                break
+            del self._jobs[oldest_id]
+
+        logging.info(f'Training job {job_id} submitted')
+        return job, True
+
+    async def _run_job(self, job: TrainingJob) -> None:
+        try:
+            await self.executor.run(run_training_pipeline, TrainingProgress(job.status, job.cancel_event))
+            job.status['status'] = SUCCEEDED
+        except Exception as e:
+            if job.cancel_event.is_set():
+                job.status['status'] = CANCELLED
+            else:
+                job.status['status'] = FAILED
+                job.status['error'] = str(e)
+            stage = job.status['current_stage']
+            if stage is not None and job.status['stages'].get(stage, {}).get('status') == RUNNING:
+                stages = job.status['stages']
+                stages[stage] = {**stages[stage], 'status': job.status['status'],
+                                 'finished_at': time.time(), 'elapsed_seconds': time.time() - stages[stage]['started_at']}
+                job.status['stages'] = stages
+            logging.info(f'Training job {job.job_id} ended with status {job.status["status"]}')
+        finally:
+            job.status['current_stage'] = None
+            job.status['finished_at'] = time.time()
+
+    def get_job(self, job_id: str) -> Optional[TrainingJob]:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> list:
+        return [job.to_dict() for job in reversed(self._jobs.values())]
+
+    def cancel_job(self, job_id: str) -> Optional[TrainingJob]:
+        '''requests cancellation; the worker acknowledges at its next stage boundary'''
+        job = self._jobs.get(job_id)
+        if job is not None and job.is_active:
+            job.cancel_event.set()
+            job.status['status'] = CANCELLING
+            logging.info(f'Cancellation requested for training job {job_id}')
+        return job
+
+    def shutdown(self) -> None:
+        for job in self._jobs.values():
+            if job.is_active:
+                job.cancel_event.set()
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
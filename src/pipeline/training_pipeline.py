@@ -7,6 +7,7 @@ from src.components.data_transformation import DataTransformation
 from src.components.model_trainer import ModelTrainer
 from src.components.model_evaluation import ModelEvaluation
 from src.components.model_pusher import ModelPusher
+from src.entity.artifact_store import ArtifactStore
 
 from src.entity.config_entity import (DataIngestionConfig,
                                       DataValidationConfig,
@@ -22,20 +23,28 @@ from src.entity.artifact_entity import(DataIngestionArtifact,
                                        ModelPusherArtifact)
 
 class TrainPipeline:
-    def __init__(self):
+    def __init__(self, stage_listener=None):
+        '''
+        stage_listener: optional object with stage_started(stage) / stage_finished(stage) hooks,
+                        called around every stage (see src.pipeline.training_jobs.TrainingProgress)
+        '''
+        self.stage_listener = stage_listener
         self.data_ingestion_config = DataIngestionConfig()
         self.data_validation_config = DataValidationConfig()
         self.data_transformation_config = DataTransformationConfig()
         self.model_trainer_config = ModelTrainerConfig()
         self.model_evaluation_config = ModelEvaluationConfig()
         self.model_pusher_config = ModelPusherConfig()
+        # stage outputs handed to the next stages without re-reading their files
+        self.artifact_store = ArtifactStore()
 
     def start_data_ingestion(self):
 
         try:
             logging.info('Entered the start_data_ingestion method of TrainPipeline class')
             logging.info('Getting data from MongoDB')
-            data_ingestion = DataIngestion(data_ingestion_config=self.data_ingestion_config)
+            data_ingestion = DataIngestion(data_ingestion_config=self.data_ingestion_config,
+                                           artifact_store=self.artifact_store)
             data_ingestion_artifact = data_ingestion.initiate_data_ingestion()
             logging.info('Got the train/test set from MongoDB')
             logging.info('Exited the start_data_ingestion method of TrainPipeline class')
@@ -49,7 +58,8 @@ class TrainPipeline:
 
         try:
             data_validation = DataValidation(data_ingestion_artifact=data_ingestion_artifact,
-                                             data_validation_config=self.data_validation_config)
+                                             data_validation_config=self.data_validation_config,
+                                             artifact_store=self.artifact_store)
             data_validation_artifact = data_validation.initiate_data_validation()
             logging.info('Performed data validation')
             logging.info('Exited the start_data_validation method of TrainPipeline class')
@@ -60,7 +70,8 @@ class TrainPipeline:
     def start_data_transformation(self, data_ingestion_artifact: DataIngestionArtifact, data_validation_artifact: DataValidationArtifact) -> DataTransformationArtifact:
 
         try:
-            data_transformation = DataTransformation(data_ingestion_artifact, data_validation_artifact, self.data_transformation_config)
+            data_transformation = DataTransformation(data_ingestion_artifact, data_validation_artifact, self.data_transformation_config,
+                                                     self.artifact_store)
             data_transformation_artifact = data_transformation.initiate_data_transformation()
             return data_transformation_artifact
         except Exception as e:
@@ -69,7 +80,7 @@ class TrainPipeline:
     def start_model_trainer(self, data_transformation_artifact: DataTransformationArtifact) -> ModelTrainerArtifact:
 
         try:
-            model_trainer = ModelTrainer(data_transformation_artifact, self.model_trainer_config)
+            model_trainer = ModelTrainer(data_transformation_artifact, self.model_trainer_config, self.artifact_store)
             model_trainer_artifact = model_trainer.initiate_model_trainer()
             return model_trainer_artifact
         except Exception as e:
@@ -78,7 +89,8 @@ class TrainPipeline:
     def start_model_evaluation(self, data_ingestion_artifact: DataIngestionArtifact, model_trainer_artifact: ModelTrainerArtifact) -> ModelEvaluationArtifact:
 
         try:
-            model_evaluation = ModelEvaluation(self.model_evaluation_config, data_ingestion_artifact, model_trainer_artifact)
+            model_evaluation = ModelEvaluation(self.model_evaluation_config, data_ingestion_artifact, model_trainer_artifact,
+                                               self.artifact_store)
             model_evaluation_artifact = model_evaluation.initiate_model_evaluation()
             return model_evaluation_artifact
         except Exception as e:
@@ -93,19 +105,45 @@ class TrainPipeline:
         except Exception as e:
             raise MyException(e, sys) from e
 
+    def _run_stage(self, stage: str, stage_fn, *args):
+        '''runs one stage, notifying the stage listener before & after'''
+        if self.stage_listener is not None:
+            self.stage_listener.stage_started(stage)
+        artifact = stage_fn(*args)
+        if self.stage_listener is not None:
+            self.stage_listener.stage_finished(stage)
+        return artifact
+
     def run_pipeline(self) -> None:
 
         try:
-            data_ingestion_artifact = self.start_data_ingestion()
-            data_validation_artifact = self.start_data_validation(data_ingestion_artifact=data_ingestion_artifact)
-            data_transformation_artifact = self.start_data_transformation(data_ingestion_artifact, data_validation_artifact)
-            model_trainer_artifact = self.start_model_trainer(data_transformation_artifact)
-            model_evaluation_artifact = self.start_model_evaluation(data_ingestion_artifact, model_trainer_artifact)
+            data_ingestion_artifact = self._run_stage('data_ingestion', self.start_data_ingestion)
+            if self.data_ingestion_config.skip_retrain_without_drift and data_ingestion_artifact.retrain_recommended is False:
+                logging.info(f'New data has not drifted from the production model\'s training data, not retraining')
+                return None
+            data_validation_artifact = self._run_stage('data_validation', self.start_data_validation, data_ingestion_artifact)
+            data_transformation_artifact = self._run_stage('data_transformation', self.start_data_transformation,
+                                                           data_ingestion_artifact, data_validation_artifact)
+            model_trainer_artifact = self._run_stage('model_trainer', self.start_model_trainer, data_transformation_artifact)
+            model_evaluation_artifact = self._run_stage('model_evaluation', self.start_model_evaluation,
+                                                        data_ingestion_artifact, model_trainer_artifact)
 
             if not model_evaluation_artifact.is_model_accepted:
                 logging.info(f'Model not accepted')
                 return None
-            model_pusher_artifact = self.start_model_pusher(model_evaluation_artifact)
+            model_pusher_artifact = self._run_stage('model_pusher', self.start_model_pusher, model_evaluation_artifact)
 
         except Exception as e:
-            raise MyException(e, sys)
\ No newline at end of file
+            raise MyException(e, sys)
+        finally:
+            logging.info(f'Artifact store: {self.artifact_store.hits} in memory handoffs, '
+                         f'{self.artifact_store.misses} reads from disk')
+            self.artifact_store.clear()
+
+def run_training_pipeline(stage_listener=None) -> None:
+    '''entry point for running the whole pipeline inside a worker process'''
+    try:
+        TrainPipeline(stage_listener=stage_listener).run_pipeline()
+    except Exception as e:
+        # MyException can't be rebuilt by pickle, so only its message crosses the process boundary
+        raise Exception(str(e)) from None
@@ -0,0 +1,120 @@
+import asyncio
+import multiprocessing
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional, Set, Tuple
+from src.logger import logging
+from src.monitoring.metrics import registry
+
+EXECUTOR_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+# ProcessPoolExecutor(max_tasks_per_child=...) is python 3.11+
+MAX_TASKS_PER_CHILD_SUPPORTED = sys.version_info >= (3, 11)
+
+class ExecutorSaturatedError(Exception):
+    '''raised when an executor's bounded queue is full'''
+
+def _timed_call(fn: Callable, args: tuple) -> Tuple[float, Any, Optional[Exception]]:
+    '''runs inside the worker; reports when the call actually started so the caller can compute queue wait'''
+    started_at = time.time()
+    try:
+        return started_at, fn(*args), None
+    except Exception as e:
+        return started_at, None, e
+
+class BoundedExecutor:
+    '''
+    runs blocking callables off the event loop on a thread or process pool
+
+    at most max_workers calls run & max_queue_size more wait; beyond that new calls are
+    rejected right away instead of piling up. queue depth, in-flight calls, wait time &
+    rejections are published to the metrics registry as executor_<name>_*
+    '''
+    def __init__(self, name: str, kind: str = 'thread', max_workers: int = 4, max_queue_size: int = 64):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f'Unknown executor kind: {kind}')
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self._pool: Executor = None
+        self._in_flight = 0
+        # python < 3.11 process executors: one single use pool per call, at most max_workers at once
+        self._process_slots: Optional[asyncio.Semaphore] = None
+        self._single_use_pools: Set[ProcessPoolExecutor] = set()
+
+        self.queue_depth_gauge = registry.gauge(f'executor_{name}_queue_depth', f'Calls waiting for a {name} worker')
+        self.in_flight_gauge = registry.gauge(f'executor_{name}_in_flight', f'Calls queued or running on the {name} executor')
+        self.wait_histogram = registry.histogram(f'executor_{name}_wait_seconds',
+                                                 f'Time a call waited for a {name} worker', EXECUTOR_WAIT_BUCKETS)
+        self.rejected_counter = registry.counter(f'executor_{name}_rejected_total', f'Calls rejected by a full {name} queue')
+
+    @property
+    def pool(self) -> Executor:
+        if self._pool is None:
+            if self.kind == 'thread':
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+            else:
+                # fresh spawned process per task: no inherited event loop/threads & memory is returned after each run
+                # (before python 3.11 run() gets the same from a single use pool per call)
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'),
+                                                 max_tasks_per_child=1)
+        return self._pool
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self._in_flight - self.max_workers)
+
+    def _update_gauges(self) -> None:
+        self.in_flight_gauge.set(self._in_flight)
+        self.queue_depth_gauge.set(self.queue_depth)
+
+    async def run(self, fn: Callable, *args) -> Any:
+        '''
+        Output: return value of fn(*args), computed on the pool
+        (fn & args must be picklable for a process executor)
+        '''
+        if self._in_flight >= self.max_workers + self.max_queue_size:
+            self.rejected_counter.inc()
+            raise ExecutorSaturatedError(f'{self.name} executor is saturated ({self._in_flight} calls in flight)')
+
+        self._in_flight += 1
+        self._update_gauges()
+        submitted_at = time.time()
+        try:
+            if self.kind == 'process' and not MAX_TASKS_PER_CHILD_SUPPORTED:
+                started_at, result, error = await self._run_in_fresh_process(fn, args)
+            else:
+                started_at, result, error = await asyncio.get_running_loop().run_in_executor(
+                    self.pool, _timed_call, fn, args
+                )
+            self.wait_histogram.observe(max(0.0, started_at - submitted_at))
+            if error is not None:
+                raise error
+            return result
+        finally:
+            self._in_flight -= 1
+            self._update_gauges()
+
+    async def _run_in_fresh_process(self, fn: Callable, args: tuple) -> Tuple[float, Any, Optional[Exception]]:
+        '''runs _timed_call in a one process pool that is shut down right after, so no worker is reused'''
+        if self._process_slots is None:
+            self._process_slots = asyncio.Semaphore(self.max_workers)
+        async with self._process_slots:
+            pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+            self._single_use_pools.add(pool)
+            try:
+                return await asyncio.get_running_loop().run_in_executor(pool, _timed_call, fn, args)
+            finally:
+                self._single_use_pools.discard(pool)
+                pool.shutdown(wait=False)
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._pool is not None or self._single_use_pools:
+            logging.info(f'Shutting down {self.name} executor')
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+        for pool in list(self._single_use_pools):
+            pool.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,20 @@
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # no advisory locks (windows): the lock is a no op, callers must tolerate concurrent holders
+    fcntl = None
+
+@contextmanager
+def file_lock(path: str):
+    '''exclusive advisory lock on path (created when missing), held for the with block, across processes'''
+    with open(path, 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -3,9 +3,12 @@ import sys
 import numpy as np
 import dill
 import yaml
+from typing import Iterator
+import pandas as pd
 from pandas import DataFrame
 from src.exception import MyException
 from src.logger import logging
+from src.constants import DATA_FILE_COMPRESSION
 
 def read_yaml_file(file_path: str) -> dict:
     try:
@@ -52,10 +55,83 @@ def save_np_array_data(file_path: str, array: np.array):
     except Exception as e:
         raise MyException(e, sys) from e
     
-def load_np_array_data(file_path: str) -> np.array:
+def load_np_array_data(file_path: str, mmap_mode: str = None) -> np.array:
+    '''mmap_mode='r' maps the file read-only instead of reading it, processes mapping it share one copy'''
     try:
-        dir_path = os.path.dirname(file_path)
+        if mmap_mode is not None:
+            return np.load(file_path, mmap_mode=mmap_mode)
         with open(file_path, 'rb') as file_obj:
             return np.load(file_obj)
     except Exception as e:
-        raise MyException(e, sys) from e
\ No newline at end of file
+        raise MyException(e, sys) from e
+
+def _data_file_format(file_path: str) -> str:
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in ('.parquet', '.pq'):
+        return 'parquet'
+    if extension in ('.arrow', '.feather'):
+        return 'arrow'
+    return 'csv'
+
+def write_dataframe(dataframe: DataFrame, file_path: str, compression: str = DATA_FILE_COMPRESSION) -> None:
+    '''writes dataframe as csv, parquet or arrow ipc, picked by the file extension'''
+    try:
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+        file_format = _data_file_format(file_path)
+        if file_format == 'parquet':
+            dataframe.to_parquet(file_path, index=False, compression=compression)
+        elif file_format == 'arrow':
+            dataframe.reset_index(drop=True).to_feather(file_path, compression=compression)
+        else:
+            dataframe.to_csv(file_path, index=False, header=True)
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+def read_dataframe(file_path: str, columns: list = None) -> DataFrame:
+    '''
+    Output: DataFrame from a csv, parquet or arrow ipc file (only columns, in that order, when given);
+    the columnar formats come back with the dtypes they were written with
+    '''
+    try:
+        file_format = _data_file_format(file_path)
+        if file_format == 'parquet':
+            return pd.read_parquet(file_path, columns=columns)
+        if file_format == 'arrow':
+            return pd.read_feather(file_path, columns=columns)
+        dataframe = pd.read_csv(file_path, usecols=columns)
+        # usecols keeps the file's column order
+        return dataframe if columns is None else dataframe[columns]
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+def iter_dataframe_chunks(file_path: str, chunk_rows: int, columns: list = None) -> Iterator[DataFrame]:
+    '''
+    Output: the file read chunk_rows rows at a time (csv, parquet or arrow ipc, by the file
+    extension), so only one chunk is in memory at once
+    '''
+    try:
+        file_format = _data_file_format(file_path)
+        if file_format == 'csv':
+            yield from pd.read_csv(file_path, usecols=columns, chunksize=chunk_rows)
+            return
+        import pyarrow as pa
+        if file_format == 'parquet':
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunk_rows, columns=columns):
+                yield batch.to_pandas()
+            return
+        # arrow ipc record batches are as large as the writer made them: grouped into ~chunk_rows
+        with pa.memory_map(file_path) as source:
+            reader = pa.ipc.open_file(source)
+            batches, rows = [], 0
+            for index in range(reader.num_record_batches):
+                batch = reader.get_batch(index)
+                batches.append(batch if columns is None else batch.select(columns))
+                rows += batch.num_rows
+                if rows >= chunk_rows:
+                    yield pa.Table.from_batches(batches).to_pandas()
+                    batches, rows = [], 0
+            if batches:
+                yield pa.Table.from_batches(batches).to_pandas()
+    except Exception as e:
+        raise MyException(e, sys) from e
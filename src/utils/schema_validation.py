@@ -0,0 +1,243 @@
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+from src.exception import MyException
+from src.logger import logging
+from src.utils.main_utils import iter_dataframe_chunks
+
+# exported data carries Mongo's _id, older exports the "id" field
+ID_COLUMNS = ('_id', 'id')
+MAX_INVALID_EXAMPLES = 5
+
+def _python_value(value):
+    '''numpy scalars as plain python values, so they dump to yaml'''
+    return value.item() if isinstance(value, np.generic) else value
+
+@dataclass
+class ColumnStats:
+    '''
+    checks & statistics of one column over the chunks seen so far; merge() combines the stats
+    of two chunks (or of two columns' workers) exactly, the mean & std through Chan's update
+    '''
+    dtype: str
+    rows: int = 0
+    nulls: int = 0
+    dtype_mismatches: int = 0
+    # out of the numerical range / not one of the categorical values
+    invalid: int = 0
+    values: int = 0
+    minimum: float = np.inf
+    maximum: float = -np.inf
+    mean: float = 0.0
+    m2: float = 0.0
+    value_counts: Dict[str, int] = field(default_factory=dict)
+    invalid_examples: list = field(default_factory=list)
+
+    def merge(self, other: 'ColumnStats') -> 'ColumnStats':
+        values = self.values + other.values
+        if values:
+            delta = other.mean - self.mean
+            self.m2 += other.m2 + delta * delta * self.values * other.values / values
+            self.mean += delta * other.values / values
+        self.values = values
+        self.rows += other.rows
+        self.nulls += other.nulls
+        self.dtype_mismatches += other.dtype_mismatches
+        self.invalid += other.invalid
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        for value, count in other.value_counts.items():
+            self.value_counts[value] = self.value_counts.get(value, 0) + count
+        self.invalid_examples = (self.invalid_examples + other.invalid_examples)[:MAX_INVALID_EXAMPLES]
+        return self
+
+    def problems(self) -> int:
+        return self.nulls + self.dtype_mismatches + self.invalid
+
+    def to_report(self) -> dict:
+        report = {'dtype': self.dtype, 'rows': self.rows, 'nulls': self.nulls,
+                  'dtype_mismatches': self.dtype_mismatches, 'invalid_values': self.invalid}
+        if self.dtype == 'category':
+            report['value_counts'] = dict(sorted(self.value_counts.items()))
+        elif self.values:
+            report.update({'min': float(self.minimum), 'max': float(self.maximum), 'mean': float(self.mean),
+                           'std': float(np.sqrt(self.m2 / self.values))})
+        if self.invalid_examples:
+            report['invalid_examples'] = self.invalid_examples
+        return report
+
+def check_numerical_column(series: pd.Series, dtype: str, value_range: Optional[list] = None) -> ColumnStats:
+    '''
+    nulls, values that aren't numbers (or whole numbers for an int column) & values outside
+    the inclusive value_range, in a few array operations over the whole chunk
+    '''
+    stats = ColumnStats(dtype=dtype, rows=len(series))
+    # strings (object / string / categorical dtypes) are parsed, what doesn't parse is a mismatch
+    numeric = series if is_numeric_dtype(series.dtype) else pd.to_numeric(series.astype(object), errors='coerce')
+    values = numeric.to_numpy(dtype=np.float64, na_value=np.nan)
+    null = series.isna().to_numpy()
+    mismatched = np.isnan(values) & ~null
+    if dtype == 'int':
+        mismatched |= np.isfinite(values) & (values != np.floor(values))
+    valid = values[~null & ~mismatched]
+
+    stats.nulls = int(null.sum())
+    stats.dtype_mismatches = int(mismatched.sum())
+    stats.invalid_examples = [str(value) for value in series[mismatched].head(MAX_INVALID_EXAMPLES)]
+    if value_range is not None:
+        low, high = value_range
+        out_of_range = (valid < low) | (valid > high)
+        stats.invalid = int(out_of_range.sum())
+        stats.invalid_examples += [str(_python_value(value)) for value in valid[out_of_range][:MAX_INVALID_EXAMPLES]]
+        stats.invalid_examples = stats.invalid_examples[:MAX_INVALID_EXAMPLES]
+    if len(valid):
+        stats.values = len(valid)
+        stats.minimum, stats.maximum = float(valid.min()), float(valid.max())
+        stats.mean = float(valid.mean())
+        stats.m2 = float(np.square(valid - stats.mean).sum())
+    return stats
+
+def check_categorical_column(series: pd.Series, allowed_values: Optional[list] = None) -> ColumnStats:
+    '''
+    nulls, non string values & values outside allowed_values; the chunk is reduced to its
+    value counts first, so the per value checks only touch the distinct values
+    '''
+    stats = ColumnStats(dtype='category', rows=len(series), nulls=int(series.isna().sum()))
+    allowed = None if allowed_values is None else set(allowed_values)
+    counts = series.value_counts(dropna=True, sort=False)
+    for value, count in counts[counts > 0].items():
+        count = int(count)
+        if not isinstance(value, str):
+            stats.dtype_mismatches += count
+        elif allowed is not None and value not in allowed:
+            stats.invalid += count
+        else:
+            stats.value_counts[value] = count
+            continue
+        if len(stats.invalid_examples) < MAX_INVALID_EXAMPLES:
+            stats.invalid_examples.append(str(_python_value(value)))
+    return stats
+
+class DuplicateIdCounter:
+    '''
+    counts repeated ids across chunks by keeping one 64 bit hash per row (8 bytes a row,
+    the only part of the validation that grows with the data)
+    '''
+    def __init__(self):
+        self._hashes: List[np.ndarray] = []
+
+    def add(self, series: pd.Series) -> None:
+        values = series.to_numpy() if is_numeric_dtype(series.dtype) else series.to_numpy(dtype=object)
+        # ids are (nearly) all distinct: hashed directly, factorizing them first would only cost time
+        self._hashes.append(pd.util.hash_array(values, categorize=False))
+
+    def duplicates(self) -> int:
+        '''Output: rows whose id appeared in an earlier row'''
+        if not self._hashes:
+            return 0
+        hashes = np.sort(np.concatenate(self._hashes))
+        return int((hashes[1:] == hashes[:-1]).sum())
+
+@dataclass
+class ValidationResult:
+    rows: int
+    # zero rows with the validated columns & dtypes, for the column count / name checks
+    header: pd.DataFrame
+    columns: Dict[str, ColumnStats]
+    id_column: Optional[str]
+    duplicate_ids: int
+    seconds: float
+    value_ranges: dict = field(default_factory=dict)
+
+    def failures(self, max_invalid_fraction: float = 0.0) -> List[str]:
+        '''Output: one message per check failing on more than max_invalid_fraction of the rows'''
+        limit = max_invalid_fraction * self.rows
+        messages = []
+        for name, stats in self.columns.items():
+            if stats.problems() <= limit:
+                continue
+            problems = []
+            if stats.nulls:
+                problems.append(f'{stats.nulls} nulls')
+            if stats.dtype_mismatches:
+                problems.append(f'{stats.dtype_mismatches} not of type {stats.dtype}')
+            if stats.invalid:
+                allowed = 'allowed values' if stats.dtype == 'category' else f'range {self.value_ranges.get(name)}'
+                problems.append(f'{stats.invalid} outside the {allowed}')
+            messages.append(f'{name}: {", ".join(problems)} (e.g. {stats.invalid_examples})' if stats.invalid_examples
+                            else f'{name}: {", ".join(problems)}')
+        if self.duplicate_ids > limit:
+            messages.append(f'{self.id_column}: {self.duplicate_ids} duplicate ids')
+        return messages
+
+    def to_report(self) -> dict:
+        return {'rows': self.rows, 'seconds': round(self.seconds, 3), 'id_column': self.id_column,
+                'duplicate_ids': self.duplicate_ids,
+                'columns': {name: stats.to_report() for name, stats in self.columns.items()}}
+
+class SchemaValidator:
+    '''
+    validates raw data against config/schema.yaml: dtypes, nulls, categorical_values,
+    numerical_ranges & duplicate ids
+
+    data is read chunk by chunk & every chunk is reduced to per column ColumnStats right away,
+    so memory stays at about one chunk whatever the number of rows. with workers > 1 the
+    columns of a chunk are checked on that many threads
+    '''
+    def __init__(self, schema_config: dict, workers: int = 1):
+        self.column_types = {name: dtype for column in schema_config['columns']
+                             for name, dtype in column.items() if name not in ID_COLUMNS}
+        self.categorical_values = schema_config.get('categorical_values', {})
+        self.numerical_ranges = schema_config.get('numerical_ranges', {})
+        self.workers = workers
+
+    def check_column(self, name: str, series: pd.Series) -> ColumnStats:
+        dtype = self.column_types[name]
+        if dtype == 'category':
+            return check_categorical_column(series, self.categorical_values.get(name))
+        return check_numerical_column(series, dtype, self.numerical_ranges.get(name))
+
+    def validate_chunks(self, chunks: Iterable[pd.DataFrame]) -> ValidationResult:
+        try:
+            start = time.perf_counter()
+            rows, header, id_column = 0, None, None
+            columns: Dict[str, ColumnStats] = {}
+            duplicate_ids = DuplicateIdCounter()
+            pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='validation') if self.workers > 1 else None
+            try:
+                for chunk in chunks:
+                    if header is None:
+                        header = chunk.iloc[:0]
+                        id_column = next((name for name in ID_COLUMNS if name in chunk.columns), None)
+                    names = [name for name in self.column_types if name in chunk.columns]
+                    check = lambda name: self.check_column(name, chunk[name])
+                    for name, stats in zip(names, pool.map(check, names) if pool is not None else map(check, names)):
+                        columns[name] = columns[name].merge(stats) if name in columns else stats
+                    if id_column is not None:
+                        duplicate_ids.add(chunk[id_column])
+                    rows += len(chunk)
+            finally:
+                if pool is not None:
+                    pool.shutdown()
+
+            result = ValidationResult(rows=rows, header=header if header is not None else pd.DataFrame(),
+                                      columns=columns, id_column=id_column, duplicate_ids=duplicate_ids.duplicates(),
+                                      seconds=time.perf_counter() - start, value_ranges=self.numerical_ranges)
+            logging.info(f'Validated {rows} rows in {result.seconds:.2f}s')
+            return result
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def validate_frame(self, dataframe: pd.DataFrame, chunk_rows: int) -> ValidationResult:
+        '''validates a frame already in memory, chunk_rows rows (views, no copies) at a time'''
+        return self.validate_chunks(dataframe.iloc[start:start + chunk_rows]
+                                    for start in range(0, max(len(dataframe), 1), chunk_rows))
+
+    def validate_file(self, file_path: str, chunk_rows: int) -> ValidationResult:
+        '''validates a csv / parquet / arrow file read chunk_rows rows at a time'''
+        return self.validate_chunks(iter_dataframe_chunks(file_path, chunk_rows))
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+from src.constants import PREDICTION_INPUT_COLUMNS, SCHEMA_FILE_PATH
+from src.utils.main_utils import read_yaml_file
+
+GENDER_MAPPING = {'Female': 0, 'Male': 1}
+
+def encode_vehicle_features(dataframe: pd.DataFrame) -> pd.DataFrame:
+    '''
+    raw schema rows -> model input frame in PREDICTION_INPUT_COLUMNS order
+
+    same result as DataTransformation's gender mapping, drop_first dummies & renaming, but with
+    the dummy columns spelled out so any subset of rows (a chunk, a single row) encodes the same way
+    '''
+    return pd.DataFrame({
+        'Gender': dataframe['Gender'].map(GENDER_MAPPING).astype(int),
+        'Age': dataframe['Age'],
+        'Driving_License': dataframe['Driving_License'],
+        'Region_Code': dataframe['Region_Code'],
+        'Previously_Insured': dataframe['Previously_Insured'],
+        'Annual_Premium': dataframe['Annual_Premium'],
+        'Policy_Sales_Channel': dataframe['Policy_Sales_Channel'],
+        'Vintage': dataframe['Vintage'],
+        'Vehicle_Age_lt_1_Year': (dataframe['Vehicle_Age'] == '< 1 Year').astype(int),
+        'Vehicle_Age_gt_2_Years': (dataframe['Vehicle_Age'] == '> 2 Years').astype(int),
+        'Vehicle_Damage_Yes': (dataframe['Vehicle_Damage'] == 'Yes').astype(int),
+    }, columns=PREDICTION_INPUT_COLUMNS)
+
+def decode_vehicle_features(features) -> pd.DataFrame:
+    '''
+    model input rows (2d array / frame in PREDICTION_INPUT_COLUMNS order) -> raw schema columns,
+    the inverse of encode_vehicle_features, e.g. to compare served traffic with raw training data
+    '''
+    encoded = pd.DataFrame(np.asarray(features, dtype=np.float64), columns=PREDICTION_INPUT_COLUMNS)
+    genders = {code: gender for gender, code in GENDER_MAPPING.items()}
+    return pd.DataFrame({
+        'Gender': encoded['Gender'].map(genders),
+        'Age': encoded['Age'],
+        'Driving_License': encoded['Driving_License'],
+        'Region_Code': encoded['Region_Code'],
+        'Previously_Insured': encoded['Previously_Insured'],
+        'Vehicle_Age': np.select([encoded['Vehicle_Age_lt_1_Year'] == 1, encoded['Vehicle_Age_gt_2_Years'] == 1],
+                                 ['< 1 Year', '> 2 Years'], default='1-2 Year'),
+        'Vehicle_Damage': np.where(encoded['Vehicle_Damage_Yes'] == 1, 'Yes', 'No'),
+        'Annual_Premium': encoded['Annual_Premium'],
+        'Policy_Sales_Channel': encoded['Policy_Sales_Channel'],
+        'Vintage': encoded['Vintage'],
+    })
+
+def generate_vehicle_dataframe(num_rows: int, seed: int = 42, schema_config: dict = None) -> pd.DataFrame:
+    '''
+    synthetic raw rows matching config/schema.yaml: its columns & dtypes, categorical_values
+    and numerical_ranges (values drawn uniformly inside them)
+    '''
+    schema_config = schema_config or read_yaml_file(SCHEMA_FILE_PATH)
+    rng = np.random.default_rng(seed)
+    data = {}
+    for column_spec in schema_config['columns']:
+        (column, dtype), = column_spec.items()
+        if column == 'id':
+            data[column] = np.arange(1, num_rows + 1)
+        elif dtype == 'category':
+            data[column] = rng.choice(schema_config['categorical_values'][column], size=num_rows)
+        else:
+            low, high = schema_config['numerical_ranges'][column]
+            if dtype == 'int':
+                data[column] = rng.integers(low, high + 1, size=num_rows)
+            else:
+                data[column] = np.round(rng.uniform(low, high, size=num_rows), 2)
+    return pd.DataFrame(data)
+
+def generate_vehicle_features(num_rows: int, seed: int = 42) -> np.ndarray:
+    '''synthetic model input rows as a float array in PREDICTION_INPUT_COLUMNS order'''
+    return encode_vehicle_features(generate_vehicle_dataframe(num_rows, seed)).to_numpy(dtype=np.float64)
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+from src.benchmark.stand_in_model import build_stand_in_model, make_vehicle_input_dataframe
+from src.entity.compiled_estimator import CompiledModel
+
+@pytest.fixture(scope='module')
+def model():
+    return build_stand_in_model(num_rows=3000, n_estimators=10)
+
+@pytest.fixture(scope='module')
+def rows():
+    return make_vehicle_input_dataframe(2000, seed=7)
+
+def test_parity_on_numeric_rows(model, rows):
+    assert CompiledModel.from_model(model).check_parity(model, rows)
+
+def test_parity_on_string_rows(model, rows):
+    # form posts arrive as strings
+    assert CompiledModel.from_model(model).check_parity(model, rows.head(200).astype(str))
+
+def test_parity_after_save_and_mmap_load(model, rows, tmp_path):
+    CompiledModel.from_model(model).save(str(tmp_path))
+    loaded = CompiledModel.load(str(tmp_path), mmap_mode='r')
+
+    assert isinstance(loaded.forest.feature, np.memmap)
+    assert loaded.check_parity(model, rows)
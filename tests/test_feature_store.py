@@ -0,0 +1,18 @@
+import pandas as pd
+from src.data_access.feature_store import FeatureStore
+
+def test_append_unsorted_frame_moves_watermark_to_largest_id(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    object_ids = ['65a000000000000000000003', '65a000000000000000000009', '65a000000000000000000001']
+    store.append(pd.DataFrame({'_id': object_ids, 'Age': [30, 41, 25]}))
+
+    assert store.watermark == '65a000000000000000000009'
+    assert store.partitions()[0]['rows'] == 3
+
+def test_watermark_follows_latest_partition(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    store.append(pd.DataFrame({'_id': ['65a000000000000000000002', '65a000000000000000000001'], 'Age': [30, 41]}))
+    store.append(pd.DataFrame({'_id': ['65a00000000000000000000f', '65a00000000000000000000a'], 'Age': [52, 27]}))
+
+    assert store.watermark == '65a00000000000000000000f'
+    assert len(store.read()) == 4